@@ -0,0 +1,100 @@
+"""
+benchmark_async.py - 异步稳态驱动的利用率测试
+将 ioh 问题包装为评估耗时随机 (对数正态分布) 的目标函数，
+使用 run_async 同时保持 N 个评估在运行中，比较:
+    generational - AskTellCMAES，每一代的所有个体返回后才能开始下一代
+    discard      - SteadyStateCMAES，丢弃过旧的个体
+    reweight     - SteadyStateCMAES，将过旧的个体按当前分布重新计算并截断
+输出墙钟时间、worker 利用率 (评估总耗时 / (N × 墙钟时间)) 和最终误差。
+"""
+
+import argparse
+import asyncio
+import threading
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import ioh
+import numpy as np
+
+from modcma_source import AskTellCMAES, SteadyStateCMAES, run_async
+
+DRIVERS = {
+    'generational': lambda d, budget: AskTellCMAES(d, budget=budget),
+    'discard': lambda d, budget: SteadyStateCMAES(d, budget=budget, stale='discard'),
+    'reweight': lambda d, budget: SteadyStateCMAES(d, budget=budget, stale='reweight'),
+}
+
+
+class DelayedProblem():
+    """带随机延迟的 ioh 问题，记录评估的总耗时"""
+
+    def __init__(self, problem, mean_delay, sigma, seed):
+        self.problem = problem
+        self.mean_delay = mean_delay
+        self.sigma = sigma
+        self.rng = np.random.default_rng(seed)
+        self.busy_time = 0.0
+        self.lock = threading.Lock()
+
+    def delay(self):
+        # 对数正态分布，均值为 mean_delay
+        return self.mean_delay * self.rng.lognormal(-self.sigma ** 2 / 2, self.sigma)
+
+    async def __call__(self, x):
+        delay = self.delay()
+        await asyncio.sleep(delay)
+        self.busy_time += delay
+        return self.problem(x)
+
+    def blocking(self, x):
+        """在线程池中运行的版本，ioh 问题本身不是线程安全的，只并行等待部分"""
+        with self.lock:
+            delay = self.delay()
+        time.sleep(delay)
+        # 评估和计时在锁内串行执行
+        with self.lock:
+            self.busy_time += delay
+            return self.problem(x)
+
+
+def run_driver(name, args):
+    """运行一个驱动并返回 (墙钟时间, 利用率, 误差)"""
+    np.random.seed(args.seed)
+    problem = ioh.get_problem(args.fid, dimension=args.dim, instance=1)
+    objective = DelayedProblem(problem, args.mean_delay, args.sigma, args.seed)
+    optimizer = DRIVERS[name](args.dim, args.budget_factor * args.dim)
+
+    start = time.time()
+    if args.threads:
+        with ThreadPoolExecutor(args.workers) as executor:
+            asyncio.run(run_async(optimizer, objective.blocking, args.workers, executor))
+    else:
+        asyncio.run(run_async(optimizer, objective, args.workers))
+    wall_time = time.time() - start
+    utilization = objective.busy_time / (args.workers * wall_time)
+    return wall_time, utilization, problem.state.current_best.y - problem.optimum.y
+
+
+if __name__ == '__main__':
+    warnings.filterwarnings("ignore", category=RuntimeWarning)
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--fid', type=int, default=2)
+    parser.add_argument('--dim', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=8, help="同时运行的评估数 N")
+    parser.add_argument('--budget-factor', type=int, default=100, help="预算为 budget_factor * dim")
+    parser.add_argument('--mean-delay', type=float, default=0.01, help="平均评估耗时 (秒)")
+    parser.add_argument('--sigma', type=float, default=1.0, help="对数正态分布的形状参数")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--threads', action='store_true', help="使用线程池和 time.sleep 代替 asyncio.sleep")
+    parser.add_argument('--drivers', nargs='+', choices=list(DRIVERS), default=list(DRIVERS))
+    args = parser.parse_args()
+
+    print(f"F{args.fid} {args.dim}D, {args.workers} workers, "
+          f"budget {args.budget_factor * args.dim}, mean delay {args.mean_delay}s")
+    print(f"{'driver':<14}{'wall time':>12}{'utilization':>14}{'error':>14}")
+    for name in args.drivers:
+        wall_time, utilization, error = run_driver(name, args)
+        print(f"{name:<14}{wall_time:>11.2f}s{utilization:>14.1%}{error:>14.3e}")
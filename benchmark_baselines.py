@@ -4,7 +4,7 @@ os.environ["OPENBLAS_NUM_THREADS"] = "1"
 import ioh
 from itertools import product
 from functools import partial
-from multiprocessing import Pool, cpu_count
+from multiprocessing import cpu_count
 
 import sys
 import argparse
@@ -16,22 +16,19 @@ import pandas as pd
 import numpy as np
 
 import time
+import shutil
 from copy import deepcopy
 
-from modcma import ModularCMAES
+from modcma_source import ModularCMAES
+
+from scheduler import run_tasks
+from ledger import Ledger
+from milestones import MilestoneLogger, MILESTONE_FILE
 
 DATA_FOLDER = "Data"
+PROFILE_FILE = f"{DATA_FOLDER}/Baselines/profile.jsonl"
 MAX_THREADS = 32
-
-def runParallelFunction(runFunction, arguments):
-
-    
-
-    arguments = list(arguments)
-    p = Pool(min(MAX_THREADS, len(arguments)))
-    results = p.map(runFunction, arguments)
-    p.close()
-    return results
+N_REPS = 5
 
 modcma_params = { 'base' : {},
                   'bipop' : {
@@ -41,12 +38,14 @@ modcma_params = { 'base' : {},
 
 
 class Algorithm_Evaluator():
-    def __init__(self, optimizer):
+    def __init__(self, optimizer, profile=False):
         self.alg = optimizer
+        self.profile = profile
 
-    def __call__(self, func, n_reps):
+    def __call__(self, func, seeds):
 
-        for seed in range(n_reps):
+        results = []
+        for seed in seeds:
             np.random.seed(int(seed))
             
             # 只保留BIPOP-CMA-ES的处理逻辑
@@ -54,31 +53,66 @@ class Algorithm_Evaluator():
             params = modcma_params[self.alg[7:]]  # 提取'bipop'参数
             c = ModularCMAES(func, d=func.meta_data.n_variables, bound_correction='saturate',
                          budget=int(10000*func.meta_data.n_variables),
-                         x0=np.zeros((func.meta_data.n_variables, 1)), **params)
+                         x0=np.zeros((func.meta_data.n_variables, 1)), profile=self.profile, **params)
             c.run()
+            if self.profile:
+                # 每次运行追加一行各阶段的累计时间和调用次数
+                os.makedirs(os.path.dirname(PROFILE_FILE), exist_ok=True)
+                c.profiler.export(PROFILE_FILE, algname=self.alg, fid=func.meta_data.problem_id,
+                                  iid=func.meta_data.instance, dim=func.meta_data.n_variables,
+                                  seed=int(seed), evaluations=func.state.evaluations)
             
+            results.append((func.state.evaluations, func.state.current_best.y))
             func.reset()
+        return results
         
-def run_optimizer(temp):
+def run_optimizer(temp, loggers='analyzer', profile=False):
+    """运行一个单元
+
+    loggers: 'analyzer' 写出 IOHprofiler .dat 文件，
+             'milestones' 只在内存中记录固定预算节点并直接写出 FBUDGET.csv，
+             'both' 同时使用两者
+    profile: 记录每个阶段的耗时，追加到 PROFILE_FILE
+    """
     
-    algname, fid, iid, dim = temp
-    print(algname, fid, iid, dim)
+    algname, fid, iid, dim, rep = temp
+    print(algname, fid, iid, dim, rep)
     
-    algorithm = Algorithm_Evaluator(algname)
-
-    logger = ioh.logger.Analyzer(root=f"{DATA_FOLDER}/Baselines/", folder_name=f"{algname}_F{fid}_I{iid}_{dim}D", algorithm_name=f"{algname}")
+    algorithm = Algorithm_Evaluator(algname, profile)
+
+    # 未完成的单元重新运行前删除其残留的输出文件夹
+    folder_name = f"{algname}_R{rep}_F{fid}_I{iid}_{dim}D"
+    shutil.rmtree(f"{DATA_FOLDER}/Baselines/{folder_name}", ignore_errors=True)
+    attached = []
+    if loggers in ('analyzer', 'both'):
+        attached.append(ioh.logger.Analyzer(root=f"{DATA_FOLDER}/Baselines/", folder_name=folder_name, algorithm_name=f"{algname}"))
+    if loggers in ('milestones', 'both'):
+        milestones = MilestoneLogger(dim)
+        attached.append(milestones)
+    logger = attached[0] if len(attached) == 1 else ioh.logger.Combine(attached)
 
     func = ioh.get_problem(fid, dimension=dim, instance=iid)
     func.attach_logger(logger)
     
-    algorithm(func, 5)
+    (evaluations, best_f), = algorithm(func, [rep])
     
-    logger.close()
+    for attached_logger in attached:
+        attached_logger.close()
+    if loggers in ('milestones', 'both'):
+        milestones.write(f"{DATA_FOLDER}/Baselines/{folder_name}/{MILESTONE_FILE}", algname, fid, iid, dim)
+    return {'evaluations': evaluations, 'best_f': best_f}
 
 if __name__ == '__main__':
     warnings.filterwarnings("ignore", category=RuntimeWarning) 
     warnings.filterwarnings("ignore", category=FutureWarning)
 
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--logger', choices=['analyzer', 'milestones', 'both'], default='analyzer',
+                        help="analyzer: IOHprofiler .dat 文件; milestones: 直接写出固定预算结果 (FBUDGET.csv)")
+    parser.add_argument('--profile', action='store_true',
+                        help=f"记录采样、评估、选择、各适应阶段等的耗时，写入 {PROFILE_FILE}")
+    cli_args = parser.parse_args()
+
     fids = range(20,25)  # 测试F20-F24
     algnames = ["modcma_bipop"]
     iids = range(1,11)  # 测试I1-I10，共10个实例
@@ -87,4 +121,6 @@ if __name__ == '__main__':
     
     args = product(algnames, fids, iids, dims)
 
-    runParallelFunction(run_optimizer, args)
+    run_tasks(partial(run_optimizer, loggers=cli_args.logger, profile=cli_args.profile), args, n_reps=N_REPS, max_threads=MAX_THREADS,
+              history_file=f"{DATA_FOLDER}/wall_times.json",
+              ledger=Ledger(f"{DATA_FOLDER}/Baselines/ledger.jsonl"))
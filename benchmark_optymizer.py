@@ -4,7 +4,7 @@ os.environ["OPENBLAS_NUM_THREADS"] = "1"
 import ioh
 from itertools import product
 from functools import partial
-from multiprocessing import Pool, cpu_count
+from multiprocessing import cpu_count
 
 import sys
 import argparse
@@ -23,59 +23,82 @@ from opytimizer.optimizers.evolutionary import DE
 
 
 import time
+import shutil
+
+from scheduler import run_tasks
+from ledger import Ledger
+from milestones import MilestoneLogger, MILESTONE_FILE
 
 DATA_FOLDER = "Data"
 MAX_THREADS = 32
-
-def runParallelFunction(runFunction, arguments):
-
-    
-
-    arguments = list(arguments)
-    p = Pool(min(MAX_THREADS, len(arguments)))
-    results = p.map(runFunction, arguments)
-    p.close()
-    return results
+N_REPS = 5
 
 
 class Algorithm_Evaluator():
     def __init__(self, optimizer):
         self.alg = optimizer
 
-    def __call__(self, func, n_reps):
+    def __call__(self, func, seeds):
         def helper(x):
             return func(x.reshape(-1))
         space = SearchSpace(30, func.meta_data.n_variables, func.bounds.lb, func.bounds.ub)
         optimizer = eval(f"{self.alg}()")
         function = Function(helper)
 
-        for seed in range(n_reps):
+        results = []
+        for seed in seeds:
             np.random.seed(int(seed))
             
             Opytimizer(space, optimizer, function).start(n_iterations=int((func.meta_data.n_variables * 10000) / 30))
+            results.append((func.state.evaluations, func.state.current_best.y))
             func.reset()
+        return results
         
-def run_optimizer(temp):
+def run_optimizer(temp, loggers='analyzer'):
+    """运行一个单元
+
+    loggers: 'analyzer' 写出 IOHprofiler .dat 文件，
+             'milestones' 只在内存中记录固定预算节点并直接写出 FBUDGET.csv，
+             'both' 同时使用两者
+    """
     
-    algname, fid, iid, dim = temp
-    print(algname, fid, iid, dim)
+    algname, fid, iid, dim, rep = temp
+    print(algname, fid, iid, dim, rep)
     
     algorithm = Algorithm_Evaluator(algname)
 
-    logger = ioh.logger.Analyzer(root=f"{DATA_FOLDER}/OPYTIMIZER/", folder_name=f"{algname}_F{fid}_I{iid}_{dim}D", algorithm_name=f"{algname}")
+    # 未完成的单元重新运行前删除其残留的输出文件夹
+    folder_name = f"{algname}_R{rep}_F{fid}_I{iid}_{dim}D"
+    shutil.rmtree(f"{DATA_FOLDER}/OPYTIMIZER/{folder_name}", ignore_errors=True)
+    attached = []
+    if loggers in ('analyzer', 'both'):
+        attached.append(ioh.logger.Analyzer(root=f"{DATA_FOLDER}/OPYTIMIZER/", folder_name=folder_name, algorithm_name=f"{algname}"))
+    if loggers in ('milestones', 'both'):
+        milestones = MilestoneLogger(dim)
+        attached.append(milestones)
+    logger = attached[0] if len(attached) == 1 else ioh.logger.Combine(attached)
 
     func = ioh.get_problem(fid, dimension=dim, instance=iid)
 
     func.attach_logger(logger)
     
-    algorithm(func, 5)
+    (evaluations, best_f), = algorithm(func, [rep])
     
-    logger.close()
+    for attached_logger in attached:
+        attached_logger.close()
+    if loggers in ('milestones', 'both'):
+        milestones.write(f"{DATA_FOLDER}/OPYTIMIZER/{folder_name}/{MILESTONE_FILE}", algname, fid, iid, dim)
+    return {'evaluations': evaluations, 'best_f': best_f}
 
 if __name__ == '__main__':
     warnings.filterwarnings("ignore", category=RuntimeWarning) 
     warnings.filterwarnings("ignore", category=FutureWarning)
 
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--logger', choices=['analyzer', 'milestones', 'both'], default='analyzer',
+                        help="analyzer: IOHprofiler .dat 文件; milestones: 直接写出固定预算结果 (FBUDGET.csv)")
+    cli_args = parser.parse_args()
+
     fids = range(20,25)  # 只测试F1 (Sphere)
     algnames = ["CS", "DE"]
     iids = range(1,11)  # 测试I1-I10，共10个实例
@@ -84,4 +107,6 @@ if __name__ == '__main__':
     
     args = product(algnames, fids, iids, dims)
 
-    runParallelFunction(run_optimizer, args)
+    run_tasks(partial(run_optimizer, loggers=cli_args.logger), args, n_reps=N_REPS, max_threads=MAX_THREADS,
+              history_file=f"{DATA_FOLDER}/wall_times.json",
+              ledger=Ledger(f"{DATA_FOLDER}/OPYTIMIZER/ledger.jsonl"))
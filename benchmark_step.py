@@ -0,0 +1,67 @@
+"""
+benchmark_step.py - 每秒代数测试
+对 Parameters.__modules__ 的每个选项 (每次只改变一个模块，其余为默认值)，
+比较通用的 ModularCMAES.step 循环与按配置特化的 run (build_step) 的每秒代数，
+并检查两者的结果 (m, sigma, 评估次数) 完全一致。
+"""
+
+import argparse
+import time
+import warnings
+
+import ioh
+import numpy as np
+
+from modcma_source import ModularCMAES, Parameters
+
+
+def module_configs():
+    """默认配置加上每个模块的每个非默认选项"""
+    configs = [('default', {})]
+    for name in Parameters.__modules__:
+        options = getattr(getattr(Parameters, name), 'options', [False, True])
+        for option in options[1:]:
+            configs.append((f"{name}={option}", {name: option}))
+    return configs
+
+
+def generations_per_second(config, args, specialized):
+    """运行 args.generations 代，返回 (每秒代数, 结果摘要)"""
+    np.random.seed(args.seed)
+    problem = ioh.get_problem(args.fid, dimension=args.dim, instance=1)
+    c = ModularCMAES(problem, args.dim, budget=10 ** 9, n_generations=args.generations,
+                     bound_correction=config.pop('bound_correction', 'saturate'), **config)
+    start = time.perf_counter()
+    if specialized:
+        c.run()
+    else:
+        while c.step():
+            pass
+    elapsed = time.perf_counter() - start
+    summary = (c.parameters.m.tobytes(), c.parameters.sigma, c.parameters.used_budget)
+    return c.parameters.t / elapsed, summary
+
+
+if __name__ == '__main__':
+    warnings.filterwarnings("ignore", category=RuntimeWarning)
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--fid', type=int, default=1)
+    parser.add_argument('--dim', type=int, default=5)
+    parser.add_argument('--generations', type=int, default=2000)
+    parser.add_argument('--repeats', type=int, default=3, help="取最快的一次")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"F{args.fid} {args.dim}D, {args.generations} generations")
+    print(f"{'config':<40}{'step (gen/s)':>14}{'run (gen/s)':>14}{'speedup':>10}  identical")
+    for label, config in module_configs():
+        # 两种方式交替运行，减小机器负载波动的影响
+        results = {False: [], True: []}
+        for _ in range(args.repeats):
+            for specialized in (False, True):
+                results[specialized].append(generations_per_second(dict(config), args, specialized))
+        rates = {key: max(rate for rate, _ in value) for key, value in results.items()}
+        identical = results[False][0][1] == results[True][0][1]
+        print(f"{label:<40}{rates[False]:>14.0f}{rates[True]:>14.0f}"
+              f"{rates[True] / rates[False]:>9.2f}x  {identical}")
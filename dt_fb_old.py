@@ -2,51 +2,158 @@
 # -*- coding: utf-8 -*-
 """
 dt_fb.py - 数据处理脚本
-从 FBUDGET_all.csv 处理得到 dt_fb.csv
+从 FBUDGET_all.csv（或 simple_process_old.py --parquet 生成的 Parquet 数据集）处理得到 dt_fb.csv
 """
 
 import numpy as np
 import pandas as pd
+import argparse
 import os
 
-def process_fbudget_data():
+FBUDGET_CSV = "CSV_Results/FBUDGET_all.csv"
+FBUDGET_PARQUET = "CSV_Results/FBUDGET_all.parquet"
+# 只读取需要的列 (不读取 fname, run, iid)
+COLUMNS = ['budget_factor', 'algname', 'fid', 'dim', 'fx', 'budget']
+GROUP_COLUMNS = ['budget_factor', 'algname', 'fid', 'dim', 'lib']
+
+def get_lib(algname):
+    """根据algname判断库"""
+    if algname == 'modcma_bipop':
+        return 'Baselines'
+    elif algname in ['CS', 'DE']:
+        return 'OPYTIMIZER'
+    else:
+        return 'Unknown'
+
+def add_lib(dt):
+    """添加库信息: get_lib 只对每个算法名调用一次，再按分类编码映射到所有行"""
+    algname = dt['algname'].astype('category')
+    libs = np.asarray(algname.cat.categories.map(get_lib), dtype=object)
+    dt['algname'] = algname
+    dt['lib'] = pd.Categorical(libs[algname.cat.codes])
+    return dt
+
+def bootstrap_ci(values, groups, n_groups, n_bootstrap=1000, confidence=0.95, seed=0):
+    """
+    各组均值的 bootstrap 置信区间
+    
+    每次重采样同时对所有组进行（组内有放回抽样），内存占用与行数成线性关系
+    """
+    rng = np.random.default_rng(seed)
+    order = np.argsort(groups, kind='stable')
+    values, groups = values[order], groups[order]
+    sizes = np.bincount(groups, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))[groups]
+    sizes_per_row = sizes[groups]
+    
+    means = np.empty((n_bootstrap, n_groups))
+    for b in range(n_bootstrap):
+        idx = starts + (rng.random(len(values)) * sizes_per_row).astype(np.int64)
+        means[b] = np.bincount(groups, weights=values[idx], minlength=n_groups) / sizes
+    
+    alpha = (1 - confidence) / 2
+    return np.quantile(means, [alpha, 1 - alpha], axis=0)
+
+def aggregate(dt, median=False, quantiles=(), n_bootstrap=0, confidence=0.95, seed=0):
+    """
+    按预算因子、算法名、函数ID、维度、库分组（跨运行和实例）计算统计量
+    
+    fx, budget 为平均值；可选 fx_median, fx_q<百分位>, 以及均值的 bootstrap 置信区间
+    fx_ci_low, fx_ci_high。所有统计量共用同一个分组。
+    """
+    # (observed=True: 分类列只保留实际出现的组合)
+    grouped = dt.groupby(GROUP_COLUMNS, observed=True, sort=True)
+    dt_fb = grouped[['fx', 'budget']].mean()
+    
+    if median:
+        dt_fb['fx_median'] = grouped['fx'].median()
+    for q in quantiles:
+        dt_fb[f'fx_q{q * 100:g}'] = grouped['fx'].quantile(q)
+    if n_bootstrap > 0:
+        dt_fb['fx_ci_low'], dt_fb['fx_ci_high'] = bootstrap_ci(
+            dt['fx'].to_numpy(), grouped.ngroup().to_numpy(), len(dt_fb),
+            n_bootstrap, confidence, seed
+        )
+    return dt_fb.reset_index()
+
+def read_parquet_dataset(folder, columns, fids=None, dims=None):
+    """
+    读取按 lib/algname/fid 分区的 Parquet 数据集，只读取需要的列，
+    fid 过滤在分区目录层面完成，dim 过滤下推到行组统计信息
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    
+    partitioning = ds.partitioning(pa.schema([
+        ('lib', pa.dictionary(pa.int32(), pa.string())),
+        ('algname', pa.dictionary(pa.int32(), pa.string())),
+        ('fid', pa.int16()),
+    ]), flavor='hive', dictionaries='infer')
+    
+    filters = []
+    if fids is not None:
+        filters.append(('fid', 'in', list(fids)))
+    if dims is not None:
+        filters.append(('dim', 'in', list(dims)))
+    
+    df = pd.read_parquet(folder, columns=columns, filters=filters or None,
+                         partitioning=partitioning)
+    # 分类按字母顺序排列，使分组和排序结果与读取CSV时一致
+    for col in df.select_dtypes('category').columns:
+        df[col] = df[col].cat.set_categories(sorted(df[col].cat.categories))
+    return df
+
+def process_fbudget_data(fids=None, dims=None, **statistics):
     """
     处理FBUDGET_all.csv数据，生成dt_fb.csv
+    
+    存在 Parquet 数据集时优先读取，并额外生成 dt_fb.parquet。
+    fids, dims 可用于只处理部分函数和维度。
+    statistics 传给 aggregate，用于计算平均值以外的统计量。
     """
     print("正在处理固定预算数据...")
     
+    use_parquet = os.path.isdir(FBUDGET_PARQUET)
+    
     # 检查输入文件是否存在
-    if not os.path.exists("CSV_Results/FBUDGET_all.csv"):
-        print("错误：找不到 CSV_Results/FBUDGET_all.csv 文件")
+    if not use_parquet and not os.path.exists(FBUDGET_CSV):
+        print(f"错误：找不到 {FBUDGET_CSV} 文件")
         return None
     
-    # 读取FBUDGET_all.csv
-    dt = pd.read_csv("CSV_Results/FBUDGET_all.csv")
-    print(f"读取了 {len(dt)} 行原始数据")
-    
-    # 删除不需要的列
-    dt = dt.drop(['fname', 'run', 'iid'], axis=1)
+    if use_parquet:
+        # 读取Parquet数据集，lib 来自分区目录
+        dt = read_parquet_dataset(FBUDGET_PARQUET, COLUMNS + ['lib'], fids, dims)
+        print(f"从 {FBUDGET_PARQUET} 读取了 {len(dt)} 行原始数据")
+    else:
+        # 读取FBUDGET_all.csv
+        dt = pd.read_csv(FBUDGET_CSV, usecols=COLUMNS, dtype={'algname': 'category'})
+        if fids is not None:
+            dt = dt[dt['fid'].isin(fids)]
+        if dims is not None:
+            dt = dt[dt['dim'].isin(dims)]
+        print(f"读取了 {len(dt)} 行原始数据")
     
     # 对fx进行对数变换和裁剪
-    dt['fx'] = np.log10(np.clip(dt['fx'], 1e-8, 1e16))
+    fx = dt['fx'].to_numpy(dtype=np.float64, copy=True)
+    dt['fx'] = np.log10(np.clip(fx, 1e-8, 1e16, out=fx), out=fx)
     
     # 添加库信息（根据algname判断）
-    def get_lib(algname):
-        if algname == 'modcma_bipop':
-            return 'Baselines'
-        elif algname in ['CS', 'DE']:
-            return 'OPYTIMIZER'
-        else:
-            return 'Unknown'
-    
-    dt['lib'] = dt['algname'].apply(get_lib)
+    if 'lib' not in dt.columns:
+        dt = add_lib(dt)
     
     # 按预算因子、算法名、函数ID、维度、库进行分组并计算平均值
-    dt_fb = dt.groupby(['budget_factor', 'algname', 'fid', 'dim', 'lib']).agg('mean').reset_index()
+    dt_fb = aggregate(dt, **statistics)
     
     # 保存处理后的数据
     dt_fb.to_csv("dt_fb.csv", index=False)
     print(f"已保存 dt_fb.csv，包含 {len(dt_fb)} 行数据")
+    if use_parquet:
+        dt_fb.to_parquet("dt_fb.parquet", index=False)
+        print("已保存 dt_fb.parquet")
+    elif os.path.exists("dt_fb.parquet"):
+        # 比较脚本优先读取 dt_fb.parquet，删除由旧数据生成的文件
+        os.remove("dt_fb.parquet")
+        print("已删除过时的 dt_fb.parquet")
     
     # 显示数据统计信息
     print("\n数据统计信息：")
@@ -63,13 +170,24 @@ def main():
     """
     print("开始数据处理...")
     
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--median', action='store_true', help="额外计算 fx 中位数")
+    parser.add_argument('--quantiles', type=float, nargs='*', default=[], help="额外计算的 fx 分位数，例如 0.25 0.75")
+    parser.add_argument('--bootstrap', type=int, default=0, dest='n_bootstrap',
+                        help="fx 均值 bootstrap 置信区间的重采样次数 (0 表示不计算)")
+    parser.add_argument('--confidence', type=float, default=0.95, help="置信水平")
+    parser.add_argument('--seed', type=int, default=0, help="bootstrap 随机种子")
+    statistics = vars(parser.parse_args())
+    
     # 处理固定预算数据
-    dt_fb = process_fbudget_data()
+    dt_fb = process_fbudget_data(**statistics)
     
     if dt_fb is not None:
         print("\n数据处理完成！")
         print("生成的文件：")
         print("- dt_fb.csv: 处理后的固定预算数据")
+        if os.path.isdir(FBUDGET_PARQUET):
+            print("- dt_fb.parquet: 处理后的固定预算数据 (Parquet)")
     else:
         print("数据处理失败！")
 
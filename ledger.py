@@ -0,0 +1,49 @@
+"""
+ledger.py - 任务账本
+以追加写入的 JSONL 文件记录每个 (algname, fid, iid, dim, seed) 单元的运行状态、
+耗时、评估次数和最终最优值。脚本被中断后重新运行时，已完成的单元会被跳过。
+"""
+
+import json
+import os
+import time
+
+KEY_FIELDS = ('algname', 'fid', 'iid', 'dim', 'seed')
+
+
+class Ledger():
+    def __init__(self, filename):
+        self.filename = filename
+
+    def entries(self):
+        """按写入顺序读取所有记录，忽略被中断写入的不完整行"""
+        if not os.path.exists(self.filename):
+            return []
+        entries = []
+        with open(self.filename, 'r') as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        return entries
+
+    def status(self):
+        """每个单元最后一次记录的状态"""
+        return {
+            tuple(entry[field] for field in KEY_FIELDS): entry['status']
+            for entry in self.entries()
+        }
+
+    def completed(self):
+        """已完成单元的集合"""
+        return {key for key, status in self.status().items() if status == 'done'}
+
+    def record(self, unit, status, **fields):
+        """追加一条记录并立即写入磁盘"""
+        entry = dict(zip(KEY_FIELDS, unit), status=status, time=time.time(), **fields)
+        os.makedirs(os.path.dirname(self.filename) or '.', exist_ok=True)
+        with open(self.filename, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
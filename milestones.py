@@ -0,0 +1,73 @@
+"""
+milestones.py - 内存中的固定预算记录器
+在运行过程中只记录 budget_factor × dim 次评估时的最优值 (raw_y)，
+运行结束后直接写出 FBUDGET 行，不再经过 IOHprofiler .dat 文件。
+结果与 simple_process_old.py 从 .dat 文件中提取的结果在 .dat 文件的舍入精度内一致：
+.dat 文件中的 raw_y 只保留小数点后 10 位 (绝对误差不超过 5e-11)，这里记录的是完整的 float64 值。
+"""
+
+import os
+
+import ioh
+import pandas as pd
+
+# 与 simple_process_old.py 中的 budget_factors 一致
+BUDGET_FACTORS = [10, 50, 100, 500, 1000, 5000, 10000]
+MILESTONE_FILE = "FBUDGET.csv"
+
+
+class MilestoneLogger(ioh.logger.AbstractLogger):
+    """只在预算节点和改进时被调用的 ioh 记录器
+
+    预算节点由 At 触发器记录；OnImprovement 触发器只用于保存当前最优值，
+    以便运行在某个预算节点之前结束时，用最终最优值补齐剩余节点
+    (与 .dat 文件中 "不超过预算的最后一个数据点" 的处理相同)。
+    每个运行在评估次数回退时 (problem.reset 之后) 或 close() 时结束。
+    """
+
+    def __init__(self, dim, budget_factors=BUDGET_FACTORS):
+        self.budget_factors = list(budget_factors)
+        self.budgets = [factor * dim for factor in self.budget_factors]
+        # C++ 端不持有触发器的引用，必须由 Python 对象保持
+        self._triggers = [ioh.logger.trigger.At(set(self.budgets)), ioh.logger.trigger.OnImprovement()]
+        super().__init__(self._triggers)
+        self.columns = {'fx': [], 'run': [], 'budget_factor': [], 'budget': []}
+        self.run = 0
+        self.evaluations = 0
+        self.best = None
+        self.milestones = {}
+
+    def __call__(self, log_info):
+        if log_info.evaluations <= self.evaluations:
+            self.end_run()
+        self.evaluations = log_info.evaluations
+        self.best = log_info.raw_y_best
+        if self.evaluations in self.budgets:
+            self.milestones[self.evaluations] = self.best
+
+    def end_run(self):
+        """结束当前运行并保存其所有预算节点的最优值"""
+        if self.evaluations == 0:
+            return
+        self.run += 1
+        for budget_factor, budget in zip(self.budget_factors, self.budgets):
+            self.columns['fx'].append(self.milestones.get(budget, self.best))
+            self.columns['run'].append(self.run)
+            self.columns['budget_factor'].append(budget_factor)
+            self.columns['budget'].append(budget)
+        self.evaluations = 0
+        self.best = None
+        self.milestones = {}
+
+    def close(self):
+        self.end_run()
+
+    def to_frame(self, fname, algname, fid, iid, dim):
+        """按 FBUDGET_all.csv 的列顺序返回所有已结束运行的结果"""
+        return pd.DataFrame({'fname': fname, **self.columns, 'algname': algname,
+                             'fid': fid, 'iid': iid, 'dim': dim})
+
+    def write(self, fname, algname, fid, iid, dim):
+        """写出 FBUDGET 行，文件名同时作为 fname 列的值"""
+        os.makedirs(os.path.dirname(fname) or '.', exist_ok=True)
+        self.to_frame(fname, algname, fid, iid, dim).to_csv(fname, index=False)
@@ -8,15 +8,24 @@ from .sampling import (
     halton_sampling,
     mirrored_sampling,
     orthogonal_sampling,
+    BlockSampler,
+    GaussianSampler,
+    MirroredSampler,
+    OrthogonalSampler,
     Halton,
     Sobol,
 )
-from .utils import timeit, ert
+from .utils import timeit, ert, Profiler
 from .asktellcmaes import AskTellCMAES
+from .asynccmaes import SteadyStateCMAES, run_async
 from .modularcmaes import ModularCMAES, evaluate_bbob, fmin
+from .batchedcmaes import BatchedCMAES
 
 __all__ = (
     "AskTellCMAES",
+    "SteadyStateCMAES",
+    "run_async",
+    "BatchedCMAES",
     "ModularCMAES",
     "evaluate_bbob",
     "fmin",
@@ -28,8 +37,13 @@ __all__ = (
     "halton_sampling",
     "mirrored_sampling",
     "orthogonal_sampling",
+    "BlockSampler",
+    "GaussianSampler",
+    "MirroredSampler",
+    "OrthogonalSampler",
     "Halton",
     "Sobol",
     "timeit",
     "ert",
+    "Profiler",
 )
@@ -1,7 +1,6 @@
 """Ask and tell interface to the Modular CMA-ES."""
 import warnings
 import typing
-from collections import deque
 from functools import wraps
 import numpy as np
 from .modularcmaes import ModularCMAES
@@ -35,15 +34,38 @@ def check_break_conditions(f: typing.Callable) -> typing.Callable:
 
 
 class AskTellCMAES(ModularCMAES):
-    """Ask tell interface for the ModularCMAES."""
+    """Ask tell interface for the ModularCMAES.
+
+    Individuals are identified by integer tickets, which number the individuals
+    of all generations consecutively. ask(n) returns a batch of individuals with
+    their tickets, which are reported back with tell(tickets, fvalues). Once all
+    individuals of a generation are told, the next generation is sampled, so
+    ask may return fewer than n individuals at the end of a generation.
+
+    Attributes
+    ----------
+    ticket_offset: int
+        The ticket of the first individual in the current generation
+    n_asked: int
+        The number of individuals of the current generation returned by ask
+    told: np.ndarray
+        Whether the fitness of each individual in the current generation is told
+    n_told: int
+        The number of individuals of the current generation that are told
+
+    """
 
     def __init__(self, *args, **kwargs) -> None:
         """Override the fitness_function argument with an empty callable."""
         super().__init__(lambda: None, *args, **kwargs)
+        self.ticket_offset = 0
+        self.n_asked = 0
+        self.told = np.zeros(0, dtype=bool)
+        self.n_told = 0
 
     def fitness_func(self, x: np.ndarray) -> None:
-        """Overwrite function call for fitness_func, calls register_individual."""
-        self.register_individual(x)
+        """Overwrite function call for fitness_func, fitness values are set by tell."""
+        return None
 
     def sequential_break_conditions(self, i: int, f: float) -> None:
         """Overwrite ~modcma.modularcmaes.ModularCMAES.sequential_break_conditions.
@@ -89,76 +111,116 @@ class AskTellCMAES(ModularCMAES):
         """
         raise NotImplementedError("Run is undefined in this interface")
 
-    def register_individual(self, x: np.ndarray) -> None:
-        """Add new individuals to self.ask_queue.
-
-        Parameters
-        ----------
-        x: np.ndarray
-            The vector to be added to the ask_queue
-
-        """
-        self.ask_queue.append(x.reshape(-1, 1))
+    def sample_generation(self) -> None:
+        """Sample the individuals of the next generation and reset the bookkeeping."""
+        if self.parameters.population is not None:
+            self.ticket_offset += self.parameters.population.n
+        self.mutate()
+        self.n_asked = 0
+        self.told = np.zeros(self.parameters.population.n, dtype=bool)
+        self.n_told = 0
 
     @check_break_conditions
-    def ask(self) -> np.ndarray:
-        """Retrieve the next indivual from the ask_queue.
+    def ask(self, n: int = None) -> typing.Union[np.ndarray, typing.Tuple[np.ndarray, np.ndarray]]:
+        """Retrieve the next individual(s) of the current generation.
+
+        If no generation is sampled yet, mutate is called in order to sample one.
 
-        If the ask_queue is not defined yet, it is defined and mutate is
-        called in order to fill it.
+        Parameters
+        ----------
+        n: int = None
+            The number of individuals to return. When None, a single individual
+            is returned as a (d, 1) vector, to be told with tell(xi, fi).
 
         Returns
         -------
         np.ndarray
+            When n is None, the (d, 1) individual
+        (np.ndarray, np.ndarray)
+            Otherwise an (m, d) matrix of m <= n individuals and their m tickets. m is
+            smaller than n if the current generation has fewer individuals left, and
+            zero if all of them are asked but not yet told.
+
+        Raises
+        ------
+        RuntimeError
+            When n is None and all individuals of the current generation are already
+            returned, but not all of them are told
 
         """
-        if not hasattr(self, "ask_queue"):
-            self.ask_queue = deque()
-            self.mutate()
-        return self.ask_queue.popleft()
+        if self.parameters.population is None:
+            self.sample_generation()
+        start = self.n_asked
+        stop = min(self.parameters.population.n, start + (1 if n is None else n))
+        if stop == start and n is None:
+            raise RuntimeError(
+                "All individuals of the current generation are asked, "
+                "call tell before asking for more"
+            )
+        self.n_asked = stop
+        if n is None:
+            return self.parameters.population.x[:, start].reshape(-1, 1)
+        return (
+            self.parameters.population.x[:, start:stop].T,
+            np.arange(start, stop) + self.ticket_offset,
+        )
 
     @check_break_conditions
-    def tell(self, xi: np.ndarray, fi: float) -> None:
-        """Process a provided fitness value fi for a given individual xi.
+    def tell(self, xi: np.ndarray, fi: typing.Union[float, np.ndarray]) -> None:
+        """Process provided fitness values for previously asked individuals.
+
+        Either tickets and fitness values, as returned by and computed for ask(n), or
+        a single individual returned by ask() and its fitness value can be given.
+        The latter requires a search for xi in the current generation.
 
         Parameters
         ----------
         xi: np.ndarray
-            An individual previously returned by ask()
+            An integer (array of) ticket(s) or an individual previously returned by ask()
         fi: float
-            The fitness value for xi
+            The fitness value(s) for xi
+
         Raises
         ------
         RuntimeError
             When ask() is not called before tell()
         ValueError
-            When an unknown xi is provided to the method
+            When an unknown xi or ticket is provided to the method
 
         Warns
         -----
         UserWarning
-            When the same xi is provided more than once
+            When the same xi or ticket is provided more than once
 
         """
-        #pylint: disable=singleton-comparison
         if not self.parameters.population:
             raise RuntimeError("Call to tell without calling ask first is prohibited")
 
-        indices, *_ = np.where((self.parameters.population.x == xi).all(axis=0))
-        if len(indices) == 0:
-            raise ValueError("Unkown xi provided")
-
-        for index in indices:
-            if self.parameters.population.f[index] == None: # noqa
-                self.parameters.population.f[index] = fi
-                break
+        xi = np.asarray(xi)
+        if np.issubdtype(xi.dtype, np.integer):
+            indices = np.atleast_1d(xi) - self.ticket_offset
+            if ((indices < 0) | (indices >= self.n_asked)).any():
+                raise ValueError("Unknown or expired ticket provided")
         else:
+            indices, *_ = np.where(
+                (self.parameters.population.x[:, : self.n_asked] == xi).all(axis=0)
+            )
+            if len(indices) == 0:
+                raise ValueError("Unkown xi provided")
+            untold = indices[~self.told[indices]]
+            indices = untold[:1] if len(untold) else indices[-1:]
+
+        fi = np.broadcast_to(fi, indices.shape)
+        new = np.unique(indices[~self.told[indices]])
+        if len(new) < len(indices):
             warnings.warn("Repeated call to tell with same xi", UserWarning)
-            self.parameters.population.f[index] = fi
+        self.told[new] = True
+        self.n_told += len(new)
+        self.parameters.population.f[indices] = fi
+        self.parameters.used_budget += len(indices)
 
-        self.parameters.used_budget += 1
-        if len(self.ask_queue) == 0 and (self.parameters.population.f != None).all(): # noqa
+        if self.n_told == self.parameters.population.n:
             self.select()
             self.recombine()
             self.parameters.adapt()
-            self.mutate()
+            self.sample_generation()
@@ -0,0 +1,248 @@
+"""Steady-state ask and tell interface and asynchronous driver for the Modular CMA-ES."""
+import asyncio
+import typing
+from collections import deque
+
+import numpy as np
+
+from .asktellcmaes import AskTellCMAES, check_break_conditions
+from .population import Population
+
+
+class SteadyStateCMAES(AskTellCMAES):
+    """Steady-state ask tell interface for the ModularCMAES.
+
+    In contrast to ~AskTellCMAES, there is no generational barrier: ask(n) always
+    samples n new individuals from the current search distribution, and the
+    distribution is updated after every update_interval told individuals, using
+    the lambda_ most recently told individuals as population.
+
+    Individuals that are told after the distribution was updated since they were
+    sampled are stale. Their age is the number of updates in between. With
+    stale = 'discard', individuals older than max_age updates are not used. With
+    stale = 'reweight', the mutation vectors y and z of stale individuals are
+    recomputed w.r.t. the current distribution, and y is shortened such that its
+    Mahalanobis norm is at most sqrt(d) + 2d / (d + 2), as for injected solutions:
+        Nikolaus Hansen. Injecting External Solutions Into CMA-ES.
+        CoRR, abs/1110.4181, 2011.
+
+    Attributes
+    ----------
+    update_interval: int
+        The number of told individuals between two updates, lambda_ when None
+    stale: str
+        The policy for stale individuals, either 'discard' or 'reweight'
+    max_age: int
+        The maximal age of individuals used when stale = 'discard'
+    version: int
+        The number of updates of the search distribution
+    pending: dict
+        Individuals returned by ask that are not yet told, by ticket
+    results: collections.deque
+        The most recently told individuals, with their fitness and version
+    n_told: int
+        The number of used individuals told since the last update
+    n_discarded: int
+        The number of told individuals dropped from results, because they were
+        stale or sampled before the last restart
+    restart_version: int
+        The version at the last restart, individuals sampled before are discarded
+
+    """
+
+    def __init__(
+        self, *args, update_interval: int = None, stale: str = "discard",
+        max_age: int = 1, **kwargs
+    ) -> None:
+        """Set the update policy and forward all other parameters to ~AskTellCMAES."""
+        super().__init__(*args, **kwargs)
+        if stale not in ("discard", "reweight"):
+            raise ValueError(f"stale should be 'discard' or 'reweight', got {stale}")
+        if (
+            self.parameters.step_size_adaptation == "tpa"
+            or self.parameters.mirrored == "mirrored pairwise"
+        ):
+            raise NotImplementedError(
+                "tpa and pairwise selection are not implemented "
+                "for the steady-state interface"
+            )
+        self.update_interval = update_interval
+        self.stale = stale
+        self.max_age = max_age
+        self.version = 0
+        self.pending = dict()
+        self.results = deque()
+        self.n_discarded = 0
+        self.n_restarts = len(self.parameters.restarts)
+        self.restart_version = 0
+
+    @check_break_conditions
+    def ask(self, n: int = None) -> typing.Union[np.ndarray, typing.Tuple[np.ndarray, np.ndarray]]:
+        """Sample new individual(s) from the current search distribution.
+
+        Parameters
+        ----------
+        n: int = None
+            The number of individuals to return. When None, a single individual
+            is returned as a (d, 1) vector, to be told with tell(xi, fi).
+
+        Returns
+        -------
+        np.ndarray
+            When n is None, the (d, 1) individual
+        (np.ndarray, np.ndarray)
+            Otherwise an (n, d) matrix of individuals and their n tickets
+
+        """
+        x, y, z, s = self.sample(1 if n is None else n)
+        tickets = np.arange(x.shape[1]) + self.ticket_offset
+        self.ticket_offset += x.shape[1]
+        for i, ticket in enumerate(tickets):
+            self.pending[int(ticket)] = (x[:, i], y[:, i], z[:, i], s[i], self.version)
+        if n is None:
+            return x[:, :1]
+        return x.T, tickets
+
+    @check_break_conditions
+    def tell(self, xi: np.ndarray, fi: typing.Union[float, np.ndarray]) -> None:
+        """Process provided fitness values for previously asked individuals.
+
+        Parameters
+        ----------
+        xi: np.ndarray
+            An integer (array of) ticket(s) or an individual previously returned by ask()
+        fi: float
+            The fitness value(s) for xi
+
+        Raises
+        ------
+        ValueError
+            When an unknown, or already told, xi or ticket is provided to the method
+
+        """
+        xi = np.asarray(xi)
+        if np.issubdtype(xi.dtype, np.integer):
+            tickets = np.atleast_1d(xi).tolist()
+        else:
+            tickets = [
+                ticket for ticket, (x, *_) in self.pending.items()
+                if (x == xi.ravel()).all()
+            ][:1]
+            if len(tickets) == 0:
+                raise ValueError("Unknown xi provided")
+        if any(ticket not in self.pending for ticket in tickets):
+            raise ValueError("Unknown or expired ticket provided")
+
+        for ticket, f in zip(tickets, np.broadcast_to(fi, len(tickets))):
+            x, y, z, s, version = self.pending.pop(ticket)
+            self.parameters.used_budget += 1
+            if version < self.restart_version:
+                self.n_discarded += 1
+                continue
+            self.results.append((x, y, z, s, f, version))
+            self.n_told += 1
+
+        if (
+            self.n_told >= (self.update_interval or self.parameters.lambda_)
+            and len(self.results) >= self.parameters.mu
+        ):
+            self.update()
+
+    def update(self) -> None:
+        """Update the search distribution with the most recently told individuals."""
+        while len(self.results) > self.parameters.lambda_:
+            self.results.popleft()
+
+        results = list(self.results)
+        age = self.version - np.array([version for *_, version in results])
+        if self.stale == "discard" and (age > self.max_age).any():
+            self.n_discarded += int((age > self.max_age).sum())
+            results = [r for r, a in zip(results, age) if a <= self.max_age]
+            self.results = deque(results)
+            if len(results) < self.parameters.mu:
+                return
+
+        x, y, z, s, f, _ = (np.array(column) for column in zip(*results))
+        x, y, z = (np.asfortranarray(a.T) for a in (x, y, z))
+        if self.stale == "reweight" and age.any():
+            y[:, age > 0] = (x[:, age > 0] - self.parameters.m) / self.parameters.sigma
+            z[:, age > 0] = self.parameters.transform_inverse(y[:, age > 0])
+            norm = np.linalg.norm(z, axis=0)
+            bound = np.sqrt(self.parameters.d) + 2 * self.parameters.d / (self.parameters.d + 2)
+            scale = np.where(age > 0, np.minimum(1, bound / np.maximum(norm, 1e-300)), 1)
+            y *= scale
+            z *= scale
+            s[age > 0] = self.parameters.sigma
+
+        self.parameters.population = Population(x, y, z, f.astype(float), s)
+        self.select()
+        self.recombine()
+        self.parameters.adapt()
+        self.version += 1
+        self.n_told = 0
+        if len(self.parameters.restarts) != self.n_restarts:
+            self.n_restarts = len(self.parameters.restarts)
+            self.restart_version = self.version
+            self.results.clear()
+
+
+async def run_async(
+    optimizer: AskTellCMAES, objective: typing.Callable, n_workers: int,
+    executor: typing.Any = None
+) -> AskTellCMAES:
+    """Optimize objective, keeping up to n_workers evaluations in flight.
+
+    The individuals are requested with optimizer.ask(n) and the fitness values are
+    told as soon as they arrive. With a ~AskTellCMAES, evaluations can only start
+    once the previous generation is complete, a ~SteadyStateCMAES has no such barrier.
+
+    Parameters
+    ----------
+    optimizer: AskTellCMAES
+        A (steady-state) ask tell optimizer
+    objective: typing.Callable
+        The objective function, called with a single individual. Either a
+        coroutine function, or a regular function which is run in executor.
+    n_workers: int
+        The maximum number of concurrent evaluations
+    executor: concurrent.futures.Executor = None
+        The executor for a regular objective function, the default executor
+        of the event loop when None
+
+    Returns
+    -------
+    AskTellCMAES
+        The optimizer. When a break condition is met, the evaluations still in
+        flight are cancelled, and those already finished are told.
+
+    """
+    loop = asyncio.get_running_loop()
+    is_coroutine = asyncio.iscoroutinefunction(objective) or asyncio.iscoroutinefunction(
+        getattr(objective, "__call__", None)
+    )
+    in_flight = dict()
+    while True:
+        budget = optimizer.parameters.budget - optimizer.parameters.used_budget
+        n = min(n_workers - len(in_flight), budget - len(in_flight))
+        if n > 0 and not any(optimizer.break_conditions):
+            x, tickets = optimizer.ask(n)
+            for xi, ticket in zip(x, tickets):
+                if is_coroutine:
+                    future = asyncio.ensure_future(objective(xi.copy()))
+                else:
+                    future = loop.run_in_executor(executor, objective, xi.copy())
+                in_flight[future] = ticket
+        if not in_flight:
+            return optimizer
+
+        done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+        tickets = np.array([in_flight.pop(future) for future in done])
+        fitness = np.array([future.result() for future in done])
+        if any(optimizer.break_conditions):
+            for future in in_flight:
+                future.cancel()
+            # the evaluations in done are finished, tell them although the optimizer
+            # terminated, such that used_budget counts every completed evaluation
+            type(optimizer).tell.__wrapped__(optimizer, tickets, fitness)
+            return optimizer
+        optimizer.tell(tickets, fitness)
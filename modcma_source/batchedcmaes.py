@@ -0,0 +1,379 @@
+"""Batched implementation of Modular CMA-ES, advancing many independent runs in lockstep."""
+from typing import Callable, List, Sequence
+
+import numpy as np
+from scipy import linalg
+
+from .bounds import correct_bounds
+from .modularcmaes import ModularCMAES
+from .population import Population
+
+
+class BatchedCMAES:
+    r"""Advance R independent ModularCMAES runs in lockstep.
+
+    The dynamic state of all runs (m, C, B, D, inv_root_C, sigma, ps and pc) is held
+    in stacked (R, d, d) and (R, d, 1) arrays. Every generation, mutation, selection,
+    recombination and the rank-mu update are performed with a single batched numpy
+    call for all runs that share a population size, and the adaptation of the
+    evolution paths, sigma and the covariance matrix with a single call for all runs
+    that are still active. The covariance matrices are decomposed per run with
+    scipy's eigh, as in Parameters.perform_eigendecomposition, since a stacked
+    np.linalg.eigh uses a different LAPACK driver.
+
+    Bookkeeping which is inherently per run (record_statistics, termination criteria
+    and local restarts) is delegated to the Parameters of a ModularCMAES object per
+    run, whose state arrays are views into the stacked arrays. Runs that restart
+    are reinitialized individually, runs that meet their break conditions are masked
+    out of subsequent generations.
+
+    Each run draws its random numbers from its own random number generator
+    (Parameters.rng). For an integer seed this is a np.random.RandomState, such that
+    run r produces exactly the results of a sequential ModularCMAES run started
+    after np.random.seed(seeds[r]).
+
+    Attributes
+    ----------
+    optimizers: List[ModularCMAES]
+        One optimizer per run, holding the Parameters of that run
+    running: np.ndarray
+        Boolean mask denoting which runs have not met their break conditions
+
+    """
+
+    __stacked__ = ("m", "m_old", "C", "B", "D", "inv_root_C", "ps", "pc")
+    __constants__ = (
+        "cs", "cc", "c1", "cmu", "damps", "mueff", "chiN", "ps_factor", "lambda_", "mu",
+    )
+    __supported__ = dict(
+        elitist=False,
+        sequential=False,
+        threshold_convergence=False,
+        orthogonal=False,
+        sample_sigma=False,
+        mirrored=None,
+        base_sampler="gaussian",
+        step_size_adaptation="csa",
+        lazy_eigendecomposition=False,
+        symmetric_update=False,
+        covariance_model="full",
+    )
+
+    def __init__(
+        self,
+        fitness_funcs: Sequence[Callable],
+        *args,
+        seeds: Sequence = None,
+        **kwargs
+    ) -> None:
+        """Create one ModularCMAES per fitness function and stack their state.
+
+        Parameters
+        ----------
+        fitness_funcs: Sequence[Callable]
+            One objective function per run
+        seeds: Sequence = None
+            One random seed per run, defaults to range(len(fitness_funcs)).
+            Integer seeds seed a np.random.RandomState, anything else (e.g. a
+            np.random.Generator or SeedSequence) is passed on as the rng of the run.
+        *args, **kwargs
+            Passed into the constructor of every ModularCMAES
+
+        Raises
+        ------
+        ValueError
+            When the number of seeds differs from the number of fitness functions
+        NotImplementedError
+            When a module is enabled which is not supported by the batched engine
+
+        """
+        seeds = range(len(fitness_funcs)) if seeds is None else seeds
+        if len(seeds) != len(fitness_funcs):
+            raise ValueError("Provide exactly one seed per fitness function")
+
+        self.optimizers: List[ModularCMAES] = [
+            ModularCMAES(
+                func,
+                *args,
+                rng=np.random.RandomState(seed) if isinstance(seed, (int, np.integer)) else seed,
+                **kwargs
+            )
+            for func, seed in zip(fitness_funcs, seeds)
+        ]
+
+        parameters = self.optimizers[0].parameters
+        for name, value in self.__supported__.items():
+            if getattr(parameters, name) != value:
+                raise NotImplementedError(
+                    f"{name}={getattr(parameters, name)} is not supported "
+                    "by the batched engine"
+                )
+
+        n_runs, d = len(self.optimizers), parameters.d
+        for name in self.__stacked__:
+            shape = (n_runs, d, d) if name in ("C", "B", "inv_root_C") else (n_runs, d, 1)
+            setattr(self, name, np.empty(shape, dtype=np.float64))
+        for name in self.__constants__:
+            setattr(self, name, np.empty(n_runs, dtype=np.float64))
+        self.sigma = np.empty(n_runs, dtype=np.float64)
+        self.pwsum = np.empty(n_runs, dtype=np.float64)
+        self.ub = np.stack([o.parameters.ub for o in self.optimizers])
+        self.lb = np.stack([o.parameters.lb for o in self.optimizers])
+        for r in range(n_runs):
+            self.pull(r)
+        self.running = np.ones(n_runs, dtype=bool)
+        self.populations = [None] * n_runs
+
+    def pull(self, r: int) -> None:
+        """Copy the state of run r into the stacked arrays.
+
+        Called after (re)initialization of the Parameters of run r. Afterwards,
+        the state arrays of those Parameters are views into the stacked arrays.
+
+        Parameters
+        ----------
+        r: int
+            The index of the run
+
+        """
+        parameters = self.optimizers[r].parameters
+        for name in self.__stacked__:
+            stacked = getattr(self, name)
+            stacked[r] = getattr(parameters, name).reshape(stacked.shape[1:])
+            setattr(parameters, name, stacked[r])
+        for name in self.__constants__:
+            getattr(self, name)[r] = getattr(parameters, name)
+        self.sigma[r] = parameters.sigma
+        self.pwsum[r] = parameters.pweights.sum()
+
+    def step(self) -> bool:
+        """Run one generation for every active run.
+
+        Returns
+        -------
+        bool
+            Denoting whether any of the runs is still active.
+
+        """
+        active = np.flatnonzero(self.running)
+        cohorts = self.lambda_[active] * (self.mu.max() + 1) + self.mu[active]
+        runs, rank_mu = zip(
+            *(self.generation(active[cohorts == cohort]) for cohort in np.unique(cohorts))
+        )
+        active = np.concatenate(runs)
+        if len(active) == 0:
+            return bool(self.running.any())
+        self.adapt(active, np.concatenate(rank_mu))
+
+        for r in active:
+            parameters = self.optimizers[r].parameters
+            parameters.sigma = self.sigma[r]
+            parameters.population = self.populations[r]
+            parameters.record_statistics()
+            parameters.calculate_termination_criteria()
+            if any(parameters.termination_criteria.values()):
+                parameters.perform_local_restart()
+                self.pull(r)
+            self.running[r] = not any(self.optimizers[r].break_conditions)
+        return bool(self.running.any())
+
+    def generation(self, runs: np.ndarray) -> np.ndarray:
+        """Mutate, select and recombine for a cohort of runs with equal population size.
+
+        Parameters
+        ----------
+        runs: np.ndarray
+            The indices of the runs in the cohort
+
+        Runs for which the remaining budget does not allow for a complete
+        population finish their last generation sequentially, see finish.
+
+        Returns
+        -------
+        np.ndarray
+            The indices of the runs which completed the generation
+        np.ndarray
+            The (len(runs), d, d) stack of rank-mu updates
+
+        """
+        parameters = self.optimizers[runs[0]].parameters
+        n, mu = parameters.lambda_, parameters.mu
+        d = parameters.d
+
+        z = np.empty((len(runs), d, n))
+        for i, r in enumerate(runs):
+            z[i] = self.optimizers[r].parameters.rng.normal(size=(n, d)).T
+        s = np.repeat(self.sigma[runs, None], n, axis=1)
+        y = self.B[runs] @ (self.D[runs] * z)
+        x = np.empty((len(runs), n, d)).transpose(0, 2, 1)
+        np.add(self.m[runs], s[:, None, :] * y, out=x)
+
+        if parameters.bound_correction in ("COTN", "unif_resample"):
+            n_out_of_bounds = np.empty(len(runs), dtype=int)
+            for i, r in enumerate(runs):
+                x[i], n_out_of_bounds[i] = correct_bounds(
+                    x[i], self.ub[r], self.lb[r], parameters.bound_correction,
+                    self.optimizers[r].parameters.rng
+                )
+        else:
+            x, n_out_of_bounds = correct_bounds(
+                x, self.ub[runs], self.lb[runs], parameters.bound_correction
+            )
+
+        f = np.empty((len(runs), n))
+        complete = np.ones(len(runs), dtype=bool)
+        for i, r in enumerate(runs):
+            optimizer = self.optimizers[r]
+            optimizer.parameters.n_out_of_bounds += n_out_of_bounds[i]
+            if not optimizer.vectorized_fitness:
+                for j in range(n):
+                    f[i, j] = optimizer.fitness_func(x[i, :, j])
+                continue
+            fi = optimizer.evaluate(x[i])
+            f[i, : len(fi)] = fi
+            if len(fi) < n:
+                complete[i] = False
+                x_i, y_i, z_i = (a[i, :, : len(fi)] for a in (x, y, z))
+                self.finish(r, Population(x_i, y_i, z_i, fi, s[i, : len(fi)]))
+
+        if not complete.all():
+            runs, x, y, z, f, s = (a[complete] for a in (runs, x, y, z, f, s))
+
+        # Sorted individuals are stored column-major per run, the memory layout
+        # Population.sort produces, such that the BLAS calls below see the same
+        # operands as the sequential implementation.
+        rank = np.argsort(f, axis=1, kind="stable")
+        f = np.take_along_axis(f, rank, axis=1)
+        cohort = np.arange(len(runs))[:, None]
+        x, y, z = (a.transpose(0, 2, 1)[cohort, rank].transpose(0, 2, 1) for a in (x, y, z))
+
+        for i, r in enumerate(runs):
+            self.populations[r] = Population(x[i], y[i], z[i], f[i], s[i])
+            if f[i, 0] < self.optimizers[r].parameters.fopt:
+                self.optimizers[r].parameters.fopt = f[i, 0]
+                self.optimizers[r].parameters.xopt = x[i, :, 0]
+
+        m_old = self.m[runs]
+        self.m_old[runs] = m_old
+        self.m[runs] = m_old + ((x[:, :, :mu] - m_old) @ parameters.pweights)[:, :, None]
+
+        if parameters.active:
+            wy = parameters.weights[:n] * y
+        else:
+            y = y[:, :, :mu]
+            wy = parameters.pweights * y
+        return runs, parameters.cmu * (wy @ y.transpose(0, 2, 1))
+
+    def finish(self, r: int, population: Population) -> None:
+        """Complete the last, budget truncated generation of run r sequentially.
+
+        Parameters
+        ----------
+        r: int
+            The index of the run
+        population: Population
+            The unsorted individuals which could be evaluated within the budget
+
+        """
+        optimizer = self.optimizers[r]
+        optimizer.parameters.population = population
+        optimizer.select()
+        if optimizer.parameters.population.n >= optimizer.parameters.mu:
+            optimizer.recombine()
+            optimizer.adapt()
+        self.running[r] = False
+
+    def adapt(self, runs: np.ndarray, rank_mu: np.ndarray) -> None:
+        """Adapt the evolution paths, sigma and the covariance matrix of the given runs.
+
+        Batched equivalent of Parameters.adapt_evolution_paths, adapt_sigma,
+        adapt_covariance_matrix and perform_eigendecomposition.
+
+        Parameters
+        ----------
+        runs: np.ndarray
+            The indices of the active runs
+        rank_mu: np.ndarray
+            The (len(runs), d, d) stack of rank-mu updates
+
+        """
+        cs, cc, c1, cmu, mueff, chiN = (
+            getattr(self, name)[runs] for name in ("cs", "cc", "c1", "cmu", "mueff", "chiN")
+        )
+        d = self.C.shape[1]
+        sigma = self.sigma[runs]
+        used_budget = np.array([self.optimizers[r].parameters.used_budget for r in runs])
+
+        dm = (self.m[runs] - self.m_old[runs]) / sigma[:, None, None]
+        ps = (1 - cs)[:, None, None] * self.ps[runs] + (
+            np.sqrt(cs * (2 - cs) * mueff)[:, None, None] * self.inv_root_C[runs] @ dm
+        ) * self.ps_factor[runs, None, None]
+        norm_ps = np.sqrt((ps.transpose(0, 2, 1) @ ps)[:, 0, 0])
+
+        hs = (
+            norm_ps
+            / np.sqrt(1 - np.power(1 - cs, 2 * (used_budget / self.lambda_[runs])))
+        ) < (1.4 + (2 / (d + 1))) * chiN
+        pc = (1 - cc)[:, None, None] * self.pc[runs] + (
+            hs * np.sqrt(cc * (2 - cc) * mueff)
+        )[:, None, None] * dm
+
+        sigma = sigma * np.exp(
+            (cs / self.damps[runs]) * ((norm_ps / chiN) - 1)
+        )
+
+        rank_one = c1[:, None, None] * pc * pc.transpose(0, 2, 1)
+        dhs = (1 - hs) * cc * (2 - cc)
+        old_C = (
+            1 - (c1 * dhs) - c1 - (cmu * self.pwsum[runs])
+        )[:, None, None] * self.C[runs]
+        C = old_C + rank_one + rank_mu
+
+        self.ps[runs], self.pc[runs], self.sigma[runs] = ps, pc, sigma
+        for r, hs_r in zip(runs, hs):
+            self.optimizers[r].parameters.hs = hs_r
+
+        degenerated = (
+            np.isinf(C).any(axis=(1, 2))
+            | np.isnan(C).any(axis=(1, 2))
+            | ~((1e-16 < sigma) & (sigma < 1e6))
+        )
+        C = np.triu(C[~degenerated]) + np.triu(C[~degenerated], 1).transpose(0, 2, 1)
+        D, B = np.empty(C.shape[:2]), np.empty(C.shape)
+        for i, Ci in enumerate(C):
+            D[i], B[i] = linalg.eigh(Ci)
+        positive = np.all(D > 0, axis=1)
+        D = np.sqrt(D[positive, :, None])
+        B = B[positive]
+
+        valid = runs[~degenerated][positive]
+        self.C[runs[~degenerated]] = C
+        self.D[valid] = D
+        self.B[valid] = B
+        self.inv_root_C[valid] = B @ (D ** -1 * B.transpose(0, 2, 1))
+
+        for r in np.setdiff1d(runs, valid):
+            self.optimizers[r].parameters.init_dynamic_parameters()
+            self.pull(r)
+
+    def run(self) -> "BatchedCMAES":
+        """Run the step method until all runs met their break conditions.
+
+        Returns
+        -------
+        BatchedCMAES
+
+        """
+        while self.step():
+            pass
+        for optimizer in self.optimizers:
+            optimizer.parameters.flush_history()
+        return self
+
+    def __repr__(self):
+        """Representation of BatchedCMAES."""
+        return f"<{self.__class__.__qualname__}: {len(self.optimizers)} runs>"
+
+    def __str__(self):
+        """String representation of BatchedCMAES."""
+        return repr(self)
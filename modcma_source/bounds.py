@@ -0,0 +1,197 @@
+"""In-place bound correction for the Modular CMA-ES."""
+from typing import Tuple
+
+import numpy as np
+
+
+def correct(
+    x: np.ndarray,
+    lb: np.ndarray,
+    ub: np.ndarray,
+    correction_method: str,
+    rng=None,
+    width: np.ndarray = None,
+    buffers: Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray] = None,
+) -> np.ndarray:
+    """Correct the out-of-bounds coordinates of x in place.
+
+    Available strategies are:
+    - None: Don't perform any boundary correction
+    - unif_resample: Resample each coordinate out of bounds uniformly within bounds
+    - mirror: Mirror each coordinate around the boundary
+    - COTN: Resample each coordinate out of bounds using the one-sided normal
+    distribution with variance 1/3 (bounds scaled to [0,1])
+    - saturate: Set each out-of-bounds coordinate to the boundary
+    - toroidal: Reflect the out-of-bounds coordinates to the oposite bound inwards
+
+    The random numbers for COTN and unif_resample are only drawn for the
+    out-of-bounds coordinates, in row-major order.
+
+    Parameters
+    ----------
+    x: np.ndarray
+        (d, n) matrix of which the bounds should be corrected, or a stack
+        of such matrices with shape (R, d, n)
+    lb: np.ndarray
+        lower bound, broadcastable to x
+    ub: np.ndarray
+        upper bound, broadcastable to x
+    correction_method: string
+        type of correction to perform
+    rng: np.random.Generator or np.random.RandomState = None
+        The random number generator used by COTN and unif_resample,
+        the global np.random state when None
+    width: np.ndarray = None
+        ub - lb, computed when None
+    buffers: tuple = None
+        Two boolean and two float scratch arrays with the shape of x,
+        allocated when None
+
+    Returns
+    -------
+    np.ndarray
+        the number of coordinates out of bounds of each individual,
+        with shape x.shape[:-2] + (n, )
+
+    Raises
+    ------
+    ValueError
+        When an unkown value for correction_method is provided
+
+    """
+    if buffers is None:
+        buffers = (
+            np.empty(x.shape, dtype=bool), np.empty(x.shape, dtype=bool),
+            np.empty(x.shape), np.empty(x.shape)
+        )
+    out_of_bounds, below, work, floor = buffers
+    np.greater(x, ub, out=out_of_bounds)
+    np.less(x, lb, out=below)
+    np.logical_or(out_of_bounds, below, out=out_of_bounds)
+    counts = out_of_bounds.sum(axis=-2)
+    if correction_method is None or not out_of_bounds.any():
+        return counts
+
+    if width is None:
+        width = ub - lb
+
+    if correction_method == "saturate":
+        np.clip(x, lb, ub, out=x)
+    elif correction_method in ("mirror", "toroidal"):
+        np.subtract(x, lb, out=work)
+        np.divide(work, width, out=work)
+        np.floor(work, out=floor)
+        np.subtract(work, floor, out=work)
+        if correction_method == "mirror":
+            np.mod(floor, 2, out=floor)
+            np.subtract(work, floor, out=work)
+        np.abs(work, out=work)
+        np.multiply(work, width, out=work)
+        np.add(work, lb, out=work)
+        np.copyto(x, work, where=out_of_bounds)
+    elif correction_method in ("COTN", "unif_resample"):
+        rng = rng or np.random
+        lb = np.broadcast_to(lb, x.shape)[out_of_bounds]
+        if correction_method == "COTN":
+            width = np.broadcast_to(width, x.shape)[out_of_bounds]
+            y = (x[out_of_bounds] - lb) / width
+            x[out_of_bounds] = lb + width * np.abs(
+                (y > 0) - np.abs(rng.normal(0, 1 / 3, size=y.shape))
+            )
+        else:
+            x[out_of_bounds] = rng.uniform(lb, np.broadcast_to(ub, x.shape)[out_of_bounds])
+    else:
+        raise ValueError(f"Unknown argument: {correction_method} for correction_method")
+    return counts
+
+
+def correct_bounds(
+    x: np.ndarray, ub: np.ndarray, lb: np.ndarray, correction_method: str, rng=None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Bound correction function.
+
+    Rescales x to fall within the lower lb and upper bounds ub specified,
+    see correct for the available strategies.
+
+    Parameters
+    ----------
+    x: np.ndarray
+        (d, n) matrix of which the bounds should be corrected, or a stack
+        of such matrices with shape (R, d, n)
+    ub: float
+        upper bound
+    lb: float
+        lower bound
+    correction_method: string
+        type of correction to perform
+    rng: np.random.Generator or np.random.RandomState = None
+        The random number generator used by COTN and unif_resample,
+        the global np.random state when None
+
+    Returns
+    -------
+    np.ndarray
+        bound corrected version of x, corrected in place
+    int
+        the number of individuals out of bounds, one per matrix for stacked x
+
+    """
+    counts = correct(x, lb, ub, correction_method, rng)
+    return x, np.count_nonzero(counts, axis=-1)
+
+
+class BoundCorrection:
+    """In-place bound correction with precomputed bounds and scratch buffers.
+
+    Attributes
+    ----------
+    correction_method: str
+        The type of correction, see correct
+    lb: np.ndarray
+        (d, 1) lower bound
+    ub: np.ndarray
+        (d, 1) upper bound
+    width: np.ndarray
+        (d, 1) ub - lb
+    rng: np.random.Generator or np.random.RandomState
+        The random number generator used by COTN and unif_resample
+    buffers: tuple
+        The scratch arrays of correct, reallocated when a larger
+        number of individuals is corrected
+
+    """
+
+    def __init__(
+        self, d: int, lb: np.ndarray, ub: np.ndarray, correction_method: str, rng=None
+    ) -> None:
+        """Broadcast the bounds to (d, 1) arrays."""
+        self.correction_method = correction_method
+        self.lb = np.array(np.broadcast_to(np.reshape(lb, (-1, 1)), (d, 1)), dtype=float)
+        self.ub = np.array(np.broadcast_to(np.reshape(ub, (-1, 1)), (d, 1)), dtype=float)
+        self.width = self.ub - self.lb
+        self.rng = rng
+        self.buffers = ()
+
+    def __call__(self, x: np.ndarray) -> np.ndarray:
+        """Correct the (d, n) matrix x in place.
+
+        Parameters
+        ----------
+        x: np.ndarray
+            (d, n) matrix of individuals
+
+        Returns
+        -------
+        np.ndarray
+            the number of coordinates out of bounds of each individual
+
+        """
+        d, n = x.shape
+        if not self.buffers or self.buffers[0].shape[1] < n:
+            self.buffers = tuple(
+                np.empty((n, d), dtype=dtype).T for dtype in (bool, bool, float, float)
+            )
+        return correct(
+            x, self.lb, self.ub, self.correction_method, self.rng,
+            self.width, tuple(buffer[:, :n] for buffer in self.buffers)
+        )
@@ -1,14 +1,14 @@
 """Main implementation of Modular CMA-ES."""
 from inspect import Parameter
 import os
-from itertools import islice
-from typing import List, Callable
+from typing import List, Callable, Tuple
 
 import numpy as np
 
+from .bounds import correct_bounds
 from .parameters import Parameters
 from .population import Population
-from .utils import timeit, ert
+from .utils import timeit, ert, accepts_matrix, Profiler
 
 
 class ModularCMAES:
@@ -18,6 +18,15 @@ class ModularCMAES:
     ----------
     _fitness_func: callable
         The objective function to be optimized
+    vectorized_fitness: bool
+        Whether _fitness_func is called once per generation with an
+        (n, d) matrix, rather than once per individual
+    specialized_step: callable
+        The step function specialized to the module configuration, which is
+        used by run, see build_step
+    profiler: Profiler
+        The time and call counts of the phases of the generation loop, None when
+        profiling is disabled, see enable_profiling
     parameters: Parameters
         All the parameters of the CMA ES algorithm are stored in
         the parameters object. Note if a parameters object is not
@@ -34,22 +43,53 @@ class ModularCMAES:
     parameters: "Parameters"
     _fitness_func: Callable
 
+    __profiled__ = dict(
+        sample="sampling",
+        evaluate="evaluation",
+        fitness_func="evaluation",
+        select="selection",
+        recombine="recombination",
+        step="other",
+    )
+    __profiled_parameters__ = dict(
+        correct_out_of_bounds="bound correction",
+        adapt_evolution_paths="evolution paths",
+        adapt_sigma="step size",
+        adapt_covariance_matrix="covariance matrix",
+        perform_eigendecomposition="eigendecomposition",
+        record_statistics="statistics",
+        calculate_termination_criteria="termination criteria",
+        perform_local_restart="restart",
+    )
+
     def __init__(
-        self, fitness_func: Callable, *args, parameters=None, **kwargs
+        self, fitness_func: Callable, *args, parameters=None, profile: bool = False,
+        **kwargs
     ) -> None:
-        """Set _fitness_func and forwards all other parameters to Parameters object."""
+        """Set _fitness_func and forwards all other parameters to Parameters object.
+
+        When profile is True, profiling is enabled, see enable_profiling.
+        """
         self._fitness_func = fitness_func
         self.parameters = (
             parameters
             if isinstance(parameters, Parameters)
             else Parameters(*args, **kwargs)
         )
+        self.vectorized_fitness = (
+            self.parameters.vectorized_fitness or accepts_matrix(fitness_func)
+        )
+        self.profiler = None
+        if profile:
+            self.enable_profiling()
+        self._step_configuration = self.step_configuration()
+        self.specialized_step = self.build_step()
 
     def mutate(self) -> None:
         """Apply mutation operation.
 
-        First, a directional vector zi is sampled from a sampler object
-        as defined in the self.parameters object. Then, this zi vector is
+        First, a (d, n_offspring) block of directional vectors zi is sampled from
+        the block sampler defined in the self.parameters object. Then, each zi vector is
         multiplied with the eigenvalues D, and the dot product is taken with the
         eigenvectors B of the covariance matrix C in order to create a scaled
         directional mutation vector yi. By scaling this vector with current population
@@ -60,7 +100,8 @@ class ModularCMAES:
         If the step size adaptation method is 'tpa', two less 'normal'
         individuals are created.
 
-        #TODO: make bound correction vectorized and integrate with tpa
+        If the objective function accepts an (n, d) matrix (see vectorized_fitness),
+        all individuals are evaluated with a single call, see evaluate.
         """
         perform_tpa = bool(
             self.parameters.step_size_adaptation == "tpa"
@@ -68,35 +109,14 @@ class ModularCMAES:
         )
 
         n_offspring = int(self.parameters.lambda_ - (2 * perform_tpa))
+        x, y, z, s = self.sample(n_offspring)
 
-        if self.parameters.step_size_adaptation == 'lp-xnes' or self.parameters.sample_sigma:
-            s = np.random.lognormal(
-                np.log(self.parameters.sigma),
-                self.parameters.beta, size=n_offspring
-            )
-        else:
-            s = np.ones(n_offspring) * self.parameters.sigma
-
-        z = np.hstack(tuple(islice(self.parameters.sampler, n_offspring)))
-
-        if self.parameters.threshold_convergence:
-            z = scale_with_threshold(z, self.parameters.threshold)
-
-        y = np.dot(self.parameters.B, self.parameters.D * z)
-        x = self.parameters.m + (s * y)
-        x, n_out_of_bounds = correct_bounds(
-            x, 
-            self.parameters.ub,
-            self.parameters.lb,
-            self.parameters.bound_correction
-        )
-        self.parameters.n_out_of_bounds += n_out_of_bounds
-    
-        if not self.parameters.sequential and self.parameters.vectorized_fitness:
-            f = self._fitness_func(x.T)
-            self.parameters.used_budget += len(x.T)       
+        if not self.parameters.sequential and self.vectorized_fitness:
+            f = self.evaluate(x)
+            n = len(f)
+            x, y, z, s = x[:, :n], y[:, :n], z[:, :n], s[:n]
         else:
-            f = np.empty(n_offspring, object)
+            f = np.empty(n_offspring, dtype=np.float64)
             for i in range(n_offspring):
                 f[i] = self.fitness_func(x[:, i])
                 if self.sequential_break_conditions(i, f[i]):
@@ -108,7 +128,7 @@ class ModularCMAES:
 
         if perform_tpa:
             yt, xt, ft = tpa_mutation(self.fitness_func, self.parameters)
-            zt = self.parameters.inv_root_C.dot(self.parameters.dm)
+            zt = self.parameters.transform_inverse(self.parameters.dm)
             z = np.c_[zt, -zt, z]
             y = np.c_[yt, y]
             x = np.c_[xt, x]
@@ -120,6 +140,46 @@ class ModularCMAES:
         # print(self.parameters.population.f)
         # breakpoint()
 
+    def sample(self, n: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Sample n new individuals from the current search distribution.
+
+        Parameters
+        ----------
+        n: int
+            The number of individuals
+
+        Returns
+        -------
+        np.ndarray
+            (d, n) matrix of bound corrected individuals x, stored in Fortran order
+        np.ndarray
+            (d, n) matrix of mutation vectors y
+        np.ndarray
+            (d, n) matrix of samples z
+        np.ndarray
+            the step size s of each individual
+
+        """
+        if self.parameters.step_size_adaptation == 'lp-xnes' or self.parameters.sample_sigma:
+            s = (self.parameters.rng or np.random).lognormal(
+                np.log(self.parameters.sigma),
+                self.parameters.beta, size=n
+            )
+        else:
+            s = np.ones(n) * self.parameters.sigma
+
+        z = self.parameters.sampler(n)
+
+        if self.parameters.threshold_convergence:
+            z = scale_with_threshold(z, self.parameters.threshold)
+
+        y = self.parameters.transform(z)
+        x = np.add(self.parameters.m, s * y, order="F")
+        self.parameters.n_out_of_bounds += np.count_nonzero(
+            self.parameters.correct_out_of_bounds(x)
+        )
+        return x, y, z, s
+
     def select(self) -> None:
         """Selection of best individuals in the population.
 
@@ -160,15 +220,14 @@ class ModularCMAES:
             self.parameters.population += self.parameters.old_population[
                 : self.parameters.mu
             ]
-        self.parameters.population.sort()
-
-        self.parameters.population = self.parameters.population[
-            : self.parameters.lambda_
-        ]
+        rank = self.parameters.population.rank()[: self.parameters.lambda_]
+        self.parameters.population = self.parameters.population.take(
+            rank, self.parameters.population_buffer()
+        )
 
         if self.parameters.population.f[0] < self.parameters.fopt:
             self.parameters.fopt = self.parameters.population.f[0]
-            self.parameters.xopt = self.parameters.population.x[:, 0]
+            self.parameters.xopt = self.parameters.population.x[:, 0].copy()
 
     def recombine(self) -> None:
         """Recombination of new individuals.
@@ -209,11 +268,239 @@ class ModularCMAES:
         """
         self.mutate()
         self.select()
+        if self.parameters.population.n < self.parameters.mu:
+            # The remaining budget did not allow for mu evaluations
+            return False
         self.recombine()
         self.adapt()
         return not any(self.break_conditions)
+
+    def step_configuration(self) -> tuple:
+        """Return the settings on which the specialized step function depends."""
+        return (
+            id(self.parameters),
+            self.vectorized_fitness,
+            self.parameters.n_generations,
+            self.parameters.sample_sigma,
+            self.parameters.compute_termination_criteria,
+            self.parameters.covariance_model,
+            self.profiler is not None,
+            *(getattr(self.parameters, name) for name in self.parameters.__modules__),
+        )
+
+    def build_step(self) -> Callable[[], bool]:
+        """Build a step function specialized to the current module configuration.
+
+        The returned function performs the same operations as step, in the same
+        order, and thus produces identical results. The module options are resolved
+        once, such that only the enabled stages are executed each generation: the
+        common case (no tpa, sequential selection, sampled step sizes or threshold
+        convergence) samples and evaluates without dispatching on these options,
+        pairwise selection and elitism are only applied when enabled, and the
+        termination criteria are only computed when they are used. The break
+        conditions are evaluated without building a list, and population and
+        old_population are stored without the type check of the Parameters
+        descriptors.
+
+        When a subclass overrides any of the stages of step, or when profiling is
+        enabled, step itself is returned. The function should be rebuilt after the options are modified,
+        which run does when step_configuration has changed.
+
+        Returns
+        -------
+        Callable[[], bool]
+            A function performing one generation, returning whether to continue
+
+        """
+        cls, pcls = type(self), type(self.parameters)
+        if any(
+            getattr(cls, name) is not getattr(ModularCMAES, name)
+            for name in (
+                "step", "mutate", "sample", "evaluate", "fitness_func", "select",
+                "recombine", "adapt", "sequential_break_conditions", "break_conditions",
+            )
+        ) or pcls.adapt is not Parameters.adapt or self.profiler is not None:
+            return self.step
+
+        parameters = self.parameters
+        state = vars(parameters)
+        fitness_func = self._fitness_func
+        n_generations = parameters.n_generations
+        pairwise = parameters.mirrored == "mirrored pairwise"
+        elitist = parameters.elitist
+        vectorized = self.vectorized_fitness
+        full = parameters.covariance_model == "full"
+
+        if (
+            parameters.step_size_adaptation in ("tpa", "lp-xnes")
+            or parameters.sequential
+            or parameters.sample_sigma
+            or parameters.threshold_convergence
+        ):
+            mutate = self.mutate
+        else:
+            def mutate():
+                n = int(parameters.lambda_)
+                s = np.ones(n) * parameters.sigma
+                z = parameters.sampler(n)
+                if full:
+                    y = np.dot(parameters.B, parameters.D * z)
+                else:
+                    y = parameters.transform(z)
+                x = np.add(parameters.m, s * y, order="F")
+                parameters.n_out_of_bounds += np.count_nonzero(parameters.bounds(x))
+
+                if vectorized:
+                    n = x.shape[1]
+                    if not n_generations:
+                        n = min(n, parameters.budget - parameters.used_budget)
+                        if pairwise:
+                            n -= n % 2
+                    f = np.asarray(fitness_func(x[:, :n].T), dtype=np.float64)
+                    parameters.used_budget += n
+                    n = len(f)
+                    x, y, z, s = x[:, :n], y[:, :n], z[:, :n], s[:n]
+                else:
+                    f = np.empty(n, dtype=np.float64)
+                    for i in range(n):
+                        parameters.used_budget += 1
+                        f[i] = fitness_func(x[:, i].flatten())
+                state["population"] = Population(x, y, z, f, s)
+
+        if pairwise:
+            select = self.select
+        else:
+            def select():
+                population = parameters.population
+                if elitist and parameters.old_population:
+                    population = population + parameters.old_population[: parameters.mu]
+                rank = population.rank()[: parameters.lambda_]
+                population = population.take(rank, parameters.population_buffer())
+                state["population"] = population
+
+                if population.f[0] < parameters.fopt:
+                    parameters.fopt = population.f[0]
+                    parameters.xopt = population.x[:, 0].copy()
+
+        stages = (
+            parameters.adapt_evolution_paths,
+            parameters.adapt_sigma,
+            parameters.adapt_covariance_matrix,
+            parameters.perform_eigendecomposition,
+            parameters.record_statistics,
+        )
+        if parameters.local_restart or parameters.compute_termination_criteria:
+            stages += (parameters.calculate_termination_criteria, )
+
+        def adapt():
+            for stage in stages:
+                stage()
+            state["old_population"] = state["population"]
+            if any(parameters.termination_criteria.values()):
+                parameters.perform_local_restart()
+
+        if n_generations:
+            def finished():
+                return parameters.t >= n_generations
+        else:
+            min_evaluations = self.min_evaluations()
+
+            def finished():
+                return parameters.target >= parameters.fopt or (
+                    parameters.budget - parameters.used_budget < min_evaluations
+                )
+
+        recombine = self.recombine
+
+        def step():
+            mutate()
+            select()
+            if state["population"].n < parameters.mu:
+                return False
+            recombine()
+            adapt()
+            return not finished()
+
+        return step
     
 
+    def enable_profiling(self) -> Profiler:
+        """Time the phases of the generation loop.
+
+        The stages of step (__profiled__) and the adaptation stages of the
+        parameters (__profiled_parameters__) are replaced by TimedStage wrappers,
+        stored as instance attributes, and run uses step instead of the specialized
+        step function. The wall time of each phase excludes the time of the other
+        phases it calls, "other" is the remaining time of step. Without profiling,
+        none of this is executed. The parameters object should not be replaced
+        while profiling.
+
+        Returns
+        -------
+        Profiler
+            The profiler, also stored as self.profiler, see Profiler.as_dict and
+            Profiler.export
+
+        """
+        if self.profiler is None:
+            self.profiler = Profiler()
+            for obj, phases in (
+                (self, self.__profiled__),
+                (self.parameters, self.__profiled_parameters__),
+            ):
+                for name, phase in phases.items():
+                    setattr(obj, name, self.profiler.wrap(phase, getattr(obj, name)))
+        return self.profiler
+
+    def disable_profiling(self) -> Profiler:
+        """Remove the TimedStage wrappers of enable_profiling.
+
+        Returns
+        -------
+        Profiler
+            The profiler with the counters collected so far, or None
+
+        """
+        profiler, self.profiler = self.profiler, None
+        if profiler is not None:
+            for obj, phases in (
+                (self, self.__profiled__),
+                (self.parameters, self.__profiled_parameters__),
+            ):
+                for name in phases:
+                    vars(obj).pop(name, None)
+        return profiler
+
+    def evaluate(self, x: np.ndarray) -> np.ndarray:
+        """Evaluate the individuals in the columns of x with a single call to self._fitness_func.
+
+        The objective function receives the (n, d) matrix x.T, which is a
+        C-contiguous view when x is stored in Fortran order. If n exceeds the
+        remaining budget, only the first individuals are evaluated, rounded down
+        to an even number for pairwise selection, such that the budget is never
+        exceeded. A single remaining evaluation cannot form a pair, in that case
+        the budget break condition is met (see break_conditions).
+
+        Parameters
+        ----------
+        x: np.ndarray
+            (d, n) matrix of individuals
+
+        Returns
+        -------
+        np.ndarray
+            float64 array with the fitness of the first len(f) <= n individuals
+
+        """
+        n = x.shape[1]
+        if not self.parameters.n_generations:
+            n = min(n, self.parameters.budget - self.parameters.used_budget)
+            if self.parameters.mirrored == "mirrored pairwise":
+                n -= n % 2
+        f = np.asarray(self._fitness_func(x[:, :n].T), dtype=np.float64)
+        self.parameters.used_budget += n
+        return f
+
     def sequential_break_conditions(self, i: int, f: float) -> bool:
         """Indicator whether there are any sequential break conditions.
 
@@ -238,18 +525,73 @@ class ModularCMAES:
             )
         return False
 
-    def run(self):
+    def run(
+        self, n_generations: int = None, checkpoint: str = None,
+        checkpoint_interval: int = 100
+    ):
         """Run the step method until step method retuns a falsy value.
 
+        The generations are performed by specialized_step, which is rebuilt first
+        when the module configuration has changed, see build_step.
+
+        Parameters
+        ----------
+        n_generations: int = None
+            When given, at most n_generations generations are performed, such that
+            the run can be continued with another call to run
+        checkpoint: str = None
+            When given, a checkpoint is saved to this file every
+            checkpoint_interval generations, see resume.
+        checkpoint_interval: int = 100
+            The number of generations between two checkpoints
+
         Returns
         -------
         ModularCMAES
 
         """
-        while self.step():
-            pass
+        if self._step_configuration != self.step_configuration():
+            self._step_configuration = self.step_configuration()
+            self.specialized_step = self.build_step()
+
+        step = self.specialized_step
+        generation = 0
+        while n_generations is None or generation < n_generations:
+            generation += 1
+            if not step():
+                break
+            if checkpoint and self.parameters.t % checkpoint_interval == 0:
+                self.checkpoint(checkpoint)
+        self.parameters.flush_history()
         return self
 
+    def checkpoint(self, filename: str = "checkpoint.npz") -> None:
+        """Save a checkpoint of the run, shorthand for self.parameters.checkpoint."""
+        self.parameters.checkpoint(filename)
+
+    @classmethod
+    def resume(cls, fitness_func: Callable, filename: str, **kwargs) -> "ModularCMAES":
+        """Continue a run from a checkpoint saved with checkpoint.
+
+        The resumed run continues bit-identically, provided fitness_func returns the
+        same values as the objective function of the checkpointed run.
+
+        Parameters
+        ----------
+        fitness_func: Callable
+            The objective function to be optimized
+        filename: str
+            The checkpoint file
+        **kwargs
+            Passed to the constructor
+
+        Returns
+        -------
+        ModularCMAES
+
+        """
+        return cls(fitness_func, parameters=Parameters.from_checkpoint(filename), **kwargs)
+
     @property
     def break_conditions(self) -> List[bool]:
         """A list with break conditions based on the parameters of the CMA-ES.
@@ -263,9 +605,26 @@ class ModularCMAES:
             return [self.parameters.t >= self.parameters.n_generations]
         return [
             self.parameters.target >= self.parameters.fopt,
-            self.parameters.used_budget >= self.parameters.budget,
+            self.parameters.budget - self.parameters.used_budget < self.min_evaluations(),
         ]
 
+    def min_evaluations(self) -> int:
+        """The number of evaluations a generation needs at least.
+
+        This is 2 for pairwise selection with a matrix-capable objective, since
+        evaluate only evaluates whole pairs within the budget, and 1 otherwise.
+
+        Returns
+        -------
+        int
+
+        """
+        return 1 + int(
+            self.vectorized_fitness
+            and not self.parameters.sequential
+            and self.parameters.mirrored == "mirrored pairwise"
+        )
+
     def fitness_func(self, x: np.ndarray) -> float:
         """Wrapper function for calling self._fitness_func.
 
@@ -319,6 +678,7 @@ def tpa_mutation(fitness_func: Callable, parameters: "Parameters") -> None:
     yi = (parameters.m - parameters.m_old) / parameters.sigma
     y = np.c_[yi, -yi]
     x = parameters.m + (parameters.sigma * y[:, :2])
+    parameters.n_out_of_bounds += np.count_nonzero(parameters.correct_out_of_bounds(x))
     f = np.array(list(map(fitness_func, x[:, :2].T)))
     if f[1] < f[0]:
         parameters.rank_tpa = -parameters.a_tpa
@@ -351,76 +711,6 @@ def scale_with_threshold(z: np.ndarray, threshold: float) -> np.ndarray:
     return z
 
 
-def correct_bounds(
-    x: np.ndarray, ub: np.ndarray, lb: np.ndarray, correction_method: str
-) -> np.ndarray:
-    """Bound correction function.
-
-    Rescales x to fall within the lower lb and upper
-    bounds ub specified. Available strategies are:
-    - None: Don't perform any boundary correction
-    - unif_resample: Resample each coordinate out of bounds uniformly within bounds
-    - mirror: Mirror each coordinate around the boundary
-    - COTN: Resample each coordinate out of bounds using the one-sided normal
-    distribution with variance 1/3 (bounds scaled to [0,1])
-    - saturate: Set each out-of-bounds coordinate to the boundary
-    - toroidal: Reflect the out-of-bounds coordinates to the oposite bound inwards
-
-    Parameters
-    ----------
-    x: np.ndarray
-        vector of which the bounds should be corrected
-    ub: float
-        upper bound
-    lb: float
-        lower bound
-    correction_method: string
-        type of correction to perform
-
-    Returns
-    -------
-    np.ndarray
-        bound corrected version of x
-    bool
-        whether the population was out of bounds
-
-    Raises
-    ------
-    ValueError
-        When an unkown value for correction_method is provided
-
-    """
-    out_of_bounds = np.logical_or(x > ub, x < lb)
-    n_out_of_bounds = out_of_bounds.max(axis=0).sum()
-    if n_out_of_bounds == 0 or correction_method is None:
-        return x, n_out_of_bounds
-
-    try:
-        _, n = x.shape
-    except ValueError:
-        n = 1
-    ub, lb = np.tile(ub, n)[out_of_bounds], np.tile(lb, n)[out_of_bounds]
-    y = (x[out_of_bounds] - lb) / (ub - lb)
-
-    if correction_method == "mirror":
-        x[out_of_bounds] = lb + (ub - lb) * np.abs(
-            y - np.floor(y) - np.mod(np.floor(y), 2)
-        )
-    elif correction_method == "COTN":
-        x[out_of_bounds] = lb + (ub - lb) * np.abs(
-            (y > 0) - np.abs(np.random.normal(0, 1 / 3, size=y.shape))
-        )
-    elif correction_method == "unif_resample":
-        x[out_of_bounds] = np.random.uniform(lb, ub)
-    elif correction_method == "saturate":
-        x[out_of_bounds] = lb + (ub - lb) * (y > 0)
-    elif correction_method == "toroidal":
-        x[out_of_bounds] = lb + (ub - lb) * np.abs(y - np.floor(y))
-    else:
-        raise ValueError(f"Unknown argument: {correction_method} for correction_method")
-    return x, n_out_of_bounds
-
-
 @timeit
 def evaluate_bbob(
     fid,
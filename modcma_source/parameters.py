@@ -1,20 +1,31 @@
 """Definition of Parameters objects, which are used by ModularCMA-ES."""
 import os
+import json
 import pickle
+import uuid
 import warnings
 from collections import deque
-from typing import Generator, TypeVar
+from typing import Tuple, TypeVar
 
 import numpy as np
 from scipy import linalg
-
-from .utils import AnnotatedStruct
+from scipy.linalg.blas import dsyr, dsyrk
+
+from .utils import (
+    AnnotatedStruct,
+    HeadTailMedians,
+    HistoryLog,
+    TimedStage,
+    encode_state,
+    decode_state,
+)
+from .bounds import BoundCorrection
+from .population import Population
 from .sampling import (
-    gaussian_sampling,
-    orthogonal_sampling,
-    mirrored_sampling,
-    sobol_sampling,
-    halton_sampling,
+    BlockSampler,
+    GaussianSampler,
+    MirroredSampler,
+    OrthogonalSampler,
     Sobol, 
     Halton
 )
@@ -155,8 +166,85 @@ class Parameters(AnnotatedStruct):
     sample_sigma: bool = Flase
         Whether to sample sigma for each individual from a lognormal
         distribution.
-    sampler: generator
-        A generator object producing new samples
+    vectorized_fitness: bool = False
+        Whether the objective function evaluates an (n, d) matrix of individuals in
+        a single call. This is detected automatically for ioh problems.
+    lazy_eigendecomposition: bool = False
+        Whether to only recompute B, D and inv_root_C once every
+        eigendecomposition_interval generations, instead of every generation.
+        The termination criteria based on the eigenvalues (tolupsigma,
+        conditioncov and noeffectaxis) then use the B and D of the last
+        decomposition, which lag up to eigendecomposition_interval - 1
+        generations behind C. A restart can therefore be triggered that many
+        generations later than without this option. The criteria based on the
+        diagonal of C (tolx and noeffectcoor) use the current C.
+            [8] Nikolaus Hansen. The CMA evolution strategy: A tutorial.CoRR,
+            abs/1604.00772, 2016
+    symmetric_update: bool = False
+        Whether to update the full covariance matrix in place with symmetric BLAS
+        kernels (dsyrk for the rank-mu update, split in a positive and a negative
+        part for active update, and dsyr for the rank-one update). Only the upper
+        triangle of C is then kept up to date, and used by the eigendecomposition.
+        The result equals that of the default update up to rounding errors.
+    covariance_model: ("full", "sep", "lm", "cholesky") = "full"
+        The representation of the covariance matrix C = A A^T:
+            full: the dense d x d matrix C and its eigendecomposition B, D
+            sep: only the diagonal of C, stored as a (d, 1) array, with the
+                learning rates c1 and cmu scaled by (d + 2) / 3
+                [12] Raymond Ros and Nikolaus Hansen. A Simple Modification in CMA-ES
+                Achieving Linear Time and Space Complexity. In PPSN X, pages
+                296–305. Springer, 2008.
+            lm: A is a product of memory_size rank-one modifications of the
+                identity, defined by the direction vectors lm_vectors, as in
+                LM-MA-ES. These replace the rank-one and rank-mu updates.
+                [13] Ilya Loshchilov, Tobias Glasmachers and Hans-Georg Beyer.
+                Large Scale Black-box Optimization by Limited-Memory Matrix
+                Adaptation. IEEE Transactions on Evolutionary Computation,
+                23(2):353–358, 2019.
+            cholesky: a (not necessarily triangular) factor A and its inverse
+                inv_A, updated with the rank-one and rank-mu terms in O(d^2) per
+                term, without eigendecomposition
+                [14] Thorsten Suttorp, Nikolaus Hansen and Christian Igel. Efficient
+                covariance matrix update for variable metric evolution strategies.
+                Machine Learning, 75(2):167–197, 2009.
+        For sep, lm and cholesky, C, B and inv_root_C are None and D is only stored
+        for sep, no d x d matrices other than A and inv_A are used. Use transform
+        and transform_inverse instead.
+    memory_size: int = None
+        The number of direction vectors when covariance_model = 'lm',
+        defaults to 4 + floor(3 ln(d))
+    history: ("full", "ring", "file", None) = "full"
+        How the per generation statistics (sigma_over_time, best_fopts,
+        best_fitnesses and median_fitnesses) are recorded:
+            full: in lists, for the entire run
+            ring: in deques holding only the last history_size generations
+            file: in a HistoryLog, flushed to the .npy file history_file
+            None: not at all
+        The termination criteria do not depend on the history. Note that with
+        local restarts, the stagnation criterion keeps the best and median
+        fitness of every generation since the last restart (best_fitness_medians
+        and median_fitness_medians), since the medians of the first 30% of these
+        sequences are needed. With history = 'ring', only the last 20000
+        generations, the maximal n_stagnation, are kept, such that the memory
+        is bounded. The criterion then compares the head and tail of this
+        window, which only differs from the other modes after 20000
+        generations without a restart.
+    history_size: int = None
+        The length of the deques when history = 'ring'. Defaults to the
+        minimal length of the stagnation window.
+    history_file: str = None
+        The file the history is written to when history = 'file'. Defaults to
+        history_<pid>_<random>.npy in the working directory, which is unique
+        per run, such that parallel runs do not overwrite each other's history
+    sampler: BlockSampler
+        A block sampler producing new samples, called with the number of
+        samples to return as a (d, n) array
+    rng: np.random.Generator = None
+        The random number generator all random draws of the run are taken from.
+        Passed as keyword argument to the constructor, either as a
+        np.random.Generator or np.random.RandomState, or as a seed
+        (e.g. a np.random.SeedSequence) for np.random.default_rng.
+        When None, the global np.random state is used.
     used_budget: int
         The number of function evaluations used
     fopt: float
@@ -171,9 +259,20 @@ class Parameters(AnnotatedStruct):
         The median fitness value in each generation
     best_fitnesses: list
         The best fitness value observed in each generation
+    history_log: HistoryLog
+        The records of sigma, fopt, best and median fitness in each
+        generation, when history = 'file'
     flat_fitnesses = deque
         A deque containing boolean values denoting if a flat fitness value is observed
         in recent generations
+    n_equal_fitnesses: int
+        The number of most recent generations since the last restart with an equal
+        best fitness value
+    best_fitness_medians: HeadTailMedians
+        The best fitness values since the last restart, with running medians of
+        the first and last 30% used for detecting stagnation
+    median_fitness_medians: HeadTailMedians
+        The median fitness values since the last restart, as best_fitness_medians
     restarts: list
         A list containing the t values (generations) where a restart has
         taken place
@@ -202,13 +301,28 @@ class Parameters(AnnotatedStruct):
     ps: np.ndarray
         The conjugate evolution path
     C: np.ndarray
-        The covariance matrix
+        The covariance matrix, its (d, 1) diagonal when covariance_model = 'sep'.
+        Only the upper triangle is up to date when symmetric_update = True.
     B: np.ndarray
         The eigenvectors of the covariance matrix C
     D: np.ndarray
         The eigenvalues of the covariance matrix C
     inv_root_C: np.ndarray
         The result of C**-(1/2)
+    lm_vectors: np.ndarray
+        The (memory_size, d) direction vectors when covariance_model = 'lm'
+    lm_count: int
+        The number of direction vectors which have been updated since the last
+        (re)initialization, only these are used
+    lm_cd: np.ndarray
+        The weights of the direction vectors in A when covariance_model = 'lm'
+    lm_cc: np.ndarray
+        The learning rates of the direction vectors when covariance_model = 'lm'
+    A: np.ndarray
+        The factor of C = A A^T when covariance_model = 'cholesky'
+    inv_A: np.ndarray
+        The inverse of A when covariance_model = 'cholesky', recomputed from A
+        once every d generations to prevent the accumulation of rounding errors
     s: float
         Used for TPA
     rank_tpa: float
@@ -236,6 +350,15 @@ class Parameters(AnnotatedStruct):
         'dismiss'-boundary correction is used
     n_out_of_bounds: int
         The number of individals that are sampled out of bounds
+    bounds: BoundCorrection
+        Corrects sampled individuals in place, using ub, lb and bound_correction
+    eigendecomposition_interval: int
+        The number of generations between two eigendecompositions, used when
+        lazy_eigendecomposition = True
+    last_eigendecomposition: int
+        The generation in which B, D and inv_root_C were last computed
+    n_skipped_eigendecompositions: int
+        The number of generations in which the eigendecomposition was skipped
 
     """
 
@@ -286,6 +409,13 @@ class Parameters(AnnotatedStruct):
     compute_termination_criteria: bool = False
     sample_sigma: bool = False  # TODO make this a module
     vectorized_fitness: bool = False
+    lazy_eigendecomposition: bool = False
+    symmetric_update: bool = False
+    covariance_model: ("full", "sep", "lm", "cholesky") = "full"
+    memory_size: int = None
+    history: ("full", "ring", "file", None) = "full"
+    history_size: int = None
+    history_file: str = None
     sobol: TypeVar("Sobol") = None
     halton: TypeVar("Halton") = None
 
@@ -303,8 +433,12 @@ class Parameters(AnnotatedStruct):
         "bound_correction",
     )
 
-    def __init__(self, *args, **kwargs) -> None:
+    def __init__(self, *args, rng=None, **kwargs) -> None:
         """Intialize parameters. Calls sub constructors for different parameter types."""
+        if rng is not None and not isinstance(rng, (np.random.Generator, np.random.RandomState)):
+            rng = np.random.default_rng(rng)
+        self.rng = rng
+        self.population_buffers = ()
         super().__init__(*args, **kwargs)
         self.init_selection_parameters()
         self.init_fixed_parameters()
@@ -312,23 +446,26 @@ class Parameters(AnnotatedStruct):
         self.init_dynamic_parameters()
         self.init_local_restart_parameters()
 
-    def get_sampler(self) -> Generator:
-        """Function to return a sampler generator based on the values of other parameters.
+    def get_sampler(self) -> BlockSampler:
+        """Function to return a block sampler based on the values of other parameters.
+
+        Mirrored and orthogonal sampling are applied as transforms of the
+        blocks produced by the base sampler.
 
         Returns
         -------
-        generator
+        BlockSampler
             a sampler
 
         """
         if self.base_sampler == 'gaussian':
-            sampler = gaussian_sampling(self.d)
+            sampler = GaussianSampler(self.d, self.rng)
         elif self.base_sampler == 'sobol':
-            self.sobol = self.sobol or Sobol(self.d)
-            sampler = sobol_sampling(self.sobol)      
+            self.sobol = self.sobol or Sobol(self.d, self.rng)
+            sampler = self.sobol
         elif self.base_sampler == 'halton':
-            self.halton = self.halton or Halton(self.d)
-            sampler = halton_sampling(self.halton)
+            self.halton = self.halton or Halton(self.d, self.rng)
+            sampler = self.halton
 
         if self.orthogonal:
             n_samples = max(
@@ -336,10 +473,10 @@ class Parameters(AnnotatedStruct):
                 (self.lambda_ // (2 - (not self.mirrored)))
                 - (2 * self.step_size_adaptation == "tpa"),
             )
-            sampler = orthogonal_sampling(sampler, n_samples)
+            sampler = OrthogonalSampler(sampler, n_samples)
 
         if self.mirrored:
-            sampler = mirrored_sampling(sampler)
+            sampler = MirroredSampler(sampler)
 
         return sampler
 
@@ -347,25 +484,42 @@ class Parameters(AnnotatedStruct):
         """Initialization function for parameters that are not restarted during a run."""
         self.used_budget = 0
         self.n_out_of_bounds = 0
+        self.n_skipped_eigendecompositions = 0
         self.budget = self.budget or int(1e4) * self.d
         self.max_lambda_ = (self.d * self.lambda_) ** 2
         self.fopt = float("inf")
         self.xopt = None
         self.t = 0
-        self.sigma_over_time = []
-        self.best_fopts = []
-        self.median_fitnesses = []
-        self.best_fitnesses = []
+        self.init_history()
         self.flat_fitnesses = deque(maxlen=self.d)
         self.restarts = [0]
+        self.restart_statistics_start = None
         self.bipop_parameters = BIPOPParameters(
             self.lambda_, self.budget, self.mu / self.lambda_
         )
+        self.bipop_parameters.rng = self.rng
         self.chiN = self.d ** 0.5 * (1 - 1 / (4 * self.d) + 1 / (21 * self.d ** 2))
         self.ds = 2 - (2 / self.d)
         self.beta = np.log(2) / max((np.sqrt(self.d) * np.log(self.d)), 1)
         self.succes_ratio = .25
 
+    def init_history(self) -> None:
+        """Initialization function for the recorded per generation statistics."""
+        self.history_log = None
+        if self.history == "ring":
+            maxlen = self.history_size or int(120 + (30 * self.d / self.lambda_))
+            self.sigma_over_time, self.best_fopts, self.median_fitnesses, \
+                self.best_fitnesses = (deque(maxlen=maxlen) for _ in range(4))
+        else:
+            self.sigma_over_time = []
+            self.best_fopts = []
+            self.median_fitnesses = []
+            self.best_fitnesses = []
+            if self.history == "file":
+                if self.history_file is None:
+                    self.history_file = f"history_{os.getpid()}_{uuid.uuid4().hex[:8]}.npy"
+                self.history_log = HistoryLog(self.history_file)
+
     def init_selection_parameters(self) -> None:
         """Initialization function for parameters that influence in selection."""
         self.lambda_ = self.lambda_ or (4 + np.floor(3 * np.log(self.d))).astype(int)
@@ -390,6 +544,20 @@ class Parameters(AnnotatedStruct):
         self.set_default("ub", np.ones((self.d, 1)) * 5)
         self.set_default("lb", np.ones((self.d, 1)) * -5)
         self.diameter = np.linalg.norm(self.ub - (self.lb))
+        self.bounds = BoundCorrection(
+            self.d, self.lb, self.ub, self.bound_correction, self.rng
+        )
+
+    def correct_out_of_bounds(self, x: np.ndarray) -> np.ndarray:
+        """Correct the (d, n) matrix x in place, shorthand for self.bounds(x).
+
+        Returns
+        -------
+        np.ndarray
+            the number of coordinates out of bounds of each individual
+
+        """
+        return self.bounds(x)
 
     def init_local_restart_parameters(self) -> None:
         """Initialization function for parameters for local restart strategies, i.e. IPOP.
@@ -436,8 +604,9 @@ class Parameters(AnnotatedStruct):
 
         self.pweights = self.pweights / self.pweights.sum()
 
-        self.c1 = self.c1 or 2 / ((self.d + 1.3) ** 2 + self.mueff)
-        self.cmu = self.cmu or min(1 - self.c1, (2 * (
+        factor = (self.d + 2) / 3 if self.covariance_model == "sep" else 1
+        self.c1 = self.c1 or factor * 2 / ((self.d + 1.3) ** 2 + self.mueff)
+        self.cmu = self.cmu or min(1 - self.c1, factor * (2 * (
             (self.mueff - 2 + (1 / self.mueff))
             / ((self.d + 2) ** 2 + (2 * self.mueff / 2))
         )))
@@ -466,6 +635,14 @@ class Parameters(AnnotatedStruct):
         self.damps = 1.0 + (
             2.0 * max(0.0, np.sqrt((self.mueff - 1) / (self.d + 1)) - 1) + self.cs
         )
+        self.eigendecomposition_interval = int(
+            np.ceil(self.lambda_ / ((self.c1 + self.cmu) * self.d * 10))
+        )
+        if self.covariance_model == "lm":
+            self.memory_size = self.memory_size or 4 + int(3 * np.log(self.d))
+            j = np.arange(self.memory_size)
+            self.lm_cd = np.minimum(0.5, 1 / (np.power(1.5, j) * self.d))
+            self.lm_cc = np.minimum(1, self.lambda_ / (np.power(4.0, j) * self.d))
 
     def init_dynamic_parameters(self) -> None:
         """Initialization function of parameters that represent the dynamic state of the CMA-ES.
@@ -475,20 +652,33 @@ class Parameters(AnnotatedStruct):
         """
         self.sigma = np.float64(self.sigma0)
         if hasattr(self, "m") or self.x0 is None: 
-            self.m = (np.random.uniform(self.lb, self.ub, (self.d, 1))).astype(np.float64)
+            self.m = ((self.rng or np.random).uniform(self.lb, self.ub, (self.d, 1))).astype(np.float64)
         else:
             self.m = (self.x0.copy().reshape(self.d, 1)).astype(np.float64)
         self.m_old = np.empty((self.d, 1), dtype=np.float64)
         self.dm = np.zeros(self.d, dtype=np.float64)
         self.pc = np.zeros((self.d, 1), dtype=np.float64)
         self.ps = np.zeros((self.d, 1), dtype=np.float64)
-        self.B = np.eye(self.d, dtype=np.float64)
-        self.C = np.eye(self.d, dtype=np.float64)
-        self.D = np.ones((self.d, 1), dtype=np.float64)
-        self.inv_root_C = np.eye(self.d, dtype=np.float64)
+        if self.covariance_model == "full":
+            self.B = np.eye(self.d, dtype=np.float64)
+            self.C = np.eye(self.d, dtype=np.float64)
+            self.D = np.ones((self.d, 1), dtype=np.float64)
+            self.inv_root_C = np.eye(self.d, dtype=np.float64)
+        else:
+            self.B = self.C = self.D = self.inv_root_C = None
+            if self.covariance_model == "sep":
+                self.C = np.ones((self.d, 1), dtype=np.float64)
+                self.D = np.ones((self.d, 1), dtype=np.float64)
+            elif self.covariance_model == "cholesky":
+                self.A = np.eye(self.d, dtype=np.float64)
+                self.inv_A = np.eye(self.d, dtype=np.float64)
+            else:
+                self.lm_vectors = np.zeros((self.memory_size, self.d), dtype=np.float64)
+                self.lm_count = 0
         self.s = 0
         self.rank_tpa = None
         self.hs = True
+        self.last_eigendecomposition = self.t
 
     def adapt(self) -> None:
         """Method for adapting the internal state parameters.
@@ -496,7 +686,6 @@ class Parameters(AnnotatedStruct):
         The conjugate evolution path ps is calculated, in addition to
         the difference in mean x values dm. Thereafter, sigma is adapated,
         followed by the adapatation of the covariance matrix.
-        TODO: eigendecomp is not neccesary to be beformed every iteration, says CMAES tut.
         """
         self.adapt_evolution_paths()
         self.adapt_sigma()
@@ -504,10 +693,36 @@ class Parameters(AnnotatedStruct):
         self.perform_eigendecomposition()
         self.record_statistics()
         self.calculate_termination_criteria()
-        self.old_population = self.population.copy()
+        # The selected population is stored in one of the population buffers, the
+        # next one is written to the other buffer, so no copy is needed here.
+        self.old_population = self.population
         if any(self.termination_criteria.values()):
             self.perform_local_restart()
 
+    def population_buffer(self) -> "Population":
+        """Return preallocated storage for the next selected population.
+
+        Two buffers of capacity lambda_ are used in turn, such that the storage of
+        old_population is not overwritten. The buffers are only reallocated when
+        lambda_ (IPOP/BIPOP) or the dtype of the fitness values changes.
+
+        Returns
+        -------
+        Population
+
+        """
+        dtype = self.population.f.dtype
+        if not self.population_buffers or (
+            self.population_buffers[0].n != self.lambda_
+            or self.population_buffers[0].f.dtype != dtype
+        ):
+            self.population_buffers = tuple(
+                Population.empty(self.d, self.lambda_, dtype) for _ in range(2)
+            )
+        current, other = self.population_buffers
+        self.population_buffers = other, current
+        return current
+
     def adapt_sigma(self) -> None:
         """Method to adapt the step size sigma.
 
@@ -541,12 +756,12 @@ class Parameters(AnnotatedStruct):
         elif self.step_size_adaptation == "xnes":
             w = self.weights.clip(0)[:self.population.n]
             z = np.power(
-                np.linalg.norm(self.inv_root_C.dot(self.population.y), axis=0), 2
+                np.linalg.norm(self.transform_inverse(self.population.y), axis=0), 2
             ) - self.d
             self.sigma *= np.exp((self.cs / np.sqrt(self.d)) * (w * z).sum())
 
         elif self.step_size_adaptation == "m-xnes" and self.old_population:
-            z = (self.mueff * np.power(np.linalg.norm(self.inv_root_C.dot(self.dm)), 2)) - self.d
+            z = (self.mueff * np.power(np.linalg.norm(self.transform_inverse(self.dm)), 2)) - self.d
             self.sigma *= np.exp((self.cs / self.d) * z)
 
         elif self.step_size_adaptation == "lp-xnes":
@@ -569,15 +784,63 @@ class Parameters(AnnotatedStruct):
 
         If the option `active` is specified, active update of the covariance
         matrix is performed, using negative weights.
+
+        For covariance_model = 'sep', only the diagonal of C is updated. For
+        covariance_model = 'lm', the direction vectors are updated with the
+        whitened mean shift, as in LM-MA-ES. For covariance_model = 'cholesky',
+        A and inv_A are scaled and then updated with one rank-one term
+        C + beta v v^T = A (I + beta w w^T) A^T, w = inv_A v, per vector v. Terms
+        with a negative weight that would make C indefinite are skipped.
         """
-        rank_one = self.c1 * self.pc * self.pc.T
+        if self.covariance_model == "lm":
+            z = self.transform_inverse(self.dm).T
+            self.lm_vectors = (1 - self.lm_cc[:, None]) * self.lm_vectors + (
+                np.sqrt(self.mueff * self.lm_cc * (2 - self.lm_cc))[:, None] * z
+            )
+            self.lm_count = min(self.lm_count + 1, self.memory_size)
+            return
+
+        if self.covariance_model == "cholesky":
+            n = self.population.y.shape[1] if self.active else self.mu
+            weights = self.weights[:n] if self.active else self.pweights
+            dhs = (1 - self.hs) * self.cc * (2 - self.cc)
+            alpha = 1 - (self.c1 * dhs) - self.c1 - (self.cmu * self.pweights.sum())
+            self.A *= np.sqrt(alpha)
+            self.inv_A /= np.sqrt(alpha)
+            for v, beta in zip(
+                np.c_[self.pc, self.population.y[:, :n]].T,
+                np.r_[self.c1, self.cmu * weights],
+            ):
+                w = self.inv_A @ v
+                ww = w @ w
+                a = 1 + beta * ww
+                if a <= 0 or ww == 0:
+                    continue
+                self.A += ((np.sqrt(a) - 1) / ww) * np.outer(v, w)
+                self.inv_A -= ((1 - 1 / np.sqrt(a)) / ww) * np.outer(w, w @ self.inv_A)
+            return
+
+        if self.symmetric_update and self.covariance_model == "full":
+            self.update_covariance_matrix_upper()
+            return
+
+        if self.covariance_model == "sep":
+            rank_one = self.c1 * self.pc ** 2
+        else:
+            rank_one = self.c1 * self.pc * self.pc.T
 
         dhs = (1 - self.hs) * self.cc * (2 - self.cc)
         old_C = (
             1 - (self.c1 * dhs) - self.c1 - (self.cmu * self.pweights.sum())
         ) * self.C
 
-        if self.active:
+        if self.covariance_model == "sep":
+            n = self.population.y.shape[1] if self.active else self.mu
+            weights = self.weights[:n] if self.active else self.pweights
+            rank_mu = self.cmu * (
+                weights * self.population.y[:, :n] ** 2
+            ).sum(axis=1, keepdims=True)
+        elif self.active:
             weights = self.weights[::].copy()
             weights = weights[: self.population.y.shape[1]]
             rank_mu = self.cmu * (weights * self.population.y @ self.population.y.T)
@@ -589,34 +852,214 @@ class Parameters(AnnotatedStruct):
             )
         self.C = old_C + rank_one + rank_mu
 
+    def update_covariance_matrix_upper(self) -> None:
+        """Update the upper triangle of C in place, used when symmetric_update = True.
+
+        C is row-major, so its upper triangle is the lower triangle of the
+        column-major C.T, which is what the BLAS kernels update.
+        """
+        n = self.population.y.shape[1] if self.active else self.mu
+        dhs = (1 - self.hs) * self.cc * (2 - self.cc)
+        C = np.asarray(self.C, order="C").T
+        C = dsyrk(
+            self.cmu,
+            self.population.y[:, : self.mu] * np.sqrt(self.pweights),
+            beta=1 - (self.c1 * dhs) - self.c1 - (self.cmu * self.pweights.sum()),
+            c=C,
+            lower=1,
+            overwrite_c=1,
+        )
+        if n > self.mu:
+            C = dsyrk(
+                -self.cmu,
+                self.population.y[:, self.mu : n] * np.sqrt(-self.weights[self.mu : n]),
+                beta=1.0,
+                c=C,
+                lower=1,
+                overwrite_c=1,
+            )
+        C = dsyr(self.c1, self.pc[:, 0], lower=1, a=C, overwrite_a=1)
+        self.C = C.T
+
     def perform_eigendecomposition(self) -> None:
         """Method to perform eigendecomposition.
 
         If sigma or the coveriance matrix has degenerated, the dynamic parameters
         are reset.
+
+        If lazy_eigendecomposition is specified, the decomposition is only performed
+        once every eigendecomposition_interval generations. In the generations in
+        between, B, D and inv_root_C are those of an earlier C.
+
+        For covariance_model = 'sep', D is the square root of the diagonal C, for
+        covariance_model = 'lm' only the degeneration checks are performed. For
+        covariance_model = 'cholesky', inv_A is recomputed from A once every d
+        generations.
         """
+        if self.covariance_model == "lm":
+            state = self.lm_vectors
+        elif self.covariance_model == "cholesky":
+            state = self.A
+        else:
+            state = self.C
         if (
-            np.isinf(self.C).any()
-            or np.isnan(self.C).any()
+            np.isinf(state).any()
+            or np.isnan(state).any()
             or (not 1e-16 < self.sigma < 1e6)
         ):
             self.init_dynamic_parameters()
+        elif self.covariance_model == "lm":
+            pass
+        elif self.covariance_model == "cholesky":
+            if (self.t + 1) % self.d == 0:
+                self.inv_A = np.linalg.inv(self.A)
+        elif self.covariance_model == "sep":
+            if np.all(self.C > 0):
+                self.D = np.sqrt(self.C)
+            else:
+                self.init_dynamic_parameters()
+        elif self.lazy_eigendecomposition and (
+            self.t + 1 - self.last_eigendecomposition < self.eigendecomposition_interval
+        ):
+            self.n_skipped_eigendecompositions += 1
         else:
-            self.C = np.triu(self.C) + np.triu(self.C, 1).T
-
-            self.D, self.B = linalg.eigh(self.C)
+            self.last_eigendecomposition = self.t + 1
+            if self.symmetric_update:
+                self.D, self.B = linalg.eigh(self.C, lower=False)
+            else:
+                self.C = np.triu(self.C) + np.triu(self.C, 1).T
+                self.D, self.B = linalg.eigh(self.C)
             if np.all(self.D > 0):
                 self.D = np.sqrt(self.D.reshape(-1, 1))
                 self.inv_root_C = np.dot(self.B, self.D ** -1 * self.B.T)
             else:
                 self.init_dynamic_parameters()
 
+    def transform(self, z: np.ndarray) -> np.ndarray:
+        """Map standard normal samples z to mutation vectors y = A z ~ N(0, C).
+
+        Parameters
+        ----------
+        z: np.ndarray
+            (d, n) matrix of samples
+
+        Returns
+        -------
+        np.ndarray
+            (d, n) matrix of mutation vectors
+
+        """
+        if self.covariance_model == "sep":
+            return self.D * z
+        if self.covariance_model == "lm":
+            y = z
+            for v, c in zip(self.lm_vectors[: self.lm_count], self.lm_cd):
+                y = (1 - c) * y + c * v[:, None] * (v @ y)
+            return y
+        if self.covariance_model == "cholesky":
+            return np.dot(self.A, z)
+        return np.dot(self.B, self.D * z)
+
+    def transform_inverse(self, y: np.ndarray) -> np.ndarray:
+        """Whiten mutation vectors y, i.e. compute C^-1/2 y (A^-1 y for 'lm').
+
+        Parameters
+        ----------
+        y: np.ndarray
+            (d, n) matrix of mutation vectors
+
+        Returns
+        -------
+        np.ndarray
+            (d, n) matrix of whitened vectors
+
+        """
+        if self.covariance_model == "sep":
+            return y / self.D
+        if self.covariance_model == "lm":
+            z = y
+            for v, c in zip(
+                self.lm_vectors[: self.lm_count][::-1], self.lm_cd[: self.lm_count][::-1]
+            ):
+                # Sherman-Morrison inverse of (1 - c) I + c v v^T
+                z = (z - (c / (1 - c + c * (v @ v))) * v[:, None] * (v @ z)) / (1 - c)
+            return z
+        if self.covariance_model == "cholesky":
+            return self.inv_A.dot(y)
+        return self.inv_root_C.dot(y)
+
+    def covariance_summary(self, index: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return the quantities of C used by the termination criteria.
+
+        For covariance_model = 'lm', A = alpha I + Q S Q^T, with Q an orthonormal
+        basis of the direction vectors, such that the eigendecomposition of C
+        only requires that of a (k, k) matrix, with k = lm_count. For
+        covariance_model = 'cholesky', C = A A^T is never formed. Its eigenvectors
+        and the square roots of its eigenvalues are the left singular vectors and
+        singular values of A, stored in B and D in ascending order. This SVD is
+        only computed when the termination criteria are, see
+        calculate_termination_criteria, and at most once every
+        eigendecomposition_interval generations.
+
+        Parameters
+        ----------
+        index: int
+            The index of the principal axis to return
+
+        Returns
+        -------
+        np.ndarray
+            The (d, ) diagonal of C
+        np.ndarray
+            The square roots of the eigenvalues of C as (d, 1) array
+        np.ndarray
+            The principal axis for eigenvalue index, a column of B for the full
+            model and a (d, 1) array otherwise
+
+        """
+        if self.covariance_model == "full":
+            return np.diag(self.C.T), self.D, self.B[:, index]
+
+        if self.covariance_model == "cholesky":
+            if self.D is None or (
+                self.t + 1 - self.last_eigendecomposition >= self.eigendecomposition_interval
+            ):
+                self.last_eigendecomposition = self.t + 1
+                # the left singular vectors and singular values of A are the
+                # eigenvectors of C and the square roots of its eigenvalues
+                B, D, _ = linalg.svd(self.A)
+                self.B, self.D = B[:, ::-1], D[::-1].reshape(-1, 1)
+            return (self.A ** 2).sum(axis=1), self.D, self.B[:, index : index + 1]
+
+        axis = np.zeros((self.d, 1))
+        if self.covariance_model == "sep":
+            axis[index] = 1
+            return self.C[:, 0], self.D, axis
+
+        alpha = np.prod(1 - self.lm_cd[: self.lm_count])
+        q, _ = np.linalg.qr(self.lm_vectors[: self.lm_count].T)
+        k = q.shape[1]
+        s = q.T @ self.transform(q) - alpha * np.eye(k)
+        t = alpha * (s + s.T) + s @ s.T
+        diag_C = alpha ** 2 + ((q @ t) * q).sum(axis=1)
+        eigenvalues, u = linalg.eigh(alpha ** 2 * np.eye(k) + t)
+        D = np.r_[np.sqrt(np.maximum(eigenvalues, 0)), np.repeat(alpha, self.d - k)]
+        if index < k:
+            axis = q @ u[:, index : index + 1]
+        else:
+            axis[index] = 1
+            axis -= q @ (q.T @ axis)
+            axis /= max(np.linalg.norm(axis), 1e-300)
+        return diag_C, D.reshape(-1, 1), axis
+
     def adapt_evolution_paths(self) -> None:
         """Method to adapt the evolution paths ps and pc."""
         self.dm = (self.m - self.m_old) / self.sigma
-        self.ps = (1 - self.cs) * self.ps + (
-            np.sqrt(self.cs * (2 - self.cs) * self.mueff) * self.inv_root_C @ self.dm
-        ) * self.ps_factor
+        if self.covariance_model == "full":
+            dz = np.sqrt(self.cs * (2 - self.cs) * self.mueff) * self.inv_root_C @ self.dm
+        else:
+            dz = np.sqrt(self.cs * (2 - self.cs) * self.mueff) * self.transform_inverse(self.dm)
+        self.ps = (1 - self.cs) * self.ps + dz * self.ps_factor
 
         self.hs = (
             np.linalg.norm(self.ps)
@@ -744,6 +1187,7 @@ class Parameters(AnnotatedStruct):
             The name of the file to save to.
 
         """
+        self.flush_history()
         sampler = self.sampler 
         with open(filename, "wb") as f:
             self.sampler = None
@@ -752,6 +1196,146 @@ class Parameters(AnnotatedStruct):
         self.sampler = sampler
 
 
+    def checkpoint(self, filename: str = "checkpoint.npz") -> None:
+        """Save the state of the run to a compact checkpoint.
+
+        The checkpoint is a single .npz file with the state arrays (m, C, B, D, the
+        evolution paths, old_population, histories, ...) and a small JSON document
+        with the configuration, scalars, the BIPOP budget bookkeeping, the state of
+        the random number generator (the global np.random state when rng is None)
+        and the position of the sampler. The file is replaced atomically. Unlike
+        save, a run restored with from_checkpoint continues bit-identically.
+        Checkpoints should be taken in between generations.
+
+        Parameters
+        ----------
+        filename: str = "checkpoint.npz"
+            The name of the file to save to.
+
+        """
+        self.flush_history()
+        skip = (
+            "__bound__", "sampler", "sobol", "halton", "population", "old_population",
+            "population_buffers", "bounds", "bipop_parameters", "rng", "history_log",
+            "best_fitness_medians", "median_fitness_medians", "random_state",
+        )
+        populations = {
+            name: None if population is None else {
+                name: getattr(population, name) for name in population.__slots__
+            }
+            for name, population in (
+                ("old_population", self.old_population), ("population", self.population)
+            )
+        }
+        if isinstance(self.rng, np.random.Generator):
+            rng_state = self.rng.bit_generator.state
+        else:
+            rng_state = (self.rng or np.random).get_state(legacy=False)
+        state = dict(
+            config={
+                name: value for name, value in self.__bound__.arguments.items()
+                if name not in ("population", "old_population", "sobol", "halton")
+            },
+            state={
+                name: value for name, value in vars(self).items()
+                if name not in skip and not isinstance(value, TimedStage)
+            },
+            populations=populations,
+            population_is_old=self.population is self.old_population,
+            bipop_parameters={
+                name: value for name, value in vars(self.bipop_parameters).items()
+                if name not in ("__bound__", "rng")
+            },
+            restart_statistics={
+                name: list(getattr(self, name).sequence)
+                for name in ("best_fitness_medians", "median_fitness_medians")
+                if hasattr(self, name)
+            },
+            history_log=None if self.history_log is None else self.history_log.n_flushed,
+            rng=dict(
+                kind=None if self.rng is None else type(self.rng).__name__,
+                state=rng_state,
+            ),
+            sampler=self.sampler.get_state(),
+        )
+        arrays = dict()
+        meta = encode_state(state, arrays)
+        arrays["json"] = np.array(json.dumps(meta))
+
+        tmp = f"{filename}.tmp.npz"
+        np.savez(tmp, **arrays)
+        os.replace(tmp, filename)
+
+    @staticmethod
+    def from_checkpoint(filename: str) -> "Parameters":
+        """Restore a Parameters object from a checkpoint.
+
+        When rng was None for the checkpointed run, the global np.random state is
+        set to that of the run.
+
+        Parameters
+        ----------
+        filename: str
+            A file path
+
+        Returns
+        -------
+        A Parameters object
+
+        """
+        if not os.path.isfile(filename):
+            raise OSError(f"{filename} does not exist")
+
+        with np.load(filename) as arrays:
+            state = decode_state(json.loads(str(arrays["json"])), arrays)
+
+        rng = state["rng"]
+        if rng["kind"] == "Generator":
+            rng["rng"] = np.random.Generator(
+                getattr(np.random, rng["state"]["bit_generator"])()
+            )
+        elif rng["kind"] == "RandomState":
+            rng["rng"] = np.random.RandomState()
+
+        config = state["config"]
+        parameters = Parameters(**dict(config, history=None), rng=rng.get("rng"))
+        parameters.__bound__ = Parameters.__signature__.bind(**config)
+        parameters.__bound__.apply_defaults()
+        for name, value in state["state"].items():
+            setattr(parameters, name, value)
+        for name, value in state["bipop_parameters"].items():
+            setattr(parameters.bipop_parameters, name, value)
+        for name, sequence in state["restart_statistics"].items():
+            setattr(parameters, name, parameters.restart_statistics())
+            for value in sequence:
+                getattr(parameters, name).append(value)
+
+        populations = state["populations"]
+        parameters.old_population = populations["old_population"] and Population(
+            **populations["old_population"]
+        )
+        parameters.population = (
+            parameters.old_population if state["population_is_old"]
+            else populations["population"] and Population(**populations["population"])
+        )
+        if state["history_log"] is not None:
+            parameters.history_log = HistoryLog(
+                parameters.history_file, n_flushed=state["history_log"]
+            )
+
+        parameters.sampler = parameters.get_sampler()
+        parameters.sampler.set_state(state["sampler"])
+        if rng["kind"] == "Generator":
+            parameters.rng.bit_generator.state = rng["state"]
+        else:
+            (parameters.rng or np.random).set_state(rng["state"])
+        return parameters
+
+    def flush_history(self) -> None:
+        """Write the buffered history to history_file, when history = 'file'."""
+        if self.history_log is not None:
+            self.history_log.flush()
+
     def record_statistics(self) -> None:
         """Method for recording metadata."""
 
@@ -759,10 +1343,56 @@ class Parameters(AnnotatedStruct):
             self.population.f[0] == self.population.f[self.flat_fitness_index]
         )
         self.t += 1
-        self.sigma_over_time.append(self.sigma)
-        self.best_fopts.append(self.fopt)
-        self.best_fitnesses.append(np.max(self.population.f))
-        self.median_fitnesses.append(np.median(self.population.f))
+        best_fitness = np.max(self.population.f)
+        median_fitness = np.median(self.population.f)
+        if self.history == "file":
+            self.history_log.append(self.sigma, self.fopt, best_fitness, median_fitness)
+        elif self.history:
+            self.sigma_over_time.append(self.sigma)
+            self.best_fopts.append(self.fopt)
+            self.best_fitnesses.append(best_fitness)
+            self.median_fitnesses.append(median_fitness)
+        if self.local_restart or self.compute_termination_criteria:
+            self.update_restart_statistics(best_fitness, median_fitness)
+
+    def restart_statistics(self) -> HeadTailMedians:
+        """Create an empty sequence of fitness values for the stagnation criterion.
+
+        With history = 'ring', the sequence only keeps the last 20000 values, the
+        maximal n_stagnation, such that its memory is bounded.
+        """
+        return HeadTailMedians(0.3, 20000 if self.history == "ring" else None)
+
+    def update_restart_statistics(self, best_fitness: float, median_fitness: float) -> None:
+        """Method for updating the statistics used by the termination criteria.
+
+        These cover the generations since the last restart (or since the termination
+        criteria are computed), and are updated incrementally, such that computing
+        the termination criteria does not depend on the length of the run.
+
+        Parameters
+        ----------
+        best_fitness: float
+            The best fitness value of the current generation
+        median_fitness: float
+            The median fitness value of the current generation
+
+        """
+        if self.restart_statistics_start != self.last_restart:
+            self.restart_statistics_start = self.last_restart
+            self.n_equal_fitnesses = 0
+            self.best_fitness_medians = self.restart_statistics()
+            self.median_fitness_medians = self.restart_statistics()
+
+        if (
+            self.n_equal_fitnesses
+            and best_fitness - self.best_fitness_medians.sequence[-1] == 0
+        ):
+            self.n_equal_fitnesses += 1
+        else:
+            self.n_equal_fitnesses = 1
+        self.best_fitness_medians.append(best_fitness)
+        self.median_fitness_medians.append(median_fitness)
 
     def calculate_termination_criteria(self) -> None:
         """Method for computing restart criteria.
@@ -772,10 +1402,8 @@ class Parameters(AnnotatedStruct):
         """
         if self.local_restart or self.compute_termination_criteria:
             _t = self.t % self.d
-            diag_C = np.diag(self.C.T)
+            diag_C, D, axis = self.covariance_summary(_t)
             d_sigma = self.sigma / self.sigma0
-            best_fopts = self.best_fitnesses[self.last_restart:]
-            median_fitnesses = self.median_fitnesses[self.last_restart:]
             time_since_restart = self.t - self.last_restart
             self.termination_criteria = (
                 dict()
@@ -783,8 +1411,8 @@ class Parameters(AnnotatedStruct):
                 else {
                     "max_iter": (time_since_restart > self.max_iter),
                     "equalfunvalues": (
-                        len(best_fopts) > self.nbin
-                        and np.ptp(best_fopts[-self.nbin:]) == 0
+                        time_since_restart > self.nbin
+                        and self.n_equal_fitnesses >= self.nbin
                     ),
                     "flat_fitness": (
                         time_since_restart > self.flat_fitnesses.maxlen
@@ -795,11 +1423,11 @@ class Parameters(AnnotatedStruct):
                         (np.append(self.pc.T, diag_C) * d_sigma)
                         < (self.tolx * self.sigma0)
                     ),
-                    "tolupsigma": (d_sigma > self.tolup_sigma * np.sqrt(self.D.max())),
-                    "conditioncov": np.linalg.cond(self.C) > self.condition_cov,
+                    "tolupsigma": (d_sigma > self.tolup_sigma * np.sqrt(D.max())),
+                    "conditioncov": (D.max() / D.min()) ** 2 > self.condition_cov,
                     "noeffectaxis": np.all(
                         (
-                            1 * self.sigma * np.sqrt(self.D[_t, 0]) * self.B[:, _t]
+                            1 * self.sigma * np.sqrt(D[_t, 0]) * axis
                             + self.m
                         )
                         == self.m
@@ -810,10 +1438,10 @@ class Parameters(AnnotatedStruct):
                     "stagnation": (
                         time_since_restart > self.n_stagnation
                         and (
-                            np.median(best_fopts[-int(0.3 * time_since_restart):])
-                            >= np.median(best_fopts[: int(0.3 * time_since_restart)])
-                            and np.median(median_fitnesses[-int(0.3 * time_since_restart):])
-                            >= np.median(median_fitnesses[: int(0.3 * time_since_restart)])
+                            self.best_fitness_medians.tail.median()
+                            >= self.best_fitness_medians.head.median()
+                            and self.median_fitness_medians.tail.median()
+                            >= self.median_fitness_medians.head.median()
                         )
                     ),
                 }
@@ -876,6 +1504,8 @@ class BIPOPParameters(AnnotatedStruct):
     budget_small: int = None
     budget_large: int = None
     used_budget: int = 0
+    # random number generator of the run, see Parameters.rng
+    rng = None
 
     @property
     def large(self) -> bool:
@@ -897,7 +1527,7 @@ class BIPOPParameters(AnnotatedStruct):
     @property
     def sigma(self) -> float:
         """Return value for sigma, based on which regime is active."""
-        return 2 if self.large else 2e-2 * np.random.uniform()
+        return 2 if self.large else 2e-2 * (self.rng or np.random).uniform()
 
     @property
     def mu(self) -> int:
@@ -921,7 +1551,7 @@ class BIPOPParameters(AnnotatedStruct):
 
         self.lambda_small = np.floor(
             self.lambda_init
-            * (0.5 * self.lambda_large / self.lambda_init) ** (np.random.uniform() ** 2)
+            * (0.5 * self.lambda_large / self.lambda_init) ** ((self.rng or np.random).uniform() ** 2)
         ).astype(int)
 
         if self.lambda_small % 2 != 0:
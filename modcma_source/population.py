@@ -6,6 +6,8 @@ import numpy as np
 class Population:
     """Object for holding a Population of individuals."""
 
+    __slots__ = ("x", "y", "z", "f", "s")
+
     def __init__(self, x, y, z, f, s=None):
         """Reshape x and y."""
         self.x = x
@@ -18,16 +20,80 @@ class Population:
             self.y = self.y.reshape(-1, 1)
             self.z = self.z.reshape(-1, 1)
 
+    @classmethod
+    def empty(cls, d: int, capacity: int, dtype: Any = float) -> "Population":
+        """Return preallocated storage for capacity individuals of dimension d.
+
+        The (d, capacity) buffers are stored column-major, such that the leading
+        columns form a contiguous block, as produced by fancy indexing in sort.
+
+        Parameters
+        ----------
+        d: int
+            The dimension of the individuals
+        capacity: int
+            The number of individuals that can be stored
+        dtype: type = float
+            The dtype of the fitness values
+
+        Returns
+        -------
+        Population
+
+        """
+        return cls(
+            np.empty((capacity, d)).T,
+            np.empty((capacity, d)).T,
+            np.empty((capacity, d)).T,
+            np.empty(capacity, dtype),
+            np.empty(capacity),
+        )
+
+    def take(self, indices: np.ndarray, out: "Population" = None) -> "Population":
+        """Return the individuals at the given indices.
+
+        Parameters
+        ----------
+        indices: np.ndarray
+            The (non-negative) indices of the individuals, in order
+        out: Population = None
+            Storage (see empty) in which the individuals are placed. When given,
+            no new arrays are allocated and a view of the leading columns of out
+            is returned. The storage may not be shared with self.
+
+        Returns
+        -------
+        Population
+
+        """
+        if out is None:
+            return Population(
+                self.x[:, indices], self.y[:, indices], self.z[:, indices],
+                self.f[indices], self.s[indices]
+            )
+        n = len(indices)
+        for a, b in zip((self.x, self.y, self.z), (out.x, out.y, out.z)):
+            np.take(a, indices, axis=1, out=b[:, :n], mode="clip")
+        np.take(self.f, indices, out=out.f[:n], mode="clip")
+        np.take(self.s, indices, out=out.s[:n], mode="clip")
+        return out[:n]
+
     def sort(self) -> "Population":
-        """Sort the population according to their fitness values."""
-        rank = np.argsort(self.f)
-        self.x = self.x[:, rank]
-        self.y = self.y[:, rank]
-        self.z = self.z[:, rank]
-        self.f = self.f[rank]
-        self.s = self.s[rank]
+        """Sort the population according to their fitness values.
+
+        A stable sort is used, such that ties are ordered by index regardless of
+        the dtype of f.
+        """
+        sorted_ = self.take(self.rank())
+        self.x, self.y, self.z, self.f, self.s = (
+            sorted_.x, sorted_.y, sorted_.z, sorted_.f, sorted_.s
+        )
         return self
 
+    def rank(self) -> np.ndarray:
+        """Return the indices that (stably) sort the population by fitness."""
+        return np.argsort(self.f, kind="stable")
+
     def copy(self) -> "Population":
         """Return a new population object, with it's variables copied.
 
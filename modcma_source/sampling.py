@@ -6,61 +6,334 @@ import numpy as np
 from scipy import stats
 
 
-class QmcSampler(Iterator):
-    """Wrapper around scipy.stats.qmc quasi random samplers."""
+class BlockSampler(Iterator):
+    """Base class for samplers producing a (d, n) block of samples per call.
 
-    def __init__(self, qmc: stats.qmc.QMCEngine):
+    Calling the sampler with n returns the next n samples of its stream as the
+    columns of a (d, n) array, which is identical to hstacking n single samples.
+    Iterating over a sampler yields (d, 1) samples, as the generator based
+    samplers do.
+    """
+
+    d: int
+
+    def __call__(self, n: int, out: np.ndarray = None) -> np.ndarray:
+        """Get the next n samples.
+
+        Parameters
+        ----------
+        n: int
+            The number of samples
+        out: np.ndarray = None
+            Optional (d, n) array to write the samples into. This may be a view.
+
+        Returns
+        -------
+        np.ndarray
+            The (d, n) block of samples, out when it is given
+
+        """
+        if out is None:
+            out = np.empty((self.d, n))
+        if n > 0:
+            self.fill(out)
+        return out
+
+    def fill(self, out: np.ndarray) -> None:
+        """Write the next out.shape[1] samples into the columns of out."""
+        raise NotImplementedError
+
+    def __next__(self) -> np.ndarray:
+        """Get the next sample as a (d, 1) array."""
+        return self(1)
+
+    def get_state(self) -> dict:
+        """Return the position of the sampler in its stream.
+
+        The random number generator the sampler draws from is not included.
+
+        Returns
+        -------
+        dict
+            A dict of arrays, scalars and nested dicts for wrapped samplers
+
+        """
+        return dict()
+
+    def set_state(self, state: dict) -> None:
+        """Continue the stream from a state returned by get_state."""
+
+
+def draw_seed(rng=None) -> int:
+    """Draw a seed for a qmc engine.
+
+    Parameters
+    ----------
+    rng: np.random.Generator or np.random.RandomState = None
+        The random number generator to draw from, the global
+        np.random state when None
+
+    Returns
+    -------
+    int
+
+    """
+    if isinstance(rng, np.random.Generator):
+        return int(rng.integers(int(1e9)))
+    return (rng or np.random).randint(1e9)
+
+
+class GaussianSampler(BlockSampler):
+    """Block sampler for random normal (gaussian) samples."""
+
+    def __init__(self, d: int, rng=None):
+        """Set the dimensionality and random number generator.
+
+        Parameters
+        ----------
+        d: int
+            dimensionality of the generated samples
+        rng: np.random.Generator or np.random.RandomState = None
+            The random number generator to draw from, the global
+            np.random state when None
+
+        """
+        self.d = d
+        self.rng = rng
+
+    def fill(self, out: np.ndarray) -> None:
+        """Draw the samples sample by sample (row by row of the transpose).
+
+        Without rng, this consumes the global random state in the same order as
+        gaussian_sampling does.
+        """
+        out[...] = (self.rng or np.random).normal(size=out.shape[::-1]).T
+
+
+class QmcSampler(BlockSampler):
+    """Wrapper around scipy.stats.qmc quasi random samplers.
+
+    The samples are every other point of the qmc sequence, transformed with the
+    inverse normal cdf. Points are generated in power-of-two blocks, which are
+    transformed at once and buffered, so that the samples are the same as when
+    they are drawn one at a time.
+    """
+
+    def __init__(self, qmc: stats.qmc.QMCEngine, block_size: int = 256):
         """Intialize qmc wrapper.
 
         Parameters
         ----------
         qmc :stats.qmc.QMCEngine
             Any of the samplers defined in scipy.stats.qmc module
+        block_size: int = 256
+            The minimum number of points generated at once, a power of two
 
         """
         self.qmc = qmc
+        self.d = qmc.d
+        self.block_size = block_size
+        self.buffer = np.empty((self.d, 0))
+        self.position = 0
+        self.seed = None
 
-    def __next__(self) -> np.ndarray:
-        """Get next sample and advance qmc sampler.
+    def refill(self, n: int) -> None:
+        """Generate a block of points holding at least n samples.
 
-        Returns
-        -------
-        np.ndarray
+        Parameters
+        ----------
+        n: int
+            The number of samples needed
 
         """
-        sample = self.qmc.random(1)
-        self.qmc.fast_forward(1)
-        return stats.norm.ppf(sample.ravel()).reshape(-1, 1)
+        n_points = max(self.block_size, 1 << int(2 * n - 1).bit_length())
+        points = self.qmc.random(n_points)[::2]
+        self.buffer = stats.norm.ppf(points).T
+        self.position = 0
+
+    def fill(self, out: np.ndarray) -> None:
+        """Get next samples from the buffer, refilling it when it runs out."""
+        i, n = 0, out.shape[1]
+        while i < n:
+            if self.position == self.buffer.shape[1]:
+                self.refill(n - i)
+            k = min(n - i, self.buffer.shape[1] - self.position)
+            out[:, i : i + k] = self.buffer[:, self.position : self.position + k]
+            self.position += k
+            i += k
+
+    def get_state(self) -> dict:
+        """Return the seed, the number of generated points and the unused buffer.
+
+        Raises
+        ------
+        ValueError
+            When the seed of the qmc engine is not known
+
+        """
+        if self.seed is None:
+            raise ValueError("The state of a qmc engine with unknown seed cannot be stored")
+        return dict(
+            seed=self.seed,
+            num_generated=self.qmc.num_generated,
+            buffer=self.buffer[:, self.position :],
+        )
+
+    def set_state(self, state: dict) -> None:
+        """Recreate the qmc engine from its seed and fast forward it."""
+        self.seed = state["seed"]
+        self.qmc = type(self.qmc)(self.d, seed=self.seed)
+        self.qmc.fast_forward(state["num_generated"])
+        self.buffer = state["buffer"]
+        self.position = 0
 
 
 class Sobol(QmcSampler):
     """Wrapper around scipy.stats.qmc.Sobol sampler."""
 
-    def __init__(self, d: int):
+    def __init__(self, d: int, rng=None):
         """Call super init.
 
         Parameters
         ----------
         d: int
             dimensionality of the generated samples
+        rng: np.random.Generator or np.random.RandomState = None
+            The random number generator the seed of the sequence is drawn
+            from, the global np.random state when None
 
         """
-        super().__init__(stats.qmc.Sobol(d, seed=np.random.randint(1e9)))
+        seed = draw_seed(rng)
+        super().__init__(stats.qmc.Sobol(d, seed=seed))
+        self.seed = seed
 
 
 class Halton(QmcSampler):
     """Wrapper around scipy.stats.qmc.Halton sampler."""
 
-    def __init__(self, d: int):
+    def __init__(self, d: int, rng=None):
         """Call super init.
 
         Parameters
         ----------
         d: int
             dimensionality of the generated samples
+        rng: np.random.Generator or np.random.RandomState = None
+            The random number generator the seed of the sequence is drawn
+            from, the global np.random state when None
+
+        """
+        seed = draw_seed(rng)
+        super().__init__(stats.qmc.Halton(d, seed=seed))
+        self.seed = seed
+
+
+class MirroredSampler(BlockSampler):
+    """Block transform yielding mirrored samples.
+
+    For every sample from the input sampler, both its original and complemented
+    form are returned. When a block ends between the two, the complement is
+    kept for the next call.
+    """
+
+    def __init__(self, sampler: BlockSampler):
+        """Wrap sampler.
+
+        Parameters
+        ----------
+        sampler: BlockSampler
+            The sampler producing the original samples
+
+        """
+        self.sampler = sampler
+        self.d = sampler.d
+        self.pending = None
+
+    def fill(self, out: np.ndarray) -> None:
+        """Write original samples in the even and complements in the odd columns."""
+        if self.pending is not None:
+            np.negative(self.pending, out=out[:, 0])
+            self.pending = None
+            out = out[:, 1:]
+        n = out.shape[1]
+        if n == 0:
+            return
+        originals = out[:, ::2]
+        self.sampler((n + 1) // 2, out=originals)
+        np.negative(originals[:, : n // 2], out=out[:, 1::2])
+        if n % 2:
+            self.pending = originals[:, -1].copy()
+
+    def get_state(self) -> dict:
+        """Return the pending complement and the state of the wrapped sampler."""
+        return dict(pending=self.pending, sampler=self.sampler.get_state())
+
+    def set_state(self, state: dict) -> None:
+        """Set the pending complement and the state of the wrapped sampler."""
+        self.pending = state["pending"]
+        self.sampler.set_state(state["sampler"])
+
+
+class OrthogonalSampler(BlockSampler):
+    """Block transform yielding orthogonal samples.
+
+    Orthogonalizes groups of max(d, n_samples) samples with a single qr
+    decomposition and returns the first n_samples of each group, rescaled to
+    their original lengths. As in orthogonal_sampling, the samples of a group
+    that are not returned are orthogonalized again together with the new
+    samples of the next group, and samples left over at the end of a block are
+    returned first by the next call.
+    """
+
+    def __init__(self, sampler: BlockSampler, n_samples: int):
+        """Wrap sampler.
+
+        Parameters
+        ----------
+        sampler: BlockSampler
+            The sampler producing the samples to orthogonalize
+        n_samples: int
+            An integer indicating the number of sample to be orthogonalized.
 
         """
-        super().__init__(stats.qmc.Halton(d, seed=np.random.randint(1e9)))
+        self.sampler = sampler
+        self.d = sampler.d
+        self.n_samples = n_samples
+        self.carried = np.empty((self.d, 0))
+        self.remaining = np.empty((self.d, 0))
+
+    def orthogonalize(self) -> np.ndarray:
+        """Draw and orthogonalize the next group of samples."""
+        n_new = max(self.d, self.n_samples) - self.carried.shape[1]
+        samples = np.hstack([self.carried, self.sampler(n_new)])
+        length = np.linalg.norm(samples, axis=0)
+        q, *_ = np.linalg.qr(samples.T)
+        samples = q.T * length
+        self.carried = samples[:, self.n_samples:][:, ::-1]
+        return samples[:, : self.n_samples]
+
+    def fill(self, out: np.ndarray) -> None:
+        """Copy the remaining and newly orthogonalized samples into out."""
+        i, n = 0, out.shape[1]
+        while i < n:
+            if self.remaining.shape[1] == 0:
+                self.remaining = self.orthogonalize()
+            k = min(n - i, self.remaining.shape[1])
+            out[:, i : i + k] = self.remaining[:, :k]
+            self.remaining = self.remaining[:, k:]
+            i += k
+
+    def get_state(self) -> dict:
+        """Return the carried and remaining samples and the state of the wrapped sampler."""
+        return dict(
+            carried=self.carried, remaining=self.remaining, sampler=self.sampler.get_state()
+        )
+
+    def set_state(self, state: dict) -> None:
+        """Set the carried and remaining samples and the state of the wrapped sampler."""
+        self.carried = state["carried"]
+        self.remaining = state["remaining"]
+        self.sampler.set_state(state["sampler"])
 
 
 def gaussian_sampling(d: int) -> Generator[np.ndarray, None, None]:
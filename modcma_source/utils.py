@@ -1,10 +1,13 @@
 """Implementation of various utilities used in ModularCMA-ES package."""
 
+import json
 import warnings
 import typing
+from bisect import bisect_left, insort
+from collections import deque
 from inspect import Signature, Parameter, getmodule
 from functools import wraps
-from time import time
+from time import time, perf_counter
 
 import numpy as np
 
@@ -204,6 +207,268 @@ class AnnotatedStruct(metaclass=AnnotatedStructMeta):
 
 
 
+class SortedWindow:
+    """Multiset of values kept in sorted order, for computing a running median.
+
+    The median is identical to that of np.median over the same values. NaN values
+    are counted instead of stored, as np.median returns NaN if any are present.
+    """
+
+    __slots__ = ("values", "n_nan")
+
+    def __init__(self):
+        """Create an empty window."""
+        self.values = []
+        self.n_nan = 0
+
+    def add(self, value: float) -> None:
+        """Add a value to the window."""
+        if value != value:
+            self.n_nan += 1
+        else:
+            insort(self.values, value)
+
+    def remove(self, value: float) -> None:
+        """Remove a value, which must have been added before, from the window."""
+        if value != value:
+            self.n_nan -= 1
+        else:
+            del self.values[bisect_left(self.values, value)]
+
+    def __len__(self) -> int:
+        """The number of values in the window."""
+        return len(self.values) + self.n_nan
+
+    def median(self) -> float:
+        """Median of the values in the window."""
+        n = len(self.values)
+        if self.n_nan or n == 0:
+            return np.nan
+        if n % 2:
+            return self.values[n // 2]
+        return np.mean([self.values[n // 2 - 1], self.values[n // 2]])
+
+
+class HeadTailMedians:
+    """Running medians of the first and the last int(fraction * n) of a growing sequence.
+
+    After each append, head and tail contain the values seq[:k] and seq[-k:] with
+    k = int(fraction * n) and n the number of appended values. Each append costs
+    O(k) at most (a list insertion), instead of the O(n log n) of recomputing
+    both medians from the full sequence.
+
+    When max_length is given, only the last max_length values are kept, and head
+    and tail are those of this sliding window, with n = len(sequence).
+    """
+
+    __slots__ = ("fraction", "sequence", "head", "tail")
+
+    def __init__(self, fraction: float, max_length: int = None):
+        """Create an empty sequence."""
+        self.fraction = fraction
+        self.sequence = deque(maxlen=max_length)
+        self.head = SortedWindow()
+        self.tail = SortedWindow()
+
+    def append(self, value: float) -> None:
+        """Append a value to the sequence and update head and tail."""
+        if len(self.sequence) == self.sequence.maxlen and len(self.head):
+            # the first value of the window, at the start of head, is dropped
+            self.head.remove(self.sequence[0])
+        self.sequence.append(value)
+        n = len(self.sequence)
+        k = int(self.fraction * n)
+        while len(self.head) < k:
+            self.head.add(self.sequence[len(self.head)])
+        self.tail.add(value)
+        while len(self.tail) > k:
+            self.tail.remove(self.sequence[n - len(self.tail)])
+
+
+class HistoryLog:
+    """Per generation records stored in a float64 array, periodically flushed to disk.
+
+    The records are appended to an .npy file with the structured dtype
+    HistoryLog.dtype, which can be read with np.load. The header is written with
+    a fixed size, such that a flush only writes the new records and the shape.
+    """
+
+    dtype = np.dtype([
+        ("sigma", np.float64),
+        ("fopt", np.float64),
+        ("best_fitness", np.float64),
+        ("median_fitness", np.float64),
+    ])
+    header_size = 256
+
+    def __init__(self, filename: str, buffer_size: int = 1024, n_flushed: int = 0):
+        """Create (or truncate) the file and allocate the buffer.
+
+        Parameters
+        ----------
+        filename: str
+            The .npy file the records are written to
+        buffer_size: int = 1024
+            The number of records kept in memory before they are flushed
+        n_flushed: int = 0
+            When > 0, the existing file is continued after its first n_flushed
+            records, e.g. when resuming from a checkpoint
+
+        """
+        self.filename = filename
+        self.buffer = np.empty(buffer_size, self.dtype)
+        self.n_buffered = 0
+        self.n_flushed = n_flushed
+        with open(self.filename, "r+b" if n_flushed else "wb") as f:
+            f.truncate(self.header_size + n_flushed * self.dtype.itemsize)
+            self.write_header(f)
+
+    def write_header(self, f: typing.BinaryIO) -> None:
+        """Write the .npy header for the flushed records at the start of f."""
+        header = repr({
+            "descr": np.lib.format.dtype_to_descr(self.dtype),
+            "fortran_order": False,
+            "shape": (self.n_flushed,),
+        })
+        magic = np.lib.format.magic(1, 0)
+        header = header.ljust(self.header_size - len(magic) - 3) + "\n"
+        f.seek(0)
+        f.write(magic + len(header).to_bytes(2, "little") + header.encode("latin1"))
+
+    def append(self, *record: float) -> None:
+        """Append a record, flushing the buffer if it is full."""
+        self.buffer[self.n_buffered] = record
+        self.n_buffered += 1
+        if self.n_buffered == len(self.buffer):
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the buffered records to the file."""
+        if self.n_buffered == 0:
+            return
+        with open(self.filename, "r+b") as f:
+            f.seek(self.header_size + self.n_flushed * self.dtype.itemsize)
+            f.write(self.buffer[: self.n_buffered].tobytes())
+            self.n_flushed += self.n_buffered
+            self.n_buffered = 0
+            self.write_header(f)
+
+    def load(self) -> np.ndarray:
+        """Return all records, including those that are not yet flushed."""
+        self.flush()
+        return np.load(self.filename)
+
+
+def encode_state(state: dict, arrays: dict, prefix: str = "") -> dict:
+    """Split a (nested) dict of state variables into JSON-serializable metadata and arrays.
+
+    Numpy arrays and scalars, and lists and deques of numbers are stored in arrays,
+    under their (dotted) name, such that their dtypes are preserved. Object arrays
+    are stored as float64. Python scalars, None and strings are stored in the
+    metadata, which records the type of each variable.
+
+    Parameters
+    ----------
+    state: dict
+        The variables to encode
+    arrays: dict
+        The dict the arrays are added to, e.g. for np.savez
+    prefix: str = ""
+        Prefix of the names in arrays
+
+    Returns
+    -------
+    dict
+        The metadata, to be passed to decode_state
+
+    Raises
+    ------
+    TypeError
+        When a variable of an unsupported type is given
+
+    """
+    meta = dict()
+    for name, value in state.items():
+        key = prefix + name
+        if isinstance(value, dict):
+            meta[name] = ["dict", encode_state(value, arrays, key + ".")]
+        elif isinstance(value, np.ndarray) and value.dtype == object:
+            arrays[key] = value.astype(float)
+            meta[name] = ["object_array"]
+        elif isinstance(value, (np.ndarray, np.generic)):
+            arrays[key] = value
+            meta[name] = ["array" if isinstance(value, np.ndarray) else "scalar"]
+        elif isinstance(value, deque):
+            arrays[key] = np.array(value)
+            meta[name] = ["deque", value.maxlen]
+        elif isinstance(value, list):
+            arrays[key] = np.array(value)
+            meta[name] = ["list"]
+        elif value is None or isinstance(value, (bool, int, float, str)):
+            meta[name] = ["value", value]
+        else:
+            raise TypeError(f"Cannot encode {key} of type {type(value)}")
+    return meta
+
+
+def decode_state(meta: dict, arrays: typing.Mapping, prefix: str = "") -> dict:
+    """Inverse of encode_state.
+
+    Parameters
+    ----------
+    meta: dict
+        The metadata returned by encode_state
+    arrays: typing.Mapping
+        The arrays, e.g. an NpzFile
+    prefix: str = ""
+        Prefix of the names in arrays
+
+    Returns
+    -------
+    dict
+
+    """
+    state = dict()
+    for name, (kind, *info) in meta.items():
+        key = prefix + name
+        if kind == "dict":
+            state[name] = decode_state(info[0], arrays, key + ".")
+        elif kind == "value":
+            state[name] = info[0]
+        elif kind == "array":
+            state[name] = arrays[key]
+        elif kind == "object_array":
+            state[name] = arrays[key].astype(object)
+        elif kind == "scalar":
+            state[name] = arrays[key][()]
+        elif kind == "deque":
+            state[name] = deque(arrays[key], maxlen=info[0])
+        elif kind == "list":
+            state[name] = list(arrays[key])
+    return state
+
+
+def accepts_matrix(func: typing.Callable) -> bool:
+    """Determine whether func evaluates all rows of an (n, d) matrix in a single call.
+
+    This is the case for the problems of the ioh package, and for any callable
+    that defines a truthy attribute `vectorized`.
+
+    Parameters
+    ----------
+    func: typing.Callable
+        An objective function
+
+    Returns
+    -------
+    bool
+
+    """
+    if getattr(func, "vectorized", False):
+        return True
+    return type(func).__module__.split(".")[0] == "ioh"
+
+
 def timeit(func):
     """Decorator function for timing the excecution of a function.
 
@@ -228,6 +493,91 @@ def timeit(func):
     return inner
 
 
+class Profiler:
+    """Cumulative wall time and call counts of the phases of a generation loop.
+
+    The times are exclusive: the time spent in a timed phase that is called from
+    within another timed phase, such as bound correction during sampling, is only
+    attributed to the inner phase. Phases are timed by TimedStage wrappers, see
+    ModularCMAES.enable_profiling.
+
+    Attributes
+    ----------
+    times: dict
+        The cumulative exclusive wall time in seconds, by phase
+    calls: dict
+        The number of calls, by phase
+    stack: list
+        The time spent in the inner phases of each phase that is currently running
+
+    """
+
+    def __init__(self) -> None:
+        """Start with empty counters."""
+        self.times = dict()
+        self.calls = dict()
+        self.stack = []
+
+    def wrap(self, phase: str, func: typing.Callable) -> "TimedStage":
+        """Return func, timed as phase."""
+        self.times.setdefault(phase, 0.0)
+        self.calls.setdefault(phase, 0)
+        return TimedStage(phase, func, self)
+
+    def reset(self) -> None:
+        """Set all counters to zero."""
+        self.times = dict.fromkeys(self.times, 0.0)
+        self.calls = dict.fromkeys(self.calls, 0)
+
+    def as_dict(self) -> dict:
+        """Return the counters as {phase: {"time": seconds, "calls": count}}."""
+        return {
+            phase: {"time": self.times[phase], "calls": self.calls[phase]}
+            for phase in self.times
+        }
+
+    def export(self, filename: str, **metadata) -> None:
+        """Append the counters to a JSON lines file.
+
+        Parameters
+        ----------
+        filename: str
+            The file to append to, one line is written per call
+        **metadata
+            Identifies the run, stored next to the counters, e.g. fid=1, rep=0
+
+        """
+        with open(filename, "a") as f:
+            f.write(json.dumps(dict(metadata, phases=self.as_dict())) + "\n")
+
+
+class TimedStage:
+    """Callable that adds the wall time of each call of func to a Profiler."""
+
+    __slots__ = ("phase", "func", "profiler")
+
+    def __init__(self, phase: str, func: typing.Callable, profiler: Profiler) -> None:
+        """Time func as phase of profiler."""
+        self.phase = phase
+        self.func = func
+        self.profiler = profiler
+
+    def __call__(self, *args, **kwargs):
+        """Call func and update the counters of the profiler."""
+        stack = self.profiler.stack
+        stack.append(0.0)
+        start = perf_counter()
+        try:
+            return self.func(*args, **kwargs)
+        finally:
+            elapsed = perf_counter() - start
+            inner = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            self.profiler.times[self.phase] += elapsed - inner
+            self.profiler.calls[self.phase] += 1
+
+
 def ert(evals, budget):
     """Computed the expected running time of a list of evaluations.
 
@@ -0,0 +1,134 @@
+"""
+scheduler.py - 实验任务调度
+将 (algname, fid, iid, dim) 任务网格按重复次数拆分为独立单元，
+按估计耗时从大到小排序后通过进程池逐个分发（work stealing），
+并记录每个任务的实际耗时，用于下一次运行的耗时估计。
+传入 ledger 时，已完成的单元会被跳过，每个单元的结果会写入账本。
+"""
+
+import json
+import os
+import time
+from collections import defaultdict
+from multiprocessing import Pool
+
+MAX_THREADS = 32
+BUDGET_FACTOR = 10000
+
+
+def expand_tasks(tasks, n_reps):
+    """将每个 (algname, fid, iid, dim) 任务拆分为 n_reps 个 (algname, fid, iid, dim, rep) 单元"""
+    return [(*task, rep) for task in tasks for rep in range(n_reps)]
+
+
+def load_history(history_file):
+    """读取历史耗时: {"algname/fid": [总耗时(秒), 总规模(dim * budget)]}"""
+    if history_file is None or not os.path.exists(history_file):
+        return {}
+    with open(history_file, 'r') as f:
+        return json.load(f)
+
+
+def save_history(history_file, history):
+    """保存历史耗时"""
+    if history_file is None:
+        return
+    os.makedirs(os.path.dirname(history_file) or '.', exist_ok=True)
+    with open(history_file, 'w') as f:
+        json.dump(history, f, indent=1, sort_keys=True)
+
+
+def estimate_cost(unit, history, budget_factor=BUDGET_FACTOR):
+    """估计单元耗时: dim × budget × 该 (algname, fid) 的历史单位耗时
+
+    没有历史记录时使用所有已知单位耗时的平均值，完全没有历史时为 1。
+    """
+    algname, fid, iid, dim, rep = unit
+    rates = {key: seconds / size for key, (seconds, size) in history.items() if size > 0}
+    default_rate = sum(rates.values()) / len(rates) if rates else 1.0
+    rate = rates.get(f"{algname}/{fid}", default_rate)
+    return dim * (budget_factor * dim) * rate
+
+
+def _run_timed(arguments):
+    """在子进程中运行单元并计时，单元失败时不中断其他单元"""
+    run_function, unit = arguments
+    start = time.time()
+    try:
+        result = run_function(unit) or {}
+        status = 'done'
+    except Exception as e:
+        result = {'error': repr(e)}
+        status = 'failed'
+    return unit, time.time() - start, status, result
+
+
+def run_tasks(run_function, tasks, n_reps=5, history_file=None,
+              max_threads=MAX_THREADS, budget_factor=BUDGET_FACTOR, ledger=None):
+    """并行运行任务网格
+
+    Parameters
+    ----------
+    run_function: callable
+        顶层函数，参数为 (algname, fid, iid, dim, rep) 单元，
+        可返回一个写入账本的结果字典（例如 evaluations, best_f）
+    tasks: iterable
+        (algname, fid, iid, dim) 任务网格，例如 itertools.product(...) 的结果
+    n_reps: int
+        每个任务的重复次数，每次重复作为一个独立单元调度
+    history_file: str
+        历史耗时文件，用于排序并在运行结束后更新
+    max_threads: int
+        最大进程数
+    budget_factor: int
+        预算为 budget_factor * dim
+    ledger: ledger.Ledger
+        任务账本，已完成的单元不再运行
+
+    Returns
+    -------
+    dict
+        每个 (algname, fid, iid, dim) 任务的总耗时（秒）
+    """
+    history = load_history(history_file)
+    units = expand_tasks(list(tasks), n_reps)
+    if ledger is not None:
+        completed = ledger.completed()
+        n_units = len(units)
+        units = [unit for unit in units if unit not in completed]
+        print(f"Skipping {n_units - len(units)} of {n_units} completed units")
+    units = sorted(
+        units,
+        key=lambda unit: estimate_cost(unit, history, budget_factor),
+        reverse=True,
+    )
+    if not units:
+        return {}
+
+    wall_times = defaultdict(float)
+    start = time.time()
+    with Pool(min(max_threads, len(units))) as p:
+        results = p.imap_unordered(
+            _run_timed, [(run_function, unit) for unit in units], chunksize=1
+        )
+        for n_done, (unit, seconds, status, result) in enumerate(results, 1):
+            algname, fid, iid, dim, rep = unit
+            if ledger is not None:
+                ledger.record(unit, status, wall_time=seconds, **result)
+            print(f"[{n_done}/{len(units)}] {algname} F{fid} I{iid} {dim}D "
+                  f"rep {rep}: {status} in {seconds:.1f}s")
+            if status != 'done':
+                print(f"    {result['error']}")
+                continue
+            wall_times[(algname, fid, iid, dim)] += seconds
+            seconds_total, size_total = history.get(f"{algname}/{fid}", (0.0, 0))
+            history[f"{algname}/{fid}"] = [
+                seconds_total + seconds, size_total + dim * budget_factor * dim
+            ]
+            save_history(history_file, history)
+
+    print(f"\nTotal wall time: {time.time() - start:.1f}s")
+    for (algname, fid, iid, dim), seconds in sorted(
+            wall_times.items(), key=lambda item: item[1], reverse=True):
+        print(f"{algname} F{fid} I{iid} {dim}D: {seconds:.1f}s")
+    return dict(wall_times)
@@ -2,66 +2,78 @@ import pandas as pd
 import numpy as np
 import glob
 import os
+import re
+import pickle
+import shutil
+import hashlib
+import argparse
+from multiprocessing import Pool
 
 DATA_FOLDER = "Data"
 CSV_FOLDER = "CSV_Results"
+CACHE_FOLDER = f"{CSV_FOLDER}/cache"
+PARQUET_FOLDER = f"{CSV_FOLDER}/FBUDGET_all.parquet"
+PARTITION_COLUMNS = ['lib', 'algname', 'fid']
+# benchmark 脚本使用 --logger milestones 时每个单元文件夹中直接写出的结果
+MILESTONE_FILE = "FBUDGET.csv"
+MAX_THREADS = 32
+# 缓存结果的格式版本，改变处理结果的代码修改后递增，使旧的缓存失效
+CACHE_VERSION = 2
 
 budget_factors = [10, 50, 100, 500, 1000, 5000, 10000]
 
 def process_file(fname):
-    """简化的文件处理函数"""
+    """流式文件处理函数
+
+    逐行读取 .dat 文件，每个运行只保留其评估次数和 raw_y，
+    运行结束时计算一次累计最小值，并用一次 searchsorted 得到所有预算因子下的最优值。
+    内存占用只与单个运行的长度有关，处理时间与文件长度成线性关系。
+    """
     print(f"Processing: {fname}")
     try:
         # 提取维度信息
         dim = int(fname.split('_')[-1][3:-4])
+        budgets = np.array(budget_factors) * dim
         
-        # 读取数据
-        with open(fname, 'r') as f:
-            content = f.read()
+        columns = {'fname': [], 'fx': [], 'run': [], 'budget_factor': [], 'budget': []}
         
-        # 分割不同的运行
-        runs = content.strip().split('evaluations raw_y')[1:]  # 跳过第一个空的部分
+        def emit(run_idx, evals, ys):
+            """为一个运行的每个预算因子计算性能"""
+            if not evals:
+                return
+            best = np.minimum.accumulate(np.array(ys))
+            # 不超过预算的最后一个数据点
+            last = np.searchsorted(np.array(evals), budgets, side='right') - 1
+            for budget_factor, budget_eval, idx in zip(budget_factors, budgets, last):
+                if idx >= 0:
+                    columns['fname'].append(fname)
+                    columns['fx'].append(best[idx])
+                    columns['run'].append(run_idx)
+                    columns['budget_factor'].append(budget_factor)
+                    columns['budget'].append(budget_eval)
         
-        all_data = []
-        for run_idx, run_data in enumerate(runs):
-            if not run_data.strip():
-                continue
-                
-            # 解析运行数据
-            lines = run_data.strip().split('\n')
-            run_items = []
-            
-            for line in lines:
-                if line.strip() and ' ' in line:
-                    parts = line.strip().split()
-                    if len(parts) == 2:
-                        try:
-                            eval_count = int(parts[0])
-                            raw_y = float(parts[1])
-                            run_items.append([eval_count, raw_y])
-                        except:
-                            continue
-            
-            if run_items:
-                # 为每个预算因子计算性能
-                for budget_factor in budget_factors:
-                    budget_eval = budget_factor * dim
-                    
-                    # 找到不超过预算的数据点
-                    valid_items = [item for item in run_items if item[0] <= budget_eval]
-                    
-                    if valid_items:
-                        min_y = min(item[1] for item in valid_items)
-                        all_data.append({
-                            'fname': fname,
-                            'fx': min_y,
-                            'run': run_idx + 1,
-                            'budget_factor': budget_factor,
-                            'budget': budget_eval
-                        })
+        run_idx, evals, ys = 0, [], []
+        with open(fname, 'r') as f:
+            for line in f:
+                # 分割不同的运行
+                if line.startswith('evaluations raw_y'):
+                    emit(run_idx, evals, ys)
+                    run_idx, evals, ys = run_idx + 1, [], []
+                    continue
+                parts = line.split()
+                if run_idx == 0 or len(parts) != 2:
+                    continue
+                try:
+                    eval_count = int(parts[0])
+                    raw_y = float(parts[1])
+                except ValueError:
+                    continue
+                evals.append(eval_count)
+                ys.append(raw_y)
+        emit(run_idx, evals, ys)
         
-        if all_data:
-            return pd.DataFrame(all_data)
+        if columns['fx']:
+            return pd.DataFrame(columns)
         else:
             print(f"No valid data found in {fname}")
             return None
@@ -79,63 +91,159 @@ def parse_filename(base):
     dim = int(parts[-1][:-1])  # 2D -> 2 (去掉D)
     return fid, iid, dim
 
-def main():
-    # 处理所有数据文件
-    all_results = []
-    
-    # 处理Baselines数据
-    baselines_files = glob.glob(f"{DATA_FOLDER}/Baselines/*/*/IOHprofiler_f*.dat")
-    print(f"Found {len(baselines_files)} Baselines files")
+def parse_rep(folder):
+    """解析文件夹名中的重复编号
+
+    benchmark 脚本把每个重复写入自己的文件夹 {algname}_R{rep}_F{fid}_I{iid}_{dim}D，
+    文件中只有一个运行。旧的布局 {algname}_F{fid}_I{iid}_{dim}D 把所有运行写入同一个文件，
+    此时返回 None。
+    """
+    match = re.search(r'_R(\d+)_F\d+_I\d+_\d+D$', folder)
+    return int(match.group(1)) if match else None
+
+def process_entry(entry):
+    """处理单个 .dat 或 FBUDGET.csv 文件并添加算法信息，结果按 路径 + mtime + 文件大小 缓存
+
+    每个重复一个文件夹的布局中，run 列为文件夹名中的重复编号 + 1。
+
+    Returns
+    -------
+    (pd.DataFrame 或 None, 是否命中缓存)
+    """
+    lib, fname = entry
+    stat = os.stat(fname)
+    key = (os.path.abspath(fname), stat.st_mtime_ns, stat.st_size, CACHE_VERSION)
+    cache_file = os.path.join(CACHE_FOLDER, hashlib.sha1(key[0].encode()).hexdigest() + '.pkl')
+    if os.path.exists(cache_file):
+        with open(cache_file, 'rb') as f:
+            cached_key, result = pickle.load(f)
+        if cached_key == key:
+            return result, True
     
-    for fname in baselines_files:
+    if os.path.basename(fname) == MILESTONE_FILE:
+        # 内存记录器直接写出的固定预算结果，已包含算法信息
+        result = pd.read_csv(fname)
+        if result.empty:
+            result = None
+    else:
         result = process_file(fname)
-        if result is not None:
-            # 添加算法信息
-            base = fname.split('\\')[-3]  # 使用Windows路径分隔符
+    # .dat 文件位于 {folder}/data_f{fid}/ 中，FBUDGET.csv 直接位于 {folder}/ 中
+    folder = os.path.normpath(fname).split(os.sep)[-2 if os.path.basename(fname) == MILESTONE_FILE else -3]
+    rep = parse_rep(folder)
+    if result is not None and rep is not None:
+        # 文件中的运行编号从 1 开始，按重复编号偏移，使 run = rep + 1
+        result['run'] = result['run'] + rep
+    if result is not None and 'algname' not in result.columns:
+        # 添加算法信息
+        if lib == 'Baselines':
             algname = 'modcma_bipop'  # 我们知道这是BIPOP-CMA-ES
-            
-            fid, iid, dim = parse_filename(base)
-            
-            result['algname'] = algname
-            result['fid'] = fid
-            result['iid'] = iid
-            result['dim'] = dim
-            all_results.append(result)
+        else:
+            algname = folder.split('_')[0]  # CS or DE
+        
+        fid, iid, dim = parse_filename(folder)
+        
+        result['algname'] = algname
+        result['fid'] = fid
+        result['iid'] = iid
+        result['dim'] = dim
     
-    # 处理OPYTIMIZER数据
-    optymizer_files = glob.glob(f"{DATA_FOLDER}/OPYTIMIZER/*/*/IOHprofiler_f*.dat")
-    print(f"Found {len(optymizer_files)} OPYTIMIZER files")
+    with open(cache_file, 'wb') as f:
+        pickle.dump((key, result), f)
+    return result, False
+
+def to_arrow_table(result, lib):
+    """转换为 Parquet 使用的紧凑类型: 字符串列为字典编码，数值列使用最小的定长类型"""
+    import pyarrow as pa
     
-    for fname in optymizer_files:
-        result = process_file(fname)
-        if result is not None:
-            # 添加算法信息
-            base = fname.split('\\')[-3]  # 使用Windows路径分隔符
-            algname = base.split('_')[0]  # CS or DE
-            
-            fid, iid, dim = parse_filename(base)
-            
-            result['algname'] = algname
-            result['fid'] = fid
-            result['iid'] = iid
-            result['dim'] = dim
-            all_results.append(result)
+    return pa.table({
+        'fname': pa.array(result['fname']).dictionary_encode(),
+        'fx': pa.array(result['fx'], type=pa.float64()),
+        'run': pa.array(result['run'], type=pa.int32()),
+        'budget_factor': pa.array(result['budget_factor'], type=pa.int32()),
+        'budget': pa.array(result['budget'], type=pa.int64()),
+        'algname': pa.array(result['algname'], type=pa.string()),
+        'fid': pa.array(result['fid'], type=pa.int16()),
+        'iid': pa.array(result['iid'], type=pa.int16()),
+        'dim': pa.array(result['dim'], type=pa.int16()),
+        'lib': pa.array([lib] * len(result), type=pa.string()),
+    })
+
+def write_parquet(tables, folder=PARQUET_FOLDER):
+    """写入按 lib/algname/fid 分区的 Parquet 数据集，先写临时目录再替换旧数据集"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
     
-    # 合并所有结果
-    if all_results:
-        final_df = pd.concat(all_results, ignore_index=True)
-        
-        # 保存结果
-        output_file = f"{CSV_FOLDER}/FBUDGET_all.csv"
-        final_df.to_csv(output_file, index=False)
+    tmp_folder = folder + ".tmp"
+    shutil.rmtree(tmp_folder, ignore_errors=True)
+    pq.write_to_dataset(
+        pa.concat_tables(tables).unify_dictionaries(),
+        tmp_folder,
+        partition_cols=PARTITION_COLUMNS,
+    )
+    shutil.rmtree(folder, ignore_errors=True)
+    os.replace(tmp_folder, folder)
+
+def main(parquet=False):
+    # 收集所有数据文件
+    entries = []
+    for lib in ['Baselines', 'OPYTIMIZER']:
+        milestone_files = sorted(glob.glob(f"{DATA_FOLDER}/{lib}/*/{MILESTONE_FILE}"))
+        # 已有固定预算结果的文件夹不再解析 .dat 文件
+        milestone_folders = {os.path.dirname(fname) for fname in milestone_files}
+        files = [
+            fname for fname in sorted(glob.glob(f"{DATA_FOLDER}/{lib}/*/*/IOHprofiler_f*.dat"))
+            if os.path.dirname(os.path.dirname(fname)) not in milestone_folders
+        ]
+        print(f"Found {len(files)} {lib} files and {len(milestone_files)} {MILESTONE_FILE} files")
+        entries.extend((lib, fname) for fname in sorted(files + milestone_files))
+    
+    if not entries:
+        print("No data processed successfully")
+        return
+    
+    os.makedirs(CACHE_FOLDER, exist_ok=True)
+    
+    # 并行处理，只有新增或修改过的文件会被重新解析，结果逐个写入输出文件
+    output_file = f"{CSV_FOLDER}/FBUDGET_all.csv"
+    tmp_file = output_file + ".tmp"
+    total_rows, n_cached = 0, 0
+    seen = {'algname': set(), 'fid': set(), 'iid': set(), 'dim': set()}
+    tables = []
+    with Pool(min(MAX_THREADS, len(entries))) as p, open(tmp_file, 'w', newline='') as out:
+        results = p.imap(process_entry, entries, chunksize=4)
+        for (lib, fname), (result, cached) in zip(entries, results):
+            n_cached += cached
+            if result is None:
+                continue
+            result.to_csv(out, index=False, header=(total_rows == 0))
+            if parquet:
+                tables.append(to_arrow_table(result, lib))
+            total_rows += len(result)
+            for column, values in seen.items():
+                values.update(result[column].unique())
+    
+    print(f"Reused {n_cached} of {len(entries)} files from cache")
+    if total_rows:
+        os.replace(tmp_file, output_file)
         print(f"Saved results to {output_file}")
-        print(f"Total rows: {len(final_df)}")
-        print(f"Algorithms: {final_df['algname'].unique()}")
-        print(f"Functions: {final_df['fid'].unique()}")
-        print(f"Instances: {final_df['iid'].unique()}")
-        print(f"Dimensions: {final_df['dim'].unique()}")
+        if parquet:
+            write_parquet(tables)
+            print(f"Saved partitioned Parquet dataset to {PARQUET_FOLDER}")
+        elif os.path.isdir(PARQUET_FOLDER):
+            # dt_fb_old.py 优先读取 Parquet 数据集，旧的数据集会覆盖这次的 CSV 结果
+            shutil.rmtree(PARQUET_FOLDER)
+            print(f"Removed outdated Parquet dataset {PARQUET_FOLDER}")
+        print(f"Total rows: {total_rows}")
+        print(f"Algorithms: {sorted(seen['algname'])}")
+        print(f"Functions: {sorted(seen['fid'])}")
+        print(f"Instances: {sorted(seen['iid'])}")
+        print(f"Dimensions: {sorted(seen['dim'])}")
     else:
+        os.remove(tmp_file)
         print("No data processed successfully")
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--parquet', action='store_true',
+                        help=f"同时写入按 {'/'.join(PARTITION_COLUMNS)} 分区的 Parquet 数据集 (需要 pyarrow)")
+    main(**vars(parser.parse_args()))
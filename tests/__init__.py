@@ -0,0 +1 @@
+"""Tests for the vendored Modular CMA-ES package (modcma_source) and the benchmark scripts."""
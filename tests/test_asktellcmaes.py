@@ -0,0 +1,117 @@
+"""Module containing tests for the ask and tell interface."""
+
+import unittest
+import warnings
+
+import numpy as np
+
+from modcma_source import ModularCMAES, AskTellCMAES
+
+
+def sphere(x):
+    """Shifted sphere function of a single x."""
+    return float(np.sum((np.ravel(x) - 0.5) ** 2))
+
+
+class TestAskTellCMAES(unittest.TestCase):
+    """Asking and telling individually or in batches gives the runs of ModularCMAES."""
+
+    _dim = 5
+    _generations = 60
+
+    def setUp(self):
+        """Ignore the warnings of degenerated parameters."""
+        warnings.filterwarnings("ignore", category=RuntimeWarning)
+
+    def optimizer(self, **config):
+        """Create an AskTellCMAES after seeding the global random state."""
+        np.random.seed(17)
+        return AskTellCMAES(self._dim, **config)
+
+    def expected(self, **config):
+        """Run the same configuration with ModularCMAES for the same number of generations."""
+        np.random.seed(17)
+        optimizer = ModularCMAES(sphere, self._dim, **config)
+        for _ in range(self._generations):
+            optimizer.step()
+        return optimizer.parameters
+
+    def assert_same_run(self, parameters, expected):
+        """Compare the state after both runs."""
+        self.assertEqual(parameters.used_budget, expected.used_budget)
+        self.assertEqual(parameters.fopt, expected.fopt)
+        self.assertEqual(parameters.m.tobytes(), expected.m.tobytes())
+
+    def test_single(self):
+        """Test asking and telling one individual at a time."""
+        for config in (dict(), dict(local_restart="IPOP", active=True)):
+            with self.subTest(**config):
+                optimizer = self.optimizer(**config)
+                while optimizer.parameters.t < self._generations:
+                    x = optimizer.ask()
+                    optimizer.tell(x, sphere(x))
+                self.assert_same_run(optimizer.parameters, self.expected(**config))
+
+    def test_batches(self):
+        """Test batches not aligned with the generations, told in reverse order."""
+        for n in (1, 3, 8, 100):
+            with self.subTest(n=n):
+                optimizer = self.optimizer()
+                while optimizer.parameters.t < self._generations:
+                    x, tickets = optimizer.ask(n)
+                    self.assertLessEqual(len(x), n)
+                    self.assertEqual(x.shape[1], self._dim)
+                    f = np.array([sphere(xi) for xi in x])
+                    optimizer.tell(tickets[::-1], f[::-1])
+                self.assert_same_run(optimizer.parameters, self.expected())
+
+    def test_tickets(self):
+        """Test tickets number the individuals of all generations consecutively."""
+        optimizer = self.optimizer()
+        lambda_ = optimizer.parameters.lambda_
+        x, tickets = optimizer.ask(lambda_ + 3)
+        np.testing.assert_array_equal(tickets, np.arange(lambda_))
+        x2, tickets2 = optimizer.ask(2)
+        self.assertEqual((len(x2), len(tickets2)), (0, 0))
+        optimizer.tell(tickets, [sphere(xi) for xi in x])
+        x, tickets = optimizer.ask(2)
+        np.testing.assert_array_equal(tickets, [lambda_, lambda_ + 1])
+        with self.assertRaises(ValueError):
+            optimizer.tell(np.array([0]), [1.0])
+        with self.assertRaises(ValueError):
+            optimizer.tell(np.array([lambda_ + 2]), [1.0])
+
+    def test_errors(self):
+        """Test the errors and warnings of invalid calls."""
+        optimizer = self.optimizer()
+        with self.assertRaises(RuntimeError):
+            optimizer.tell(np.zeros((self._dim, 1)), 0.0)
+        x, tickets = optimizer.ask(optimizer.parameters.lambda_ - 1)
+        last = optimizer.ask()
+        with self.assertRaises(RuntimeError):
+            optimizer.ask()
+        with self.assertRaises(ValueError):
+            optimizer.tell(np.ones((self._dim, 1)) * 100, 0.0)
+        optimizer.tell(tickets[:1], [1.0])
+        with self.assertWarns(UserWarning):
+            optimizer.tell(tickets[:1], [2.0])
+        self.assertEqual(optimizer.parameters.population.f[0], 2.0)
+        optimizer.tell(tickets[1:], np.ones(len(tickets) - 1))
+        optimizer.tell(last, 0.0)
+        self.assertEqual(optimizer.n_asked, 0)
+        with self.assertRaises(NotImplementedError):
+            optimizer.run()
+
+    def test_break_conditions(self):
+        """Test ask and tell stop after the budget is used."""
+        optimizer = self.optimizer(budget=500)
+        while not any(optimizer.break_conditions):
+            x, tickets = optimizer.ask(4)
+            optimizer.tell(tickets, [sphere(xi) for xi in x])
+        self.assertEqual(optimizer.parameters.used_budget, 500)
+        with self.assertRaises(StopIteration):
+            optimizer.ask()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,161 @@
+"""Module containing tests for the steady-state ask and tell interface and the asyncio driver."""
+
+import asyncio
+import unittest
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from modcma_source import ModularCMAES, AskTellCMAES, SteadyStateCMAES, run_async
+
+
+def sphere(x):
+    """Shifted sphere function of a single x."""
+    return float(np.sum((np.ravel(x) - 0.5) ** 2))
+
+
+class TestSteadyStateCMAES(unittest.TestCase):
+    """Updating the distribution from the most recently told individuals."""
+
+    _dim = 5
+
+    def setUp(self):
+        """Ignore the warnings of degenerated parameters."""
+        warnings.filterwarnings("ignore", category=RuntimeWarning)
+
+    def optimizer(self, **config):
+        """Create a SteadyStateCMAES after seeding the global random state."""
+        np.random.seed(18)
+        return SteadyStateCMAES(self._dim, **config)
+
+    def test_generational(self):
+        """Test asking and telling whole generations in order equals ModularCMAES."""
+        np.random.seed(18)
+        expected = ModularCMAES(sphere, self._dim)
+        for _ in range(40):
+            expected.step()
+        optimizer = self.optimizer()
+        while optimizer.version < 40:
+            x, tickets = optimizer.ask(optimizer.parameters.lambda_)
+            optimizer.tell(tickets, [sphere(xi) for xi in x])
+        self.assertEqual(optimizer.parameters.m.tobytes(), expected.parameters.m.tobytes())
+        self.assertEqual(optimizer.parameters.used_budget, expected.parameters.used_budget)
+        self.assertEqual(optimizer.n_discarded, 0)
+
+    def test_discard(self):
+        """Test individuals older than max_age updates are dropped."""
+        for max_age, n_discarded in ((0, 8), (1, 0)):
+            with self.subTest(max_age=max_age):
+                optimizer = self.optimizer(max_age=max_age)
+                lambda_ = optimizer.parameters.lambda_
+                x, tickets = optimizer.ask(2 * lambda_)
+                f = np.array([sphere(xi) for xi in x])
+                optimizer.tell(tickets[:lambda_], f[:lambda_])
+                self.assertEqual(optimizer.version, 1)
+                optimizer.tell(tickets[lambda_:], f[lambda_:])
+                self.assertEqual(optimizer.n_discarded, n_discarded)
+                self.assertEqual(optimizer.version, 1 + (n_discarded == 0))
+
+    def test_reweight(self):
+        """Test stale individuals are expressed in and bounded for the current distribution."""
+        optimizer = self.optimizer(stale="reweight")
+        lambda_ = optimizer.parameters.lambda_
+        x, tickets = optimizer.ask(2 * lambda_)
+        f = np.array([sphere(xi) for xi in x])
+        optimizer.tell(tickets[:lambda_], f[:lambda_])
+        p = optimizer.parameters
+        m, sigma, inv_root_C = p.m.copy(), p.sigma, p.inv_root_C.copy()
+        optimizer.tell(tickets[lambda_:], f[lambda_:])
+        self.assertEqual(optimizer.version, 2)
+
+        population = optimizer.parameters.population
+        bound = np.sqrt(self._dim) + 2 * self._dim / (self._dim + 2)
+        self.assertTrue((np.linalg.norm(population.z, axis=0) <= bound + 1e-12).all())
+        for i in range(population.n):
+            y = (population.x[:, i:i + 1] - m) / sigma
+            scale = min(1, bound / np.linalg.norm(inv_root_C @ y))
+            np.testing.assert_allclose(population.y[:, i:i + 1], y * scale)
+
+    def test_tell(self):
+        """Test telling single individuals and invalid tickets."""
+        optimizer = self.optimizer()
+        x = optimizer.ask()
+        optimizer.tell(x, sphere(x))
+        self.assertEqual(len(optimizer.results), 1)
+        self.assertEqual(optimizer.pending, dict())
+        with self.assertRaises(ValueError):
+            optimizer.tell(np.array([5]), [0.0])
+        with self.assertRaises(ValueError):
+            optimizer.tell(x + 1, sphere(x))
+        with self.assertRaises(ValueError):
+            optimizer.tell(x, sphere(x))
+
+    def test_invalid(self):
+        """Test unsupported policies and modules are rejected."""
+        with self.assertRaises(ValueError):
+            SteadyStateCMAES(self._dim, stale="ignore")
+        with self.assertRaises(NotImplementedError):
+            SteadyStateCMAES(self._dim, step_size_adaptation="tpa")
+
+
+class TestRunAsync(unittest.TestCase):
+    """The asyncio driver keeps evaluations in flight until the budget is used."""
+
+    _dim = 4
+    _budget = 400
+
+    def setUp(self):
+        """Ignore the warnings of degenerated parameters."""
+        warnings.filterwarnings("ignore", category=RuntimeWarning)
+
+    def test_coroutine(self):
+        """Test a coroutine objective with random delays and at most n_workers in flight."""
+        rng = np.random.default_rng(0)
+        in_flight = []
+
+        async def objective(x):
+            in_flight.append(len(in_flight) + 1)
+            await asyncio.sleep(rng.uniform(0, 1e-3))
+            in_flight.pop()
+            return sphere(x)
+
+        for optimizer in (AskTellCMAES, SteadyStateCMAES):
+            with self.subTest(optimizer=optimizer.__name__):
+                np.random.seed(1)
+                result = asyncio.run(run_async(optimizer(self._dim, budget=self._budget), objective, 4))
+                self.assertEqual(result.parameters.used_budget, self._budget)
+                self.assertLess(result.parameters.fopt, 1e-2)
+        self.assertLessEqual(max(in_flight, default=0), 4)
+
+    def test_executor(self):
+        """Test a regular objective run in a thread pool."""
+        np.random.seed(2)
+        with ThreadPoolExecutor(3) as executor:
+            result = asyncio.run(run_async(SteadyStateCMAES(self._dim, budget=self._budget), sphere, 3, executor))
+        self.assertEqual(result.parameters.used_budget, self._budget)
+        self.assertLess(result.parameters.fopt, 1e-2)
+
+    def test_target(self):
+        """Test evaluations finished when the target is reached are told."""
+        rng = np.random.default_rng(3)
+        completed = []
+
+        async def objective(x):
+            await asyncio.sleep(rng.uniform(0, 1e-3))
+            completed.append(x)
+            return sphere(x)
+
+        for seed in range(5):
+            with self.subTest(seed=seed):
+                np.random.seed(seed)
+                completed.clear()
+                optimizer = SteadyStateCMAES(self._dim, budget=self._budget, target=1e-3)
+                result = asyncio.run(run_async(optimizer, objective, 8))
+                self.assertLessEqual(result.parameters.fopt, 1e-3)
+                self.assertEqual(result.parameters.used_budget, len(completed))
+                self.assertLess(result.parameters.used_budget, self._budget)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+"""Module containing tests for the BatchedCMAES engine."""
+
+import unittest
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from scipy import linalg
+
+from modcma_source import ModularCMAES, BatchedCMAES
+
+
+class Rastrigin:
+    """Shifted Rastrigin function, evaluating a single x or the rows of a matrix."""
+
+    def __init__(self, vectorized: bool = True):
+        """Set whether an (n, d) matrix is evaluated with a single call."""
+        self.vectorized = vectorized
+
+    def __call__(self, x):
+        """Evaluate x."""
+        x = np.asarray(x) - 1.5
+        return 10 * x.shape[-1] + (x ** 2 - 10 * np.cos(2 * np.pi * x)).sum(axis=-1)
+
+
+class TestBatchedCMAES(unittest.TestCase):
+    """Each run of a BatchedCMAES equals a sequential ModularCMAES run."""
+
+    _dim = 5
+    _budget = 2000
+    _seeds = (0, 1, 2)
+    _configs = (
+        dict(),
+        dict(bound_correction="saturate", local_restart="BIPOP"),
+        dict(bound_correction="saturate", local_restart="IPOP", active=True),
+        dict(bound_correction="COTN", weights_option="equal"),
+    )
+
+    def setUp(self):
+        """Ignore the warnings of restarts with degenerated parameters."""
+        warnings.filterwarnings("ignore", category=RuntimeWarning)
+
+    @staticmethod
+    def summary(parameters):
+        """State which should be identical after both runs."""
+        return (
+            parameters.fopt, parameters.used_budget, parameters.t,
+            len(parameters.restarts), parameters.m.tobytes(), parameters.sigma,
+        )
+
+    def sequential(self, seed, vectorized=False, **config):
+        """Run a ModularCMAES after seeding the global random state."""
+        np.random.seed(seed)
+        optimizer = ModularCMAES(
+            Rastrigin(vectorized), self._dim, budget=self._budget, **config
+        )
+        return self.summary(optimizer.run().parameters)
+
+    def batched(self, vectorized=False, **config):
+        """Run all seeds with a BatchedCMAES."""
+        return BatchedCMAES(
+            [Rastrigin(vectorized) for _ in self._seeds], self._dim, budget=self._budget,
+            seeds=self._seeds, **config
+        ).run()
+
+    def test_equivalence(self):
+        """Test the batched engine against sequential runs with the same seeds."""
+        for config in self._configs:
+            for vectorized in (False, True):
+                with self.subTest(vectorized=vectorized, **config):
+                    batched = self.batched(vectorized, **config)
+                    for seed, optimizer in zip(self._seeds, batched.optimizers):
+                        self.assertEqual(
+                            self.summary(optimizer.parameters),
+                            self.sequential(seed, vectorized, **config),
+                        )
+
+    def test_restarts(self):
+        """Test that the restart configurations actually restart."""
+        batched = self.batched(bound_correction="saturate", local_restart="BIPOP")
+        self.assertTrue(any(len(o.parameters.restarts) > 1 for o in batched.optimizers))
+
+    def test_seed_sequence(self):
+        """Test runs seeded with spawned SeedSequences are independent of their execution order."""
+        config = dict(bound_correction="COTN", local_restart="BIPOP")
+
+        def run(seed):
+            optimizer = ModularCMAES(Rastrigin(), self._dim, budget=self._budget, rng=seed, **config)
+            return self.summary(optimizer.run().parameters)
+
+        sequential = [run(seed) for seed in np.random.SeedSequence(9).spawn(3)]
+        with ThreadPoolExecutor(3) as pool:
+            threaded = list(pool.map(run, np.random.SeedSequence(9).spawn(3)[::-1]))[::-1]
+        batched = BatchedCMAES(
+            [Rastrigin() for _ in range(3)], self._dim, budget=self._budget,
+            seeds=np.random.SeedSequence(9).spawn(3), **config
+        ).run()
+        self.assertEqual(threaded, sequential)
+        self.assertEqual([self.summary(o.parameters) for o in batched.optimizers], sequential)
+        self.assertEqual(len(set(sequential)), 3)
+
+    def test_eigh(self):
+        """Test both engines decompose C with scipy's eigh, as upstream modcma does."""
+        np.random.seed(4)
+        optimizer = ModularCMAES(Rastrigin(), self._dim, budget=self._budget)
+        batched = BatchedCMAES([Rastrigin()], self._dim, budget=self._budget, seeds=(4, ))
+        for _ in range(5):
+            optimizer.step()
+            batched.step()
+        for parameters in (optimizer.parameters, batched.optimizers[0].parameters):
+            D, B = linalg.eigh(parameters.C)
+            np.testing.assert_array_equal(parameters.D.ravel(), np.sqrt(D))
+            np.testing.assert_array_equal(parameters.B, B)
+
+    def test_unsupported(self):
+        """Test that modules without a batched implementation are rejected."""
+        with self.assertRaises(NotImplementedError):
+            BatchedCMAES([Rastrigin()], self._dim, step_size_adaptation="tpa")
+        with self.assertRaises(ValueError):
+            BatchedCMAES([Rastrigin()], self._dim, seeds=(0, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
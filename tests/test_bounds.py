@@ -0,0 +1,129 @@
+"""Module containing tests for the bound correction."""
+
+import unittest
+import warnings
+
+import numpy as np
+
+from modcma_source import ModularCMAES
+from modcma_source.bounds import correct, correct_bounds, BoundCorrection
+
+
+def reference_correct_bounds(x, ub, lb, correction_method, rng=None):
+    """The previous bound correction, which indexes the out-of-bounds coordinates."""
+    out_of_bounds = np.logical_or(x > ub, x < lb)
+    n_out_of_bounds = out_of_bounds.max(axis=-2).sum(axis=-1)
+    if not np.any(n_out_of_bounds) or correction_method is None:
+        return x, n_out_of_bounds
+
+    rng = rng or np.random
+    ub = np.broadcast_to(ub, x.shape)[out_of_bounds]
+    lb = np.broadcast_to(lb, x.shape)[out_of_bounds]
+    y = (x[out_of_bounds] - lb) / (ub - lb)
+
+    if correction_method == "mirror":
+        x[out_of_bounds] = lb + (ub - lb) * np.abs(y - np.floor(y) - np.mod(np.floor(y), 2))
+    elif correction_method == "COTN":
+        x[out_of_bounds] = lb + (ub - lb) * np.abs((y > 0) - np.abs(rng.normal(0, 1 / 3, size=y.shape)))
+    elif correction_method == "unif_resample":
+        x[out_of_bounds] = rng.uniform(lb, ub)
+    elif correction_method == "saturate":
+        x[out_of_bounds] = lb + (ub - lb) * (y > 0)
+    elif correction_method == "toroidal":
+        x[out_of_bounds] = lb + (ub - lb) * np.abs(y - np.floor(y))
+    return x, n_out_of_bounds
+
+
+class TestBoundCorrection(unittest.TestCase):
+    """The in-place kernel corrects as the previous bound correction."""
+
+    _methods = (None, "saturate", "mirror", "toroidal", "COTN", "unif_resample")
+
+    def setUp(self):
+        """Create points partly outside of per-coordinate bounds."""
+        rng = np.random.default_rng(20)
+        self.lb = np.array([[-5.0], [-1.0], [0.0], [-2.0]])
+        self.ub = np.array([[5.0], [3.0], [0.5], [2.0]])
+        self.x = rng.normal(0, 6, size=(4, 30))
+
+    def test_correct(self):
+        """Test every method against the reference, with the same random draws."""
+        for method in self._methods:
+            with self.subTest(method=method):
+                expected, n_expected = reference_correct_bounds(
+                    self.x.copy(), self.ub, self.lb, method, np.random.RandomState(1)
+                )
+                x = np.asfortranarray(self.x)
+                counts = correct(x, self.lb, self.ub, method, np.random.RandomState(1))
+                np.testing.assert_allclose(x, expected, rtol=0, atol=1e-12)
+                np.testing.assert_array_equal(counts, ((self.x > self.ub) | (self.x < self.lb)).sum(axis=0))
+                self.assertEqual(np.count_nonzero(counts), n_expected)
+                if method is not None:
+                    self.assertTrue(((x >= self.lb) & (x <= self.ub)).all())
+
+    def test_correct_bounds(self):
+        """Test the stacked interface used by the batched engine."""
+        x = np.stack([self.x, self.x[:, ::-1], np.zeros_like(self.x)])
+        for method in ("saturate", "mirror", "COTN"):
+            with self.subTest(method=method):
+                np.random.seed(2)
+                expected, n_expected = reference_correct_bounds(x.copy(), self.ub, self.lb, method)
+                np.random.seed(2)
+                result, n_out_of_bounds = correct_bounds(x.copy(), self.ub, self.lb, method)
+                np.testing.assert_allclose(result, expected, rtol=0, atol=1e-12)
+                np.testing.assert_array_equal(n_out_of_bounds, n_expected)
+                self.assertEqual(n_out_of_bounds[-1], 0)
+
+    def test_bound_correction(self):
+        """Test the buffers are reused across calls and grown for larger blocks."""
+        bounds = BoundCorrection(4, self.lb, self.ub, "toroidal")
+        for n in (10, 5, 30):
+            x = np.asfortranarray(self.x[:, :n])
+            expected, _ = reference_correct_bounds(self.x[:, :n].copy(), self.ub, self.lb, "toroidal")
+            bounds(x)
+            np.testing.assert_allclose(x, expected, rtol=0, atol=1e-12)
+        self.assertEqual(bounds.buffers[0].shape, (4, 30))
+        scalar = BoundCorrection(3, -1, 1, "saturate")
+        self.assertEqual(scalar.width.shape, (3, 1))
+        with self.assertRaises(ValueError):
+            BoundCorrection(4, self.lb, self.ub, "reflect")(self.x.copy())
+
+    def test_runs(self):
+        """Test runs without TPA are unchanged and TPA points are corrected."""
+        warnings.filterwarnings("ignore", category=RuntimeWarning)
+        def run(reference, **config):
+            np.random.seed(4)
+            optimizer = ModularCMAES(lambda x: float(np.sum((x - 4.5) ** 2)), 3, budget=1500, **config)
+            if reference:
+                p = optimizer.parameters
+
+                def bounds(x):
+                    out_of_bounds = (x > p.ub) | (x < p.lb)
+                    reference_correct_bounds(x, p.ub, p.lb, p.bound_correction)
+                    return out_of_bounds.sum(axis=0)
+                p.bounds = bounds
+            return optimizer.run().parameters
+
+        for config in (
+            dict(bound_correction="COTN"),
+            dict(bound_correction="unif_resample", local_restart="IPOP"),
+            dict(bound_correction="mirror", mirrored="mirrored"),
+            dict(bound_correction="toroidal"),
+        ):
+            with self.subTest(**config):
+                a, b = run(False, **config), run(True, **config)
+                self.assertGreater(a.n_out_of_bounds, 0)
+                self.assertEqual(a.n_out_of_bounds, b.n_out_of_bounds)
+                self.assertEqual(a.m.tobytes(), b.m.tobytes())
+                self.assertEqual(a.fopt, b.fopt)
+
+        def fitness(x):
+            self.assertTrue((np.abs(x) <= 5).all())
+            return float(np.sum((np.ravel(x) - 4.9) ** 2))
+
+        np.random.seed(5)
+        ModularCMAES(fitness, 3, budget=1500, step_size_adaptation="tpa", bound_correction="saturate").run()
+
+
+if __name__ == "__main__":
+    unittest.main()
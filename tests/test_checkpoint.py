@@ -0,0 +1,123 @@
+"""Module containing tests for checkpointing and resuming runs."""
+
+import os
+import tempfile
+import unittest
+import warnings
+
+import numpy as np
+
+from modcma_source import ModularCMAES
+
+
+def rosenbrock(x):
+    """Rosenbrock function of a single x."""
+    x = np.ravel(x)
+    return float((100 * (x[1:] - x[:-1] ** 2) ** 2 + (1 - x[:-1]) ** 2).sum())
+
+
+class TestCheckpoint(unittest.TestCase):
+    """A run resumed from a checkpoint continues bit-identically."""
+
+    _dim = 4
+    _budget = 4000
+    _configs = (
+        dict(local_restart="BIPOP"),
+        dict(local_restart="IPOP", rng=5),
+        dict(
+            local_restart="IPOP", base_sampler="sobol", orthogonal=True,
+            mirrored="mirrored", rng=np.random.RandomState(3)
+        ),
+        dict(base_sampler="halton", mirrored="mirrored", local_restart="BIPOP"),
+        dict(elitist=True, step_size_adaptation="tpa"),
+        dict(step_size_adaptation="psr", active=True, history="ring"),
+        dict(step_size_adaptation="lp-xnes", sequential=True),
+        dict(bound_correction="COTN", threshold_convergence=True, lazy_eigendecomposition=True),
+        dict(covariance_model="sep", local_restart="IPOP"),
+        dict(covariance_model="lm", local_restart="IPOP"),
+        dict(covariance_model="cholesky", active=True, local_restart="BIPOP"),
+        dict(symmetric_update=True, active=True, local_restart="IPOP"),
+    )
+
+    def setUp(self):
+        """Create a temporary folder for the checkpoints."""
+        warnings.filterwarnings("ignore", category=RuntimeWarning)
+        self.folder = tempfile.TemporaryDirectory()
+        self.checkpoint = os.path.join(self.folder.name, "checkpoint.npz")
+
+    def tearDown(self):
+        """Remove the checkpoints."""
+        self.folder.cleanup()
+
+    def make(self, config):
+        """Create an optimizer, with a fresh RandomState when config contains one."""
+        config = dict(config)
+        if isinstance(config.get("rng"), np.random.RandomState):
+            config["rng"] = np.random.RandomState(3)
+        return ModularCMAES(rosenbrock, self._dim, budget=self._budget, **config)
+
+    @staticmethod
+    def steps(optimizer, n_generations):
+        """Perform n_generations generations, or fewer when the run ends."""
+        for _ in range(n_generations):
+            if not optimizer.step():
+                break
+
+    @staticmethod
+    def summary(parameters):
+        """State which should be identical after both runs."""
+        return (
+            parameters.fopt, parameters.used_budget, parameters.t, parameters.sigma,
+            len(parameters.restarts), parameters.m.tobytes(),
+            np.asarray(parameters.xopt).tobytes(), len(parameters.best_fitnesses),
+        )
+
+    def test_resume(self):
+        """Test that a resumed run equals an uninterrupted run."""
+        for i, config in enumerate(self._configs):
+            with self.subTest(**config):
+                np.random.seed(i)
+                expected = self.summary(self.make(config).run().parameters)
+
+                np.random.seed(i)
+                optimizer = self.make(config)
+                self.steps(optimizer, 37)
+                optimizer.checkpoint(self.checkpoint)
+                # The interrupted run continues after the checkpoint was taken
+                self.steps(optimizer, 5)
+
+                np.random.seed(1000)
+                resumed = ModularCMAES.resume(rosenbrock, self.checkpoint).run()
+                self.assertEqual(self.summary(resumed.parameters), expected)
+
+    def test_resume_history_file(self):
+        """Test that a resumed run continues the history file of the checkpoint."""
+        history_file = os.path.join(self.folder.name, "history.npy")
+        np.random.seed(1)
+        self.make(dict(history="file", history_file=history_file)).run()
+        expected = np.load(history_file)
+
+        np.random.seed(1)
+        optimizer = self.make(dict(history="file", history_file=history_file))
+        self.steps(optimizer, 37)
+        optimizer.checkpoint(self.checkpoint)
+        self.steps(optimizer, 5)
+        ModularCMAES.resume(rosenbrock, self.checkpoint).run()
+        self.assertTrue(np.array_equal(np.load(history_file), expected))
+
+
+    def test_checkpoint_interval(self):
+        """Test run saves the checkpoint every checkpoint_interval generations."""
+        np.random.seed(2)
+        expected = self.summary(self.make(dict()).run().parameters)
+        np.random.seed(2)
+        optimizer = self.make(dict())
+        optimizer.run(checkpoint=self.checkpoint, checkpoint_interval=20)
+        resumed = ModularCMAES.resume(rosenbrock, self.checkpoint)
+        self.assertEqual(resumed.parameters.t % 20, 0)
+        self.assertLess(optimizer.parameters.t - resumed.parameters.t, 20 + 1)
+        self.assertEqual(self.summary(resumed.run().parameters), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
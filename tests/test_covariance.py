@@ -0,0 +1,167 @@
+"""Module containing tests for the covariance models."""
+
+import unittest
+import warnings
+
+import numpy as np
+
+from modcma_source import ModularCMAES
+
+
+def ellipsoid(x, condition=1e6):
+    """Shifted separable ellipsoid function of a single x."""
+    x = np.ravel(x) - 1
+    return float((condition ** np.linspace(0, 1, len(x)) * x ** 2).sum())
+
+
+def rotated_ellipsoid(x, condition=1e6, _rotation=np.linalg.qr(np.random.default_rng(0).normal(size=(8, 8)))[0]):
+    """Rotated ellipsoid function of a single 8-D x."""
+    return ellipsoid(_rotation @ (np.ravel(x) - 1) + 1, condition)
+
+
+def rotated_ellipsoid_lm(x):
+    """Rotated ellipsoid with condition 1e2, as lm adapts slowly for small d."""
+    return rotated_ellipsoid(x, 1e2)
+
+
+class TestCovarianceModels(unittest.TestCase):
+    """The sep and lm models represent C without d x d matrices."""
+
+    _dim = 8
+
+    def setUp(self):
+        """Ignore the warnings of restarts with degenerated parameters."""
+        warnings.filterwarnings("ignore", category=RuntimeWarning)
+
+    def optimizer(self, function=ellipsoid, n_steps=30, **config):
+        """Create an optimizer from a fixed seed and perform n_steps generations."""
+        np.random.seed(21)
+        optimizer = ModularCMAES(function, self._dim, **config)
+        for _ in range(n_steps):
+            optimizer.step()
+        return optimizer
+
+    def test_full(self):
+        """Test the transforms of the full model use B, D and inv_root_C."""
+        p = self.optimizer().parameters
+        z = np.random.default_rng(1).normal(size=(self._dim, 5))
+        np.testing.assert_array_equal(p.transform(z), p.B @ (p.D * z))
+        np.testing.assert_array_equal(p.transform_inverse(z), p.inv_root_C @ z)
+
+    def test_sep(self):
+        """Test the diagonal update equals the diagonal of the full update."""
+        for active in (False, True):
+            with self.subTest(active=active):
+                optimizer = self.optimizer(covariance_model="sep", active=active)
+                p = optimizer.parameters
+                self.assertEqual(p.C.shape, (self._dim, 1))
+                self.assertIsNone(p.B)
+                self.assertIsNone(p.inv_root_C)
+
+                C = np.diagflat(p.C)
+                p.adapt_evolution_paths()
+                p.C, sep_C = C, p.C.copy()
+                p.covariance_model = "full"
+                p.adapt_covariance_matrix()
+                p.covariance_model, full_C, p.C = "sep", p.C, sep_C
+                p.adapt_covariance_matrix()
+                np.testing.assert_allclose(p.C[:, 0], np.diag(full_C), rtol=1e-12)
+
+                z = np.random.default_rng(1).normal(size=(self._dim, 5))
+                np.testing.assert_allclose(p.transform(z), np.sqrt(sep_C) * z)
+                np.testing.assert_allclose(p.transform_inverse(p.transform(z)), z)
+
+    def test_learning_rates(self):
+        """Test c1 and cmu are scaled by (d + 2) / 3 for sep."""
+        full = self.optimizer(n_steps=0).parameters
+        sep = self.optimizer(n_steps=0, covariance_model="sep").parameters
+        self.assertAlmostEqual(sep.c1, full.c1 * (self._dim + 2) / 3)
+        self.assertAlmostEqual(sep.cmu, min(1 - sep.c1, full.cmu * (self._dim + 2) / 3))
+
+    def test_lm(self):
+        """Test the transforms and the summary against the explicit matrix A."""
+        optimizer = self.optimizer(rotated_ellipsoid, covariance_model="lm")
+        p = optimizer.parameters
+        self.assertEqual(p.lm_vectors.shape, (p.memory_size, self._dim))
+        self.assertEqual(p.memory_size, 4 + int(3 * np.log(self._dim)))
+        self.assertEqual(p.lm_count, p.memory_size)
+        self.assertIsNone(p.C)
+
+        A = p.transform(np.eye(self._dim))
+        C = A @ A.T
+        z = np.random.default_rng(1).normal(size=(self._dim, 5))
+        np.testing.assert_allclose(p.transform(z), A @ z)
+        np.testing.assert_allclose(p.transform_inverse(A @ z), z, atol=1e-10)
+
+        for index in range(self._dim):
+            diag_C, D, axis = p.covariance_summary(index)
+            np.testing.assert_allclose(diag_C, np.diag(C))
+            np.testing.assert_allclose(np.sort(D.ravel() ** 2), np.linalg.eigvalsh(C))
+            self.assertAlmostEqual(np.linalg.norm(axis), 1)
+            np.testing.assert_allclose(C @ axis, D[index] ** 2 * axis, atol=1e-10)
+
+    def test_cholesky(self):
+        """Test the factor update equals the full update of C = A A^T."""
+        optimizer = self.optimizer(rotated_ellipsoid, covariance_model="cholesky")
+        p = optimizer.parameters
+        self.assertIsNone(p.C)
+        np.testing.assert_allclose(p.inv_A @ p.A, np.eye(self._dim), atol=1e-8)
+
+        A = p.A.copy()
+        p.adapt_evolution_paths()
+        p.adapt_covariance_matrix()
+        p.covariance_model, p.C = "full", A @ A.T
+        p.adapt_covariance_matrix()
+        np.testing.assert_allclose(p.A @ p.A.T, p.C, rtol=1e-8, atol=1e-12)
+
+        z = np.random.default_rng(1).normal(size=(self._dim, 5))
+        p.covariance_model = "cholesky"
+        np.testing.assert_allclose(p.transform(z), p.A @ z)
+        np.testing.assert_allclose(p.transform_inverse(p.transform(z)), z, atol=1e-8)
+
+    def test_cholesky_summary(self):
+        """Test the summary of the cholesky model is that of A A^T."""
+        for active in (False, True):
+            with self.subTest(active=active):
+                p = self.optimizer(rotated_ellipsoid, covariance_model="cholesky", active=active).parameters
+                C = p.A @ p.A.T
+                p.last_eigendecomposition = -p.eigendecomposition_interval
+                diag_C, D, axis = p.covariance_summary(2)
+                np.testing.assert_allclose(diag_C, np.diag(C))
+                np.testing.assert_allclose(D.ravel() ** 2, np.linalg.eigvalsh(C), rtol=1e-8)
+                np.testing.assert_allclose(C @ axis, D[2] ** 2 * axis, rtol=1e-6)
+
+    def test_cholesky_gate(self):
+        """Test the SVD of A is only computed with the termination criteria."""
+        p = self.optimizer(rotated_ellipsoid, covariance_model="cholesky").parameters
+        self.assertIsNone(p.B)
+        self.assertIsNone(p.D)
+        p = self.optimizer(rotated_ellipsoid, covariance_model="cholesky", compute_termination_criteria=True).parameters
+        self.assertEqual(p.D.shape, (self._dim, 1))
+        self.assertLessEqual(p.t - p.last_eigendecomposition, p.eigendecomposition_interval)
+
+    def test_runs(self):
+        """Test the models solve problems they can represent, with restarts."""
+        for function, model in (
+            (ellipsoid, "sep"),
+            (rotated_ellipsoid_lm, "lm"),
+            (rotated_ellipsoid, "full"),
+            (rotated_ellipsoid, "cholesky"),
+        ):
+            with self.subTest(covariance_model=model):
+                np.random.seed(2)
+                parameters = ModularCMAES(
+                    function, self._dim, budget=20000, target=1e-8,
+                    covariance_model=model, local_restart="IPOP",
+                ).run().parameters
+                self.assertLess(parameters.fopt, 1e-8)
+
+    def test_batched(self):
+        """Test the batched engine rejects the sep and lm models."""
+        from modcma_source import BatchedCMAES
+        with self.assertRaises(NotImplementedError):
+            BatchedCMAES([ellipsoid], self._dim, covariance_model="sep")
+
+
+if __name__ == "__main__":
+    unittest.main()
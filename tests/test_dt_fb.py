@@ -0,0 +1,176 @@
+"""Module containing tests for the fixed-budget aggregation and its Parquet outputs."""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+import numpy as np
+import pandas as pd
+
+import dt_fb_old
+import simple_process_old
+from tests.test_simple_process import write_data_tree
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "validation_scripts"))
+from result_files import newest_file  # noqa: E402
+
+
+def quiet(function, *args, **kwargs):
+    """Call function without printing its progress."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return function(*args, **kwargs)
+
+
+def random_fbudget(rng, n_runs=15):
+    """Rows of FBUDGET_all.csv for a few algorithms, functions and dimensions."""
+    rows = []
+    for algname in ("modcma_bipop", "CS", "DE", "other"):
+        for fid in (20, 21):
+            for dim in (2, 5):
+                for budget_factor in simple_process_old.budget_factors:
+                    for run in range(n_runs):
+                        rows.append((budget_factor, algname, fid, dim, 10 ** rng.normal(0, 3), budget_factor * dim))
+    dt = pd.DataFrame(rows, columns=dt_fb_old.COLUMNS)
+    return dt.sample(frac=1, random_state=0).reset_index(drop=True)
+
+
+class TestAggregate(unittest.TestCase):
+    """The vectorized aggregation matches a groupby over each row's library."""
+
+    def setUp(self):
+        """Create log-transformed fixed-budget rows."""
+        self.dt = random_fbudget(np.random.default_rng(5))
+        self.dt["fx"] = np.log10(np.clip(self.dt["fx"], 1e-8, 1e16))
+
+    def reference(self):
+        """The previous aggregation, applying get_lib to every row."""
+        dt = self.dt.copy()
+        dt["lib"] = dt["algname"].apply(dt_fb_old.get_lib)
+        return dt.groupby(dt_fb_old.GROUP_COLUMNS), dt
+
+    def aggregate(self, **statistics):
+        """Aggregate a copy of the rows with the given statistics."""
+        dt = dt_fb_old.add_lib(self.dt.copy())
+        return dt_fb_old.aggregate(dt, **statistics).astype({"algname": str, "lib": str})
+
+    def test_mean(self):
+        """Test the means equal those of the previous aggregation."""
+        grouped, _ = self.reference()
+        expected = grouped.agg("mean").reset_index()
+        pd.testing.assert_frame_equal(self.aggregate(), expected, check_dtype=False)
+
+    def test_median_quantiles(self):
+        """Test the median and quantile columns."""
+        grouped, _ = self.reference()
+        result = self.aggregate(median=True, quantiles=(0.25, 0.9))
+        np.testing.assert_allclose(result["fx_median"], grouped["fx"].median())
+        np.testing.assert_allclose(result["fx_q25"], grouped["fx"].quantile(0.25))
+        np.testing.assert_allclose(result["fx_q90"], grouped["fx"].quantile(0.9))
+
+    def test_bootstrap(self):
+        """Test the bootstrap intervals are reproducible and contain the group means."""
+        result = self.aggregate(n_bootstrap=200, seed=1)
+        pd.testing.assert_frame_equal(result, self.aggregate(n_bootstrap=200, seed=1))
+        self.assertFalse(result.equals(self.aggregate(n_bootstrap=200, seed=2)))
+        self.assertTrue((result["fx_ci_low"] <= result["fx"]).all())
+        self.assertTrue((result["fx"] <= result["fx_ci_high"]).all())
+        self.assertTrue((result["fx_ci_low"] < result["fx_ci_high"]).all())
+
+    def test_bootstrap_ci(self):
+        """Test the resampling stays within each group."""
+        values = np.array([1.0, 1.0, 1.0, 5.0, 5.0, 2.0, 4.0])
+        groups = np.array([0, 0, 0, 1, 1, 2, 2])
+        rng = np.random.default_rng(0)
+        order = rng.permutation(len(values))
+        low, high = dt_fb_old.bootstrap_ci(values[order], groups[order], 3, n_bootstrap=500)
+        np.testing.assert_array_equal(low[:2], [1.0, 5.0])
+        np.testing.assert_array_equal(high[:2], [1.0, 5.0])
+        self.assertEqual((low[2], high[2]), (2.0, 4.0))
+
+
+class TestParquet(unittest.TestCase):
+    """The Parquet dataset gives the same fixed-budget results as the CSV."""
+
+    def setUp(self):
+        """Create a Data tree in a temporary folder."""
+        self.folder = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.folder.name)
+        os.makedirs(simple_process_old.CSV_FOLDER)
+        write_data_tree(np.random.default_rng(4), ((1, 2), (20, 5), (21, 5), (20, 10)))
+
+    def tearDown(self):
+        """Remove the temporary folder."""
+        os.chdir(self.cwd)
+        self.folder.cleanup()
+
+    def from_csv(self, **filters):
+        """Aggregate FBUDGET_all.csv while the Parquet dataset is moved out of the way."""
+        os.rename(dt_fb_old.FBUDGET_PARQUET, "dataset")
+        try:
+            return quiet(dt_fb_old.process_fbudget_data, **filters)
+        finally:
+            os.rename("dataset", dt_fb_old.FBUDGET_PARQUET)
+
+    def assert_equal(self, result, expected):
+        """Compare the aggregations, ignoring categorical and integer width dtypes."""
+        columns = {"algname": str, "lib": str}
+        pd.testing.assert_frame_equal(result.astype(columns), expected.astype(columns), check_dtype=False)
+
+    def test_equivalence(self):
+        """Test reading the dataset, with and without filters, matches reading the CSV."""
+        quiet(simple_process_old.main, parquet=True)
+        self.assertTrue(os.path.isdir(simple_process_old.PARQUET_FOLDER))
+        for filters in ({}, {"fids": [20]}, {"dims": [5]}, {"fids": [20, 21], "dims": [5]}):
+            with self.subTest(**filters):
+                expected = self.from_csv(**filters)
+                result = quiet(dt_fb_old.process_fbudget_data, **filters)
+                self.assert_equal(result, expected)
+                self.assert_equal(pd.read_parquet("dt_fb.parquet"), expected)
+
+    def test_stale_outputs(self):
+        """Test a rebuild without Parquet removes the outputs of a previous Parquet build."""
+        quiet(simple_process_old.main, parquet=True)
+        quiet(dt_fb_old.process_fbudget_data)
+        self.assertTrue(os.path.exists("dt_fb.parquet"))
+
+        quiet(simple_process_old.main)
+        self.assertFalse(os.path.exists(simple_process_old.PARQUET_FOLDER))
+        quiet(dt_fb_old.process_fbudget_data)
+        self.assertFalse(os.path.exists("dt_fb.parquet"))
+        self.assertTrue(os.path.exists("dt_fb.csv"))
+
+
+class TestNewestFile(unittest.TestCase):
+    """The comparison scripts load the most recently written result file."""
+
+    def setUp(self):
+        """Change to a temporary folder."""
+        self.folder = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.folder.name)
+
+    def tearDown(self):
+        """Remove the temporary folder."""
+        os.chdir(self.cwd)
+        self.folder.cleanup()
+
+    def test_newest_file(self):
+        """Test the newest existing file is returned, or the last name if none exist."""
+        self.assertEqual(newest_file("dt_fb.parquet", "dt_fb.csv"), "dt_fb.csv")
+        open("dt_fb.parquet", "w").close()
+        self.assertEqual(newest_file("dt_fb.parquet", "dt_fb.csv"), "dt_fb.parquet")
+        open("dt_fb.csv", "w").close()
+        now = time.time()
+        os.utime("dt_fb.parquet", (now - 10, now - 10))
+        self.assertEqual(newest_file("dt_fb.parquet", "dt_fb.csv"), "dt_fb.csv")
+        os.utime("dt_fb.parquet", (now + 10, now + 10))
+        self.assertEqual(newest_file("dt_fb.parquet", "dt_fb.csv"), "dt_fb.parquet")
+
+
+if __name__ == "__main__":
+    unittest.main()
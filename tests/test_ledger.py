@@ -0,0 +1,76 @@
+"""Module containing tests for the task ledger."""
+
+import os
+import tempfile
+import unittest
+from functools import partial
+
+import scheduler
+from ledger import Ledger
+
+
+def run_unit(folder, unit):
+    """Run function of the tests, fails for fid 3 and records every call."""
+    algname, fid, iid, dim, rep = unit
+    with open(os.path.join(folder, "calls.txt"), "a") as f:
+        f.write(f"{fid} {rep}\n")
+    if fid == 3:
+        raise ValueError("unit failed")
+    return {"evaluations": 10 * dim, "best_f": float(fid)}
+
+
+class TestLedger(unittest.TestCase):
+    """Finished units are recorded and skipped when the grid is run again."""
+
+    def setUp(self):
+        """Create a ledger in a temporary folder."""
+        self.folder = tempfile.TemporaryDirectory()
+        self.ledger = Ledger(os.path.join(self.folder.name, "lib", "ledger.jsonl"))
+
+    def tearDown(self):
+        """Remove the temporary folder."""
+        self.folder.cleanup()
+
+    def calls(self):
+        """The (fid, rep) of every call of run_unit."""
+        with open(os.path.join(self.folder.name, "calls.txt")) as f:
+            return sorted(tuple(map(int, line.split())) for line in f)
+
+    def test_record(self):
+        """Test that the last status of each unit is used."""
+        self.assertEqual(self.ledger.entries(), [])
+        self.ledger.record(("a", 1, 1, 5, 0), "failed", error="x")
+        self.ledger.record(("a", 1, 1, 5, 1), "done", evaluations=50)
+        self.ledger.record(("a", 1, 1, 5, 0), "done", evaluations=50)
+        self.assertEqual(len(self.ledger.entries()), 3)
+        self.assertEqual(self.ledger.completed(), {("a", 1, 1, 5, 0), ("a", 1, 1, 5, 1)})
+        self.assertEqual(self.ledger.entries()[1]["evaluations"], 50)
+
+    def test_truncated_line(self):
+        """Test that a line interrupted while writing is ignored."""
+        self.ledger.record(("a", 1, 1, 5, 0), "done")
+        with open(self.ledger.filename, "a") as f:
+            f.write('{"algname": "a", "fid": 1, "iid"')
+        self.assertEqual(self.ledger.completed(), {("a", 1, 1, 5, 0)})
+
+    def test_resume(self):
+        """Test that run_tasks skips completed units and records failures."""
+        tasks = [("a", fid, 1, 2) for fid in (1, 2, 3)]
+        run = partial(run_unit, self.folder.name)
+        wall_times = scheduler.run_tasks(run, tasks, n_reps=2, max_threads=2, ledger=self.ledger)
+        self.assertEqual(set(wall_times), {("a", 1, 1, 2), ("a", 2, 1, 2)})
+        status = self.ledger.status()
+        self.assertEqual(status[("a", 3, 1, 2, 0)], "failed")
+        self.assertEqual(len(self.ledger.completed()), 4)
+        done = [e for e in self.ledger.entries() if e["status"] == "done"]
+        self.assertTrue(all(e["evaluations"] == 20 for e in done))
+
+        # Only the failed units run again
+        scheduler.run_tasks(run, tasks, n_reps=2, max_threads=2, ledger=self.ledger)
+        self.assertEqual(
+            self.calls(), sorted([(fid, rep) for fid in (1, 2, 3) for rep in (0, 1)] + [(3, 0), (3, 1)])
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
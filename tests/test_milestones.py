@@ -0,0 +1,86 @@
+"""Module containing tests for the in-memory fixed-budget milestone logger."""
+
+import contextlib
+import glob
+import io
+import os
+import tempfile
+import unittest
+
+import ioh
+import numpy as np
+import pandas as pd
+
+import simple_process_old
+from milestones import MilestoneLogger
+
+
+def random_search(problem, budget, rng):
+    """Evaluate budget uniform samples in the search space."""
+    for _ in range(budget):
+        problem(rng.uniform(-5, 5, problem.meta_data.n_variables))
+
+
+class TestMilestoneLogger(unittest.TestCase):
+    """The milestone logger gives the fixed-budget results extracted from the .dat files."""
+
+    def setUp(self):
+        """Create a temporary folder for the Analyzer."""
+        self.folder = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        """Remove the temporary folder."""
+        self.folder.cleanup()
+
+    def log(self, fid, dim, budgets, seed=7):
+        """Log runs with the given budgets with both the Analyzer and the milestone logger."""
+        analyzer = ioh.logger.Analyzer(root=self.folder.name, folder_name=f"F{fid}_{dim}D", algorithm_name="rs")
+        milestones = MilestoneLogger(dim)
+        problem = ioh.get_problem(fid, dimension=dim, instance=1)
+        # the problem does not keep a reference to its logger
+        logger = ioh.logger.Combine([analyzer, milestones])
+        problem.attach_logger(logger)
+        rng = np.random.default_rng(seed)
+        for budget in budgets:
+            random_search(problem, budget, rng)
+            problem.reset()
+        analyzer.close()
+        milestones.close()
+        fname, = glob.glob(os.path.join(self.folder.name, f"F{fid}_{dim}D", "*", "IOHprofiler_f*.dat"))
+        with contextlib.redirect_stdout(io.StringIO()):
+            expected = simple_process_old.process_file(fname)
+        return milestones, expected
+
+    def test_equivalence(self):
+        """Test the milestones equal the .dat results up to their 10 decimal places."""
+        for fid, dim, budgets in ((1, 2, (20, 1000, 250)), (20, 5, (3000, 49))):
+            with self.subTest(fid=fid, dim=dim):
+                milestones, expected = self.log(fid, dim, budgets)
+                result = milestones.to_frame("FBUDGET.csv", "rs", fid, 1, dim)
+                # runs that end before a budget are filled with their final best
+                self.assertEqual(len(result), len(budgets) * len(milestones.budget_factors))
+                for column in ("run", "budget_factor", "budget"):
+                    np.testing.assert_array_equal(result[column], expected[column])
+                np.testing.assert_allclose(result.fx, expected.fx, rtol=0, atol=5e-11)
+
+    def test_write(self):
+        """Test the written file has the columns of FBUDGET_all.csv and is read by simple_process."""
+        milestones, _ = self.log(1, 2, (30, 5))
+        fname = os.path.join(self.folder.name, "rs_R0_F1_I1_2D", "FBUDGET.csv")
+        milestones.write(fname, "rs", 1, 1, 2)
+        written = pd.read_csv(fname)
+        self.assertEqual(
+            list(written.columns),
+            ["fname", "fx", "run", "budget_factor", "budget", "algname", "fid", "iid", "dim"],
+        )
+        simple_process_old.CACHE_FOLDER, cache_folder = self.folder.name, simple_process_old.CACHE_FOLDER
+        try:
+            result, cached = simple_process_old.process_entry(("OPYTIMIZER", fname))
+        finally:
+            simple_process_old.CACHE_FOLDER = cache_folder
+        self.assertFalse(cached)
+        pd.testing.assert_frame_equal(result, written)
+
+
+if __name__ == "__main__":
+    unittest.main()
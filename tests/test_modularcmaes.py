@@ -0,0 +1,291 @@
+"""Module containing tests for the generation loop of ModularCMAES."""
+
+import json
+import os
+import tempfile
+import unittest
+import warnings
+
+import ioh
+import numpy as np
+
+from modcma_source import ModularCMAES, Parameters
+from modcma_source.utils import accepts_matrix
+
+
+class Ellipsoid:
+    """Shifted ellipsoid function, evaluating a single x or the rows of a matrix."""
+
+    def __init__(self, vectorized: bool = True):
+        """Set whether an (n, d) matrix is evaluated with a single call."""
+        self.vectorized = vectorized
+        self.calls = []
+
+    def __call__(self, x):
+        """Evaluate x, recording the argument."""
+        self.calls.append(x)
+        x = np.asarray(x) - 1
+        return (10 ** (6 * np.linspace(0, 1, x.shape[-1])) * x ** 2).sum(axis=-1)
+
+
+def module_configs():
+    """The default configuration and every non-default option of each module."""
+    configs = [dict()]
+    for name in Parameters.__modules__:
+        options = getattr(getattr(Parameters, name), "options", [False, True])
+        configs.extend({name: option} for option in options[1:])
+    return configs + [
+        dict(covariance_model="sep"),
+        dict(covariance_model="lm"),
+        dict(covariance_model="cholesky"),
+        dict(symmetric_update=True),
+        dict(sample_sigma=True),
+        dict(compute_termination_criteria=True),
+        dict(n_generations=60),
+        dict(elitist=True, local_restart="IPOP", bound_correction="mirror"),
+    ]
+
+
+class TestVectorizedFitness(unittest.TestCase):
+    """Objectives accepting an (n, d) matrix are called once per generation."""
+
+    _dim = 6
+
+    def setUp(self):
+        """Ignore the warnings of restarts with degenerated parameters."""
+        warnings.filterwarnings("ignore", category=RuntimeWarning)
+
+    def optimize(self, vectorized, n_steps=None, **config):
+        """Optimize from a fixed seed, n_steps generations or until a break condition."""
+        np.random.seed(5)
+        func = Ellipsoid(vectorized)
+        optimizer = ModularCMAES(func, self._dim, **config)
+        if n_steps is None:
+            optimizer.run()
+        else:
+            for _ in range(n_steps):
+                optimizer.step()
+        return optimizer, func
+
+    def test_accepts_matrix(self):
+        """Test the detection of matrix-capable objectives."""
+        self.assertTrue(accepts_matrix(Ellipsoid(True)))
+        self.assertFalse(accepts_matrix(Ellipsoid(False)))
+        self.assertFalse(accepts_matrix(lambda x: 0.0))
+        self.assertTrue(accepts_matrix(ioh.get_problem(1, dimension=2, instance=1)))
+
+    def test_single_call(self):
+        """Test that each generation is evaluated with one C-contiguous matrix."""
+        optimizer, func = self.optimize(True, n_steps=10)
+        self.assertTrue(optimizer.vectorized_fitness)
+        self.assertEqual(len(func.calls), 10)
+        for x in func.calls:
+            self.assertEqual(x.shape, (optimizer.parameters.lambda_, self._dim))
+            self.assertTrue(x.flags.c_contiguous)
+        self.assertEqual(optimizer.parameters.population.f.dtype, np.float64)
+
+    def test_equivalence(self):
+        """Test that the vectorized path equals the per-individual path."""
+        for config in (dict(), dict(active=True, local_restart="IPOP"), dict(mirrored="mirrored")):
+            with self.subTest(**config):
+                a, _ = self.optimize(True, n_steps=60, **config)
+                b, _ = self.optimize(False, n_steps=60, **config)
+                self.assertEqual(a.parameters.m.tobytes(), b.parameters.m.tobytes())
+                self.assertEqual(a.parameters.used_budget, b.parameters.used_budget)
+
+    def test_budget(self):
+        """Test that no more than the budget is evaluated."""
+        optimizer, func = self.optimize(True, budget=101)
+        self.assertEqual(optimizer.parameters.used_budget, 101)
+        self.assertEqual(sum(len(x) for x in func.calls), 101)
+
+    def test_pairwise_budget(self):
+        """Test pairwise selection evaluates whole pairs without exceeding the budget."""
+        for budget in (101, 102):
+            with self.subTest(budget=budget):
+                optimizer, func = self.optimize(True, budget=budget, mirrored="mirrored pairwise")
+                self.assertEqual(optimizer.parameters.used_budget, budget - budget % 2)
+                self.assertEqual(sum(len(x) for x in func.calls), optimizer.parameters.used_budget)
+                self.assertTrue(all(len(x) % 2 == 0 for x in func.calls))
+                self.assertTrue(any(optimizer.break_conditions))
+
+    def test_float_fitness(self):
+        """Test the per-individual path stores the fitness as float64."""
+        for config in (dict(), dict(sequential=True), dict(step_size_adaptation="tpa")):
+            with self.subTest(**config):
+                optimizer, _ = self.optimize(False, n_steps=3, **config)
+                self.assertEqual(optimizer.parameters.population.f.dtype, np.float64)
+                optimizer.run(2)
+                self.assertEqual(optimizer.parameters.population.f.dtype, np.float64)
+
+
+class TestRandomNumberGenerator(unittest.TestCase):
+    """All random draws of a run come from its rng."""
+
+    _dim = 4
+    _configs = (
+        dict(),
+        dict(bound_correction="COTN", sample_sigma=True),
+        dict(bound_correction="unif_resample", local_restart="BIPOP", step_size_adaptation="lp-xnes"),
+        dict(base_sampler="sobol", local_restart="IPOP"),
+        dict(base_sampler="halton", mirrored="mirrored", orthogonal=True),
+    )
+
+    def setUp(self):
+        """Ignore the warnings of restarts with degenerated parameters."""
+        warnings.filterwarnings("ignore", category=RuntimeWarning)
+
+    def run_optimizer(self, rng=None, **config):
+        """Run on the shifted ellipsoid with a budget of 1000."""
+        optimizer = ModularCMAES(Ellipsoid(False), self._dim, budget=1000, rng=rng, **config)
+        parameters = optimizer.run().parameters
+        return parameters.fopt, parameters.used_budget, len(parameters.restarts), parameters.m.tobytes()
+
+    def test_random_state(self):
+        """Test a RandomState gives the run of the same seed for the global state."""
+        for config in self._configs:
+            with self.subTest(**config):
+                np.random.seed(21)
+                expected = self.run_optimizer(**config)
+                np.random.seed(0)
+                state = np.random.get_state()[1].copy()
+                result = self.run_optimizer(np.random.RandomState(21), **config)
+                self.assertEqual(result, expected)
+                # the global state is left untouched
+                np.testing.assert_array_equal(np.random.get_state()[1], state)
+
+    def test_generator(self):
+        """Test runs with a Generator or a seed are reproducible without the global state."""
+        for config in self._configs:
+            with self.subTest(**config):
+                np.random.seed(1)
+                a = self.run_optimizer(np.random.default_rng(3), **config)
+                np.random.seed(2)
+                b = self.run_optimizer(3, **config)
+                c = self.run_optimizer(np.random.SeedSequence(3), **config)
+                self.assertEqual(a, b)
+                self.assertEqual(a, c)
+                self.assertNotEqual(a, self.run_optimizer(4, **config))
+
+
+class TestSpecializedStep(unittest.TestCase):
+    """The step function of build_step produces the same results as step."""
+
+    _dim = 6
+    _budget = 1500
+
+    def setUp(self):
+        """Ignore the warnings of restarts with degenerated parameters."""
+        warnings.filterwarnings("ignore", category=RuntimeWarning)
+
+    def optimize(self, config, vectorized, mode):
+        """Optimize with step, run or repeated run(n), return the final state."""
+        np.random.seed(7)
+        optimizer = ModularCMAES(Ellipsoid(vectorized), self._dim, budget=self._budget, **config)
+        if mode == "step":
+            while optimizer.step():
+                pass
+        elif mode == "run":
+            optimizer.run()
+        else:
+            while not any(optimizer.break_conditions):
+                t = optimizer.parameters.t
+                optimizer.run(7)
+                if optimizer.parameters.t - t < 7:
+                    break
+        parameters = optimizer.parameters
+        return (
+            parameters.m.tobytes(), parameters.sigma, parameters.fopt, parameters.used_budget,
+            parameters.t, parameters.n_out_of_bounds, len(parameters.restarts),
+        )
+
+    def test_identical(self):
+        """Test run and run(n) against step for every module option."""
+        for config in module_configs():
+            for vectorized in (True, False):
+                with self.subTest(vectorized=vectorized, **config):
+                    expected = self.optimize(config, vectorized, "step")
+                    self.assertEqual(self.optimize(config, vectorized, "run"), expected)
+                    self.assertEqual(self.optimize(config, vectorized, "run_n"), expected)
+
+    def test_override(self):
+        """Test that step is used when a subclass overrides a stage."""
+        class Subclass(ModularCMAES):
+            def select(self):
+                super().select()
+
+        optimizer = Subclass(Ellipsoid(), self._dim)
+        self.assertEqual(optimizer.specialized_step, optimizer.step)
+
+    def test_rebuild(self):
+        """Test that run rebuilds the step function when a module is changed."""
+        optimizer = ModularCMAES(Ellipsoid(), self._dim, budget=self._budget)
+        optimizer.run(3)
+        optimizer.parameters.active = True
+        optimizer.run(3)
+        self.assertEqual(optimizer._step_configuration, optimizer.step_configuration())
+
+
+class TestProfiling(unittest.TestCase):
+    """Profiling records the phases of the generation loop without changing the run."""
+
+    _dim = 5
+    _budget = 2000
+
+    def setUp(self):
+        """Ignore the warnings of restarts with degenerated parameters."""
+        warnings.filterwarnings("ignore", category=RuntimeWarning)
+
+    def optimize(self, profile, **config):
+        """Run an optimizer from a fixed seed."""
+        np.random.seed(3)
+        return ModularCMAES(
+            Ellipsoid(), self._dim, budget=self._budget, profile=profile, **config
+        ).run()
+
+    def test_identical(self):
+        """Test that profiling does not change the results."""
+        for config in (dict(local_restart="BIPOP"), dict(step_size_adaptation="tpa")):
+            with self.subTest(**config):
+                a = self.optimize(False, **config).parameters
+                b = self.optimize(True, **config).parameters
+                self.assertEqual(a.m.tobytes(), b.m.tobytes())
+                self.assertEqual(a.used_budget, b.used_budget)
+
+    def test_counters(self):
+        """Test the recorded phases and their call counts."""
+        optimizer = self.optimize(True, local_restart="IPOP")
+        profile = optimizer.profiler.as_dict()
+        t = optimizer.parameters.t
+        for phase in ("sampling", "bound correction", "evaluation", "selection",
+                      "recombination", "evolution paths", "step size", "covariance matrix",
+                      "eigendecomposition", "termination criteria", "other"):
+            self.assertEqual(profile[phase]["calls"], t, phase)
+            self.assertGreaterEqual(profile[phase]["time"], 0)
+        self.assertEqual(profile["restart"]["calls"], len(optimizer.parameters.restarts) - 1)
+
+    def test_disable(self):
+        """Test that disabling profiling restores the specialized step."""
+        optimizer = ModularCMAES(Ellipsoid(), self._dim, profile=True)
+        self.assertEqual(optimizer.specialized_step, optimizer.step)
+        profiler = optimizer.disable_profiling()
+        self.assertIsNotNone(profiler)
+        self.assertNotIn("step", vars(optimizer))
+        self.assertNotIn("adapt_sigma", vars(optimizer.parameters))
+        optimizer.run(1)
+        self.assertNotEqual(optimizer.specialized_step, optimizer.step)
+
+    def test_export(self):
+        """Test that export appends one line per run."""
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, "profile.jsonl")
+            for rep in range(2):
+                self.optimize(True).profiler.export(filename, rep=rep)
+            with open(filename) as f:
+                lines = [json.loads(line) for line in f]
+        self.assertEqual([line["rep"] for line in lines], [0, 1])
+        self.assertIn("sampling", lines[0]["phases"])
+
+
+if __name__ == "__main__":
+    unittest.main()
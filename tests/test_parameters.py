@@ -0,0 +1,318 @@
+"""Module containing tests for the adaptation of Parameters."""
+
+import os
+import tempfile
+import unittest
+import warnings
+
+import numpy as np
+
+from modcma_source import ModularCMAES
+
+
+def ellipsoid(x):
+    """Shifted ellipsoid function of a single x."""
+    x = np.ravel(x) - 1
+    return float((10 ** (6 * np.linspace(0, 1, len(x))) * x ** 2).sum())
+
+
+class TestLazyEigendecomposition(unittest.TestCase):
+    """The eigendecomposition is only performed every eigendecomposition_interval generations."""
+
+    _dim = 8
+
+    def setUp(self):
+        """Ignore the warnings of met termination criteria."""
+        warnings.filterwarnings("ignore", category=RuntimeWarning)
+
+    def optimizer(self, **config):
+        """Create an optimizer after seeding the global random state."""
+        np.random.seed(12)
+        return ModularCMAES(ellipsoid, self._dim, budget=3000, **config)
+
+    def test_default(self):
+        """Test that nothing is skipped by default."""
+        optimizer = self.optimizer().run()
+        self.assertEqual(optimizer.parameters.n_skipped_eigendecompositions, 0)
+
+    def test_interval_one(self):
+        """Test that an interval of one generation equals the default schedule."""
+        default = self.optimizer().run().parameters
+        optimizer = self.optimizer(lazy_eigendecomposition=True)
+        optimizer.parameters.eigendecomposition_interval = 1
+        lazy = optimizer.run().parameters
+        self.assertEqual(lazy.n_skipped_eigendecompositions, 0)
+        self.assertEqual(lazy.m.tobytes(), default.m.tobytes())
+        self.assertEqual(lazy.fopt, default.fopt)
+
+    def test_schedule(self):
+        """Test that B and D only change once every interval."""
+        optimizer = self.optimizer(lazy_eigendecomposition=True)
+        parameters = optimizer.parameters
+        parameters.eigendecomposition_interval = 4
+        changed = []
+        for _ in range(20):
+            B = parameters.B.copy()
+            optimizer.step()
+            changed.append(not np.array_equal(B, parameters.B))
+        self.assertEqual(changed, [t % 4 == 3 for t in range(20)])
+        self.assertEqual(parameters.n_skipped_eigendecompositions, 15)
+        self.assertEqual(parameters.last_eigendecomposition, 20)
+
+    def test_stale_criteria(self):
+        """Test the criteria on the eigenvalues use D of the last decomposition."""
+        optimizer = self.optimizer(lazy_eigendecomposition=True, compute_termination_criteria=True)
+        parameters = optimizer.parameters
+        parameters.eigendecomposition_interval = 4
+        parameters.condition_cov = 1e3
+        first_exceeded = None
+        while not parameters.termination_criteria.get("conditioncov"):
+            optimizer.step()
+            if first_exceeded is None and np.linalg.cond(parameters.C) > 1e3:
+                first_exceeded = parameters.t
+        # D only changes when C is decomposed, so the criterion is met then
+        self.assertEqual(parameters.t, parameters.last_eigendecomposition)
+        self.assertEqual(parameters.t % 4, 0)
+        self.assertLessEqual(parameters.t - first_exceeded, 3)
+        self.assertGreater((parameters.D.max() / parameters.D.min()) ** 2, 1e3)
+
+    def test_interval(self):
+        """Test the default interval, ceil(lambda / ((c1 + cmu) d 10))."""
+        parameters = self.optimizer(lazy_eigendecomposition=True).parameters
+        self.assertEqual(
+            parameters.eigendecomposition_interval,
+            int(np.ceil(parameters.lambda_ / ((parameters.c1 + parameters.cmu) * self._dim * 10))),
+        )
+        self.assertGreaterEqual(parameters.eigendecomposition_interval, 1)
+
+
+def reference_criteria(p):
+    """The previous termination criteria, recomputed from the full fitness history."""
+    _t = p.t % p.d
+    diag_C = np.diag(p.C.T)
+    d_sigma = p.sigma / p.sigma0
+    best_fopts = p.best_fitnesses[p.last_restart:]
+    median_fitnesses = p.median_fitnesses[p.last_restart:]
+    time_since_restart = p.t - p.last_restart
+    if p.lambda_ > p.max_lambda_:
+        return dict()
+    k = int(0.3 * time_since_restart)
+    return {
+        "max_iter": time_since_restart > p.max_iter,
+        "equalfunvalues": len(best_fopts) > p.nbin and np.ptp(best_fopts[-p.nbin:]) == 0,
+        "flat_fitness": (
+            time_since_restart > p.flat_fitnesses.maxlen
+            and len(p.flat_fitnesses) == p.flat_fitnesses.maxlen
+            and np.sum(p.flat_fitnesses) > (p.d / 3)
+        ),
+        "tolx": np.all((np.append(p.pc.T, diag_C) * d_sigma) < (p.tolx * p.sigma0)),
+        "tolupsigma": d_sigma > p.tolup_sigma * np.sqrt(p.D.max()),
+        "conditioncov": np.linalg.cond(p.C) > p.condition_cov,
+        "noeffectaxis": np.all((p.sigma * np.sqrt(p.D[_t, 0]) * p.B[:, _t] + p.m) == p.m),
+        "noeffectcoor": np.any((0.2 * p.sigma * np.sqrt(diag_C) + p.m) == p.m),
+        "stagnation": (
+            time_since_restart > p.n_stagnation
+            and np.median(best_fopts[-k:]) >= np.median(best_fopts[:k])
+            and np.median(median_fitnesses[-k:]) >= np.median(median_fitnesses[:k])
+        ),
+    }
+
+
+class TestTerminationCriteria(unittest.TestCase):
+    """The incremental termination criteria equal the criteria recomputed from the history."""
+
+    def setUp(self):
+        """Ignore the warnings of restarts with degenerated parameters."""
+        warnings.filterwarnings("ignore", category=RuntimeWarning)
+
+    def check(self, function, dim, budget, **config):
+        """Compare both criteria after every generation of a run, return the triggered criteria."""
+        np.random.seed(6)
+        optimizer = ModularCMAES(function, dim, budget=budget, **config)
+        parameters = optimizer.parameters
+        calculate = parameters.calculate_termination_criteria
+        triggered = set()
+
+        def compare():
+            calculate()
+            expected = reference_criteria(parameters)
+            condition = np.linalg.cond(parameters.C)
+            if abs(np.log(condition / parameters.condition_cov)) < 1e-6:
+                # the condition number of the eigenvalues differs in the last digits
+                expected.pop("conditioncov")
+            for name, value in expected.items():
+                self.assertEqual(bool(parameters.termination_criteria[name]), bool(value), name)
+            triggered.update(name for name, value in expected.items() if value)
+
+        parameters.calculate_termination_criteria = compare
+        while optimizer.step():
+            pass
+        return triggered
+
+    def test_criteria(self):
+        """Test smooth, ill-conditioned, plateau and noisy objectives with restarts."""
+        rng = np.random.default_rng(0)
+        functions = (
+            ("ellipsoid", ellipsoid, dict(local_restart="IPOP")),
+            ("cigar", lambda x: float(np.ravel(x)[0] ** 2 + 1e8 * np.sum(np.ravel(x)[1:] ** 2)), dict(local_restart="BIPOP")),
+            ("capped", lambda x: min(float(np.sum((np.ravel(x) - 1) ** 2)), 4.0), dict(local_restart="IPOP")),
+            ("plateau", lambda x: float(np.floor(np.sum(np.abs(x)))), dict(local_restart="IPOP")),
+            ("noisy", lambda x: float(np.sum(np.ravel(x) ** 2) * (1 + rng.normal())), dict(local_restart="BIPOP")),
+            ("nan", lambda x: float(np.sum(x ** 2)) if np.ravel(x)[0] < 2 else np.nan, dict(compute_termination_criteria=True)),
+        )
+        triggered = set()
+        for name, function, config in functions:
+            with self.subTest(function=name):
+                triggered |= self.check(function, 4, 20000, **config)
+        self.assertTrue({"equalfunvalues", "flat_fitness", "tolx", "stagnation"} <= triggered, triggered)
+
+
+class TestHistory(unittest.TestCase):
+    """The history modes record the same statistics without changing the run."""
+
+    _dim = 4
+
+    def setUp(self):
+        """Create a temporary folder for the history files."""
+        warnings.filterwarnings("ignore", category=RuntimeWarning)
+        self.folder = tempfile.TemporaryDirectory()
+        self.history_file = os.path.join(self.folder.name, "history.npy")
+
+    def tearDown(self):
+        """Remove the temporary folder."""
+        self.folder.cleanup()
+
+    def run_optimizer(self, **config):
+        """Run with IPOP restarts from a fixed seed."""
+        np.random.seed(16)
+        optimizer = ModularCMAES(ellipsoid, self._dim, budget=6000, local_restart="IPOP", **config)
+        return optimizer.run().parameters
+
+    @staticmethod
+    def records(parameters):
+        """The recorded statistics as a (t, 4) array."""
+        return np.array([
+            parameters.sigma_over_time, parameters.best_fopts,
+            parameters.best_fitnesses, parameters.median_fitnesses,
+        ], dtype=float).T
+
+    def test_modes(self):
+        """Test every mode against the full history."""
+        full = self.run_optimizer()
+        expected = self.records(full)
+        self.assertEqual(len(expected), full.t)
+        self.assertGreater(len(full.restarts), 1)
+
+        ring = self.run_optimizer(history="ring", history_size=50)
+        np.testing.assert_array_equal(self.records(ring), expected[-50:])
+        default_ring = self.run_optimizer(history="ring")
+        # the minimal stagnation window of the initial population size
+        lambda_ = 4 + int(3 * np.log(self._dim))
+        self.assertEqual(len(default_ring.best_fopts), int(120 + 30 * self._dim / lambda_))
+
+        logged = self.run_optimizer(history="file", history_file=self.history_file)
+        self.assertEqual(self.records(logged).size, 0)
+        history = np.load(self.history_file)
+        np.testing.assert_array_equal(history.view((np.float64, 4)), expected)
+
+        none = self.run_optimizer(history=None)
+        self.assertEqual(self.records(none).size, 0)
+
+        for parameters in (ring, logged, none):
+            self.assertEqual(parameters.t, full.t)
+            self.assertEqual(parameters.restarts, full.restarts)
+            self.assertEqual(parameters.fopt, full.fopt)
+            self.assertEqual(parameters.m.tobytes(), full.m.tobytes())
+
+    def test_save(self):
+        """Test saving the parameters flushes the history file."""
+        np.random.seed(1)
+        optimizer = ModularCMAES(ellipsoid, self._dim, history="file", history_file=self.history_file)
+        for _ in range(5):
+            optimizer.step()
+        self.assertEqual(len(np.load(self.history_file)), 0)
+        optimizer.parameters.save(os.path.join(self.folder.name, "parameters.pkl"))
+        self.assertEqual(len(np.load(self.history_file)), 5)
+
+    def test_restart_statistics(self):
+        """Test the stagnation sequences are bounded with history = 'ring' only."""
+        for history, max_length in (("ring", 20000), ("full", None)):
+            with self.subTest(history=history):
+                parameters = self.run_optimizer(history=history)
+                for sequence in (parameters.best_fitness_medians, parameters.median_fitness_medians):
+                    self.assertEqual(sequence.sequence.maxlen, max_length)
+                    self.assertEqual(len(sequence.sequence), parameters.t - parameters.last_restart)
+
+                filename = os.path.join(self.folder.name, "checkpoint.npz")
+                parameters.checkpoint(filename)
+                restored = type(parameters).from_checkpoint(filename)
+                self.assertEqual(restored.best_fitness_medians.sequence.maxlen, max_length)
+                self.assertEqual(
+                    restored.best_fitness_medians.sequence, parameters.best_fitness_medians.sequence
+                )
+
+    def test_default_history_file(self):
+        """Test that runs with history = 'file' write to distinct files by default."""
+        cwd = os.getcwd()
+        os.chdir(self.folder.name)
+        try:
+            files = [
+                ModularCMAES(ellipsoid, self._dim, budget=100, history="file")
+                .run().parameters.history_file
+                for _ in range(2)
+            ]
+        finally:
+            os.chdir(cwd)
+        self.assertNotEqual(*files)
+        for filename in files:
+            self.assertTrue(os.path.isfile(os.path.join(self.folder.name, filename)))
+
+
+class TestSymmetricUpdate(unittest.TestCase):
+    """The BLAS update with symmetric_update equals the default update up to rounding."""
+
+    _dim = 8
+
+    def optimizer(self, n_steps, **config):
+        """Perform n_steps generations from a fixed seed, return the parameters."""
+        np.random.seed(12)
+        optimizer = ModularCMAES(ellipsoid, self._dim, **config)
+        for _ in range(n_steps):
+            optimizer.step()
+        return optimizer.parameters
+
+    def test_one_step(self):
+        """Test the upper triangle of C and the eigenvalues after one generation."""
+        for active in (False, True):
+            with self.subTest(active=active):
+                default = self.optimizer(1, active=active)
+                symmetric = self.optimizer(1, active=active, symmetric_update=True)
+                self.assertEqual(default.t, symmetric.t)
+                self.assertFalse(np.array_equal(default.C, np.eye(self._dim)))
+                np.testing.assert_allclose(
+                    np.triu(symmetric.C), np.triu(default.C), rtol=1e-12, atol=1e-15
+                )
+                np.testing.assert_allclose(symmetric.D, default.D, rtol=1e-12)
+                np.testing.assert_allclose(
+                    symmetric.inv_root_C, default.inv_root_C, rtol=1e-10, atol=1e-12
+                )
+
+    def test_runs(self):
+        """Test a run with symmetric_update reaches the target, with restarts.
+
+        Rounding differences can flip the signs of the eigenvectors in B, after
+        which the same samples z give different mutations, so runs are only
+        compared in outcome.
+        """
+        for config in (dict(active=True), dict(lazy_eigendecomposition=True)):
+            with self.subTest(**config):
+                np.random.seed(3)
+                parameters = ModularCMAES(
+                    ellipsoid, self._dim, budget=20000, target=1e-8,
+                    symmetric_update=True, local_restart="IPOP", **config
+                ).run().parameters
+                self.assertLess(parameters.fopt, 1e-8)
+
+
+if __name__ == "__main__":
+    unittest.main()
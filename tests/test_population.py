@@ -0,0 +1,134 @@
+"""Module containing tests for the Population object and the selection buffers."""
+
+import unittest
+import warnings
+
+import numpy as np
+
+from modcma_source import ModularCMAES
+from modcma_source.population import Population
+
+
+def random_population(rng, d, n):
+    """A population with some tied fitness values."""
+    x, y, z = (rng.normal(size=(d, n)) for _ in range(3))
+    return Population(x, y, z, rng.integers(0, n // 2, n).astype(float), rng.uniform(size=n))
+
+
+class ReferenceCMAES(ModularCMAES):
+    """ModularCMAES with the previous selection, sorting and slicing fresh arrays."""
+
+    def select(self) -> None:
+        """Sort the (elitist) population and keep its lambda_ best individuals."""
+        p = self.parameters
+        if p.mirrored == "mirrored pairwise":
+            indices = [
+                int(np.argmin(x) + (i * 2)) for i, x in enumerate(np.split(p.population.f, len(p.population.f) // 2))
+            ]
+            p.population = p.population[indices]
+        if p.elitist and p.old_population:
+            p.population += p.old_population[: p.mu]
+        p.population.sort()
+        p.population = p.population[: p.lambda_]
+        if p.population.f[0] < p.fopt:
+            p.fopt = p.population.f[0]
+            p.xopt = p.population.x[:, 0]
+
+
+class TestPopulation(unittest.TestCase):
+    """Gathering individuals into preallocated storage."""
+
+    def setUp(self):
+        """Create a random population."""
+        self.rng = np.random.default_rng(0)
+        self.population = random_population(self.rng, 3, 10)
+
+    def assert_population_equal(self, a, b):
+        """Compare all arrays of two populations."""
+        for name in Population.__slots__:
+            np.testing.assert_array_equal(getattr(a, name), getattr(b, name))
+
+    def test_take(self):
+        """Test take with and without storage equals indexing."""
+        indices = [4, 0, 9, 4]
+        buffer = Population.empty(3, 6)
+        result = self.population.take(np.array(indices), buffer)
+        self.assert_population_equal(result, self.population[indices])
+        self.assert_population_equal(self.population.take(np.array(indices)), self.population[indices])
+        self.assertIs(result.x.base, buffer.x.base)
+        self.assertEqual(result.n, 4)
+
+    def test_sort(self):
+        """Test sort orders stably by fitness."""
+        rank = np.argsort(self.population.f, kind="stable")
+        expected = self.population[rank.tolist()]
+        self.assert_population_equal(self.population.copy().sort(), expected)
+        self.assertTrue(self.population.take(self.population.rank()).x.flags.f_contiguous)
+
+    def test_empty(self):
+        """Test the storage layout and dtypes."""
+        buffer = Population.empty(4, 7, np.float32)
+        self.assertEqual(buffer.x.shape, (4, 7))
+        self.assertTrue(buffer.x[:, :3].flags.f_contiguous)
+        self.assertEqual(buffer.f.dtype, np.float32)
+        with self.assertRaises(AttributeError):
+            buffer.g = None
+
+
+class TestSelection(unittest.TestCase):
+    """Selecting into the double buffers equals the previous selection."""
+
+    _configs = (
+        dict(),
+        dict(elitist=True),
+        dict(elitist=True, mirrored="mirrored pairwise", local_restart="IPOP"),
+        dict(active=True, local_restart="BIPOP"),
+        dict(step_size_adaptation="psr"),
+        dict(sequential=True),
+    )
+
+    def setUp(self):
+        """Ignore the warnings of restarts with degenerated parameters."""
+        warnings.filterwarnings("ignore", category=RuntimeWarning)
+
+    @staticmethod
+    def run_optimizer(cls, **config):
+        """Run on the shifted sphere from a fixed seed."""
+        np.random.seed(14)
+        optimizer = cls(lambda x: float(np.sum((x - 2.0) ** 2)), 4, budget=4000, **config)
+        return optimizer.run().parameters
+
+    def test_equivalence(self):
+        """Test runs against the previous selection."""
+        for config in self._configs:
+            with self.subTest(**config):
+                a = self.run_optimizer(ModularCMAES, **config)
+                b = self.run_optimizer(ReferenceCMAES, **config)
+                self.assertEqual(a.fopt, b.fopt)
+                self.assertEqual(a.used_budget, b.used_budget)
+                self.assertEqual(a.m.tobytes(), b.m.tobytes())
+                self.assertEqual(a.xopt.tobytes(), b.xopt.tobytes())
+
+    def test_buffers(self):
+        """Test the buffers alternate and are only reallocated when lambda_ changes."""
+        np.random.seed(3)
+        optimizer = ModularCMAES(lambda x: float(np.sum(x ** 2)), 4, local_restart="IPOP")
+        p = optimizer.parameters
+        optimizer.step()
+        buffers = {id(buffer) for buffer in p.population_buffers}
+        for _ in range(3):
+            old_population = p.population
+            optimizer.step()
+            self.assertIs(p.old_population, p.population)
+            self.assertEqual({id(buffer) for buffer in p.population_buffers}, buffers)
+            self.assertFalse(np.shares_memory(p.population.x, old_population.x))
+        self.assertFalse(np.shares_memory(p.xopt, p.population.x))
+
+        p.lambda_ *= 2
+        p.perform_local_restart()
+        optimizer.step()
+        self.assertEqual(p.population_buffers[0].n, p.lambda_)
+
+
+if __name__ == "__main__":
+    unittest.main()
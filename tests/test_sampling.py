@@ -0,0 +1,166 @@
+"""Module containing tests for the block samplers."""
+
+import unittest
+import warnings
+from itertools import islice
+
+import numpy as np
+from scipy import stats
+
+from modcma_source import ModularCMAES
+from modcma_source.sampling import (
+    GaussianSampler,
+    MirroredSampler,
+    OrthogonalSampler,
+    QmcSampler,
+    Sobol,
+    Halton,
+    gaussian_sampling,
+    mirrored_sampling,
+    orthogonal_sampling,
+)
+
+
+def qmc_sampling(qmc):
+    """The previous per-sample conversion of a scipy.stats.qmc engine."""
+    while True:
+        sample = qmc.random(1)
+        qmc.fast_forward(1)
+        yield stats.norm.ppf(sample.ravel()).reshape(-1, 1)
+
+
+class GeneratorSampler:
+    """Block interface over a generator chain, as mutate used to draw its samples."""
+
+    def __init__(self, generator):
+        """Wrap generator."""
+        self.generator = generator
+
+    def __call__(self, n):
+        """Stack the next n samples."""
+        return np.hstack(tuple(islice(self.generator, n)))
+
+
+class TestBlockSamplers(unittest.TestCase):
+    """The block samplers reproduce the streams of the generator samplers."""
+
+    _dim = 5
+    _sizes = ((6, 6, 6), (1, 4, 3, 0, 7, 2, 5), (13, 1, 1, 9))
+
+    def compare(self, make_block, make_generator, seed=3):
+        """Compare the concatenated blocks of each sequence of sizes to the generator stream."""
+        for sizes in self._sizes:
+            with self.subTest(sizes=sizes):
+                np.random.seed(seed)
+                sampler = make_block()
+                blocks = np.hstack([sampler(n) for n in sizes])
+                np.random.seed(seed)
+                expected = np.hstack(tuple(islice(make_generator(), sum(sizes))))
+                np.testing.assert_array_equal(blocks, expected)
+
+    def test_gaussian(self):
+        """Test the gaussian sampler."""
+        self.compare(lambda: GaussianSampler(self._dim), lambda: gaussian_sampling(self._dim))
+
+    def test_mirrored(self):
+        """Test mirrored samples, with odd blocks splitting a pair."""
+        self.compare(
+            lambda: MirroredSampler(GaussianSampler(self._dim)),
+            lambda: mirrored_sampling(gaussian_sampling(self._dim)),
+        )
+
+    def test_orthogonal(self):
+        """Test orthogonal groups smaller and larger than the dimension."""
+        for n_samples in (1, 3, 5, 8):
+            with self.subTest(n_samples=n_samples):
+                self.compare(
+                    lambda: OrthogonalSampler(GaussianSampler(self._dim), n_samples),
+                    lambda: orthogonal_sampling(gaussian_sampling(self._dim), n_samples),
+                )
+
+    def test_mirrored_orthogonal(self):
+        """Test mirrored orthogonal samples."""
+        self.compare(
+            lambda: MirroredSampler(OrthogonalSampler(GaussianSampler(self._dim), 3)),
+            lambda: mirrored_sampling(orthogonal_sampling(gaussian_sampling(self._dim), 3)),
+        )
+
+    def test_qmc(self):
+        """Test the Sobol and Halton wrappers against the per-sample conversion."""
+        for engine in (stats.qmc.Sobol, stats.qmc.Halton):
+            with self.subTest(engine=engine.__name__):
+                self.compare(
+                    lambda: MirroredSampler(QmcSampler(engine(self._dim, seed=11))),
+                    lambda: mirrored_sampling(qmc_sampling(engine(self._dim, seed=11))),
+                )
+        np.random.seed(0)
+        self.assertEqual(Sobol(self._dim)(4).shape, (self._dim, 4))
+        self.assertEqual(Halton(self._dim)(3).shape, (self._dim, 3))
+
+    def test_qmc_blocks(self):
+        """Test buffered blocks smaller and larger than the requested sizes give the same samples."""
+        for engine in (stats.qmc.Sobol, stats.qmc.Halton):
+            for block_size in (2, 8, 256):
+                with self.subTest(engine=engine.__name__, block_size=block_size):
+                    self.compare(
+                        lambda: QmcSampler(engine(self._dim, seed=4), block_size),
+                        lambda: qmc_sampling(engine(self._dim, seed=4)),
+                    )
+
+    def test_out(self):
+        """Test writing into a view of a larger buffer and iterating single samples."""
+        np.random.seed(2)
+        buffer = np.zeros((self._dim, 12))
+        sampler = MirroredSampler(GaussianSampler(self._dim))
+        result = sampler(5, out=buffer[:, 2:7])
+        self.assertIs(result.base, buffer)
+        self.assertTrue((buffer[:, :2] == 0).all() and (buffer[:, 7:] == 0).all())
+        self.assertEqual(next(sampler).shape, (self._dim, 1))
+        np.random.seed(2)
+        expected = np.hstack(tuple(islice(mirrored_sampling(gaussian_sampling(self._dim)), 6)))
+        np.testing.assert_array_equal(buffer[:, 2:7], expected[:, :5])
+
+
+class TestMutate(unittest.TestCase):
+    """Runs with the block samplers equal runs drawing from the generator chain."""
+
+    def setUp(self):
+        """Ignore the warnings of degenerated parameters."""
+        warnings.filterwarnings("ignore", category=RuntimeWarning)
+
+    def run_optimizer(self, generator, n_steps=40, **config):
+        """Run n_steps generations on the sphere, optionally with the generator chain."""
+        np.random.seed(8)
+        optimizer = ModularCMAES(lambda x: float(np.sum(x ** 2)), 4, **config)
+        if generator:
+            p = optimizer.parameters
+            sampler = gaussian_sampling(p.d)
+            if p.orthogonal:
+                sampler = orthogonal_sampling(sampler, p.sampler.sampler.n_samples if p.mirrored else p.sampler.n_samples)
+            if p.mirrored:
+                sampler = mirrored_sampling(sampler)
+            p.sampler = GeneratorSampler(sampler)
+        for _ in range(n_steps):
+            optimizer.step()
+        return optimizer.parameters
+
+    def test_equivalence(self):
+        """Test the sampler combinations with and without step size adaptation tpa."""
+        for config in (
+            dict(),
+            dict(mirrored="mirrored"),
+            dict(orthogonal=True),
+            dict(orthogonal=True, mirrored="mirrored pairwise"),
+            dict(orthogonal=True, step_size_adaptation="tpa"),
+            dict(mirrored="mirrored", lambda_=7),
+        ):
+            with self.subTest(**config):
+                a = self.run_optimizer(False, **config)
+                b = self.run_optimizer(True, **config)
+                self.assertEqual(a.m.tobytes(), b.m.tobytes())
+                self.assertEqual(a.C.tobytes(), b.C.tobytes())
+                self.assertEqual(a.used_budget, b.used_budget)
+
+
+if __name__ == "__main__":
+    unittest.main()
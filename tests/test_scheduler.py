@@ -0,0 +1,71 @@
+"""Module containing tests for the experiment scheduler."""
+
+import json
+import os
+import tempfile
+import unittest
+from functools import partial
+
+import scheduler
+
+
+def record_unit(folder, unit):
+    """Run function of the tests, writes one file per unit."""
+    algname, fid, iid, dim, rep = unit
+    with open(os.path.join(folder, f"{algname}_R{rep}_F{fid}_I{iid}_{dim}D"), "w") as f:
+        json.dump(unit, f)
+
+
+class TestScheduler(unittest.TestCase):
+    """Units are expanded, ordered by estimated cost and all run once."""
+
+    def setUp(self):
+        """Create a temporary folder for the outputs and the history file."""
+        self.folder = tempfile.TemporaryDirectory()
+        self.history_file = os.path.join(self.folder.name, "wall_times.json")
+
+    def tearDown(self):
+        """Remove the temporary folder."""
+        self.folder.cleanup()
+
+    def test_expand_tasks(self):
+        """Test that every task is split into one unit per repetition."""
+        units = scheduler.expand_tasks([("a", 1, 1, 5), ("a", 2, 1, 5)], 3)
+        self.assertEqual(len(units), 6)
+        self.assertEqual(units[:3], [("a", 1, 1, 5, 0), ("a", 1, 1, 5, 1), ("a", 1, 1, 5, 2)])
+
+    def test_estimate_cost(self):
+        """Test the estimate dim x budget x historical rate."""
+        history = {"a/1": [10.0, 1000], "a/2": [30.0, 1000]}
+        self.assertAlmostEqual(
+            scheduler.estimate_cost(("a", 1, 1, 5, 0), history, 100), 5 * 500 * 0.01
+        )
+        # Unknown (algname, fid): the mean of the known rates
+        self.assertAlmostEqual(
+            scheduler.estimate_cost(("b", 1, 1, 5, 0), history, 100), 5 * 500 * 0.02
+        )
+        self.assertEqual(scheduler.estimate_cost(("a", 1, 1, 2, 0), {}, 100), 2 * 200)
+
+    def test_run_tasks(self):
+        """Test that all units run once and the history is updated."""
+        tasks = [("a", fid, 1, dim) for fid in (1, 2) for dim in (2, 5)]
+        wall_times = scheduler.run_tasks(
+            partial(record_unit, self.folder.name), iter(tasks), n_reps=2,
+            history_file=self.history_file, max_threads=2, budget_factor=10,
+        )
+        self.assertEqual(set(wall_times), set(tasks))
+        outputs = sorted(f for f in os.listdir(self.folder.name) if f.startswith("a_"))
+        self.assertEqual(len(outputs), 8)
+        with open(self.history_file) as f:
+            history = json.load(f)
+        self.assertEqual(set(history), {"a/1", "a/2"})
+        self.assertEqual(history["a/1"][1], 2 * (2 * 10 * 2 + 5 * 10 * 5))
+
+    def test_empty(self):
+        """Test that an empty task grid does nothing."""
+        self.assertEqual(scheduler.run_tasks(record_unit, [], history_file=self.history_file), {})
+        self.assertFalse(os.path.exists(self.history_file))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,211 @@
+"""Module containing tests for the processing of IOHprofiler .dat files."""
+
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+import simple_process_old
+
+
+def reference_process_file(fname):
+    """The previous parser, which splits the whole file on the run headers."""
+    dim = int(fname.split('_')[-1][3:-4])
+    with open(fname, 'r') as f:
+        content = f.read()
+    all_data = []
+    for run_idx, run_data in enumerate(content.strip().split('evaluations raw_y')[1:]):
+        run_items = []
+        for line in run_data.strip().split('\n'):
+            parts = line.strip().split()
+            if len(parts) == 2:
+                try:
+                    run_items.append([int(parts[0]), float(parts[1])])
+                except ValueError:
+                    continue
+        for budget_factor in simple_process_old.budget_factors:
+            valid_items = [item for item in run_items if item[0] <= budget_factor * dim]
+            if valid_items:
+                all_data.append({
+                    'fname': fname,
+                    'fx': min(item[1] for item in valid_items),
+                    'run': run_idx + 1,
+                    'budget_factor': budget_factor,
+                    'budget': budget_factor * dim,
+                })
+    return pd.DataFrame(all_data) if all_data else None
+
+
+def write_dat(fname, runs):
+    """Write runs, lists of (evaluations, raw_y), in the format of the ioh Analyzer."""
+    with open(fname, 'w') as f:
+        for run in runs:
+            f.write("evaluations raw_y\n")
+            for evaluations, raw_y in run:
+                f.write(f"{evaluations} {raw_y:.10e}\n")
+
+
+def random_run(rng, dim, length):
+    """Improving evaluations of a run, as logged by the Analyzer."""
+    evaluations = np.sort(rng.choice(np.arange(2, 10000 * dim + 1), size=length, replace=False))
+    evaluations[0] = 1
+    raw_y = 1e3 * np.exp(-np.linspace(0, 20, length)) * rng.uniform(0.5, 1.5, length)
+    return list(zip(evaluations.tolist(), raw_y.tolist()))
+
+
+def write_data_tree(rng, fids_dims=((1, 2), (20, 5))):
+    """Write a .dat file per algorithm, function and dimension below the current folder."""
+    files = []
+    for lib, algname in (("Baselines", "modcma_bipop"), ("OPYTIMIZER", "CS"), ("OPYTIMIZER", "DE")):
+        for fid, dim in fids_dims:
+            base = f"{algname}_F{fid}_I1_{dim}D"
+            folder = os.path.join(simple_process_old.DATA_FOLDER, lib, base, f"data_f{fid}")
+            os.makedirs(folder)
+            fname = os.path.join(folder, f"IOHprofiler_f{fid}_DIM{dim}.dat")
+            write_dat(fname, [random_run(rng, dim, n) for n in (20, 40)])
+            files.append((lib, algname, fid, dim, fname))
+    return files
+
+
+class TestProcessFile(unittest.TestCase):
+    """The streaming parser produces the output of the previous parser."""
+
+    def setUp(self):
+        """Create a temporary folder for the .dat files."""
+        self.folder = tempfile.TemporaryDirectory()
+        self.rng = np.random.default_rng(1)
+
+    def tearDown(self):
+        """Remove the temporary folder."""
+        self.folder.cleanup()
+
+    def check(self, runs, dim=5):
+        """Compare both parsers on a file with the given runs."""
+        fname = os.path.join(self.folder.name, f"IOHprofiler_f20_DIM{dim}.dat")
+        write_dat(fname, runs)
+        expected = reference_process_file(fname)
+        result = simple_process_old.process_file(fname)
+        if expected is None:
+            self.assertIsNone(result)
+        else:
+            pd.testing.assert_frame_equal(
+                result.reset_index(drop=True), expected, check_dtype=False
+            )
+        return result
+
+    def test_single_run(self):
+        """Test a file with one run."""
+        result = self.check([random_run(self.rng, 5, 300)])
+        self.assertEqual(len(result), len(simple_process_old.budget_factors))
+
+    def test_multiple_runs(self):
+        """Test a file with runs of different lengths and dimensions."""
+        for dim in (2, 10):
+            with self.subTest(dim=dim):
+                self.check([random_run(self.rng, dim, n) for n in (50, 1, 400, 7)], dim)
+
+    def test_late_first_evaluation(self):
+        """Test runs that only start logging after some budgets have passed."""
+        self.check([[(60, 3.0), (400, 2.0)], [(5, 10.0), (30000, 1.0)]])
+
+    def test_empty(self):
+        """Test a file without evaluations."""
+        self.check([[]])
+
+
+class TestMain(unittest.TestCase):
+    """The parallel aggregation with a per-file cache."""
+
+    def setUp(self):
+        """Create a Data tree with a few algorithms in a temporary folder."""
+        self.folder = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.folder.name)
+        os.makedirs(simple_process_old.CSV_FOLDER)
+        self.files = write_data_tree(np.random.default_rng(3))
+
+    def tearDown(self):
+        """Remove the temporary folder."""
+        os.chdir(self.cwd)
+        self.folder.cleanup()
+
+    def run_main(self):
+        """Run the aggregation and return its output and the number of cached files."""
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            simple_process_old.main()
+        reused = [line for line in stdout.getvalue().splitlines() if line.startswith("Reused")]
+        result = pd.read_csv(os.path.join(simple_process_old.CSV_FOLDER, "FBUDGET_all.csv"))
+        return result, int(reused[0].split()[1])
+
+    def expected(self):
+        """Process each file sequentially."""
+        frames = []
+        for lib, algname, fid, dim, fname in sorted(self.files, key=lambda f: (f[0], f[4])):
+            frame = simple_process_old.process_file(fname)
+            frame["algname"] = algname
+            frame["fid"] = fid
+            frame["iid"] = 1
+            frame["dim"] = dim
+            frames.append(frame)
+        return pd.concat(frames, ignore_index=True)
+
+    def test_main(self):
+        """Test the output matches the sequential processing of every file."""
+        with contextlib.redirect_stdout(io.StringIO()):
+            expected = self.expected()
+        result, reused = self.run_main()
+        self.assertEqual(reused, 0)
+        pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+        self.assertFalse(os.path.exists(os.path.join(simple_process_old.CSV_FOLDER, "FBUDGET_all.csv.tmp")))
+
+    def test_cache(self):
+        """Test unchanged files are read from the cache and modified ones are parsed again."""
+        first, _ = self.run_main()
+        second, reused = self.run_main()
+        self.assertEqual(reused, len(self.files))
+        pd.testing.assert_frame_equal(first, second)
+
+        fname = self.files[0][4]
+        write_dat(fname, [[(1, 5.0), (3, 0.5)]])
+        third, reused = self.run_main()
+        self.assertEqual(reused, len(self.files) - 1)
+        changed = third[third.fname == fname]
+        self.assertTrue((changed.fx == 0.5).all())
+        self.assertEqual(len(third), len(first) - 14 + len(changed))
+
+    def test_reps(self):
+        """Test the run column of the layout with one folder per repetition is rep + 1."""
+        rng = np.random.default_rng(4)
+        for rep in range(3):
+            folder = os.path.join(simple_process_old.DATA_FOLDER, "OPYTIMIZER", f"CS_R{rep}_F3_I2_2D")
+            os.makedirs(os.path.join(folder, "data_f3"))
+            write_dat(os.path.join(folder, "data_f3", "IOHprofiler_f3_DIM2.dat"), [random_run(rng, 2, 10)])
+            folder = os.path.join(simple_process_old.DATA_FOLDER, "Baselines", f"modcma_bipop_R{rep}_F3_I2_2D")
+            os.makedirs(folder)
+            pd.DataFrame({
+                'fname': os.path.join(folder, simple_process_old.MILESTONE_FILE), 'fx': 1.0, 'run': 1,
+                'budget_factor': simple_process_old.budget_factors,
+                'budget': [2 * factor for factor in simple_process_old.budget_factors],
+                'algname': 'modcma_bipop', 'fid': 3, 'iid': 2, 'dim': 2,
+            }).to_csv(os.path.join(folder, simple_process_old.MILESTONE_FILE), index=False)
+
+        result, _ = self.run_main()
+        for algname in ("CS", "modcma_bipop"):
+            with self.subTest(algname=algname):
+                reps = result[(result.algname == algname) & (result.fid == 3)]
+                self.assertEqual(len(reps), 3 * len(simple_process_old.budget_factors))
+                self.assertEqual(set(reps.iid), {2})
+                for rep in range(3):
+                    runs = reps[reps.fname.str.contains(f"_R{rep}_")].run
+                    self.assertEqual(set(runs), {rep + 1})
+        # the folders without a repetition number keep the runs of the file
+        self.assertEqual(set(result[result.fid != 3].run), {1, 2})
+
+
+if __name__ == "__main__":
+    unittest.main()
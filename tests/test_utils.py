@@ -0,0 +1,104 @@
+"""Module containing tests for the running statistics in utils."""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from modcma_source.utils import SortedWindow, HeadTailMedians, HistoryLog
+
+
+class TestHeadTailMedians(unittest.TestCase):
+    """The running medians equal np.median of the head and tail of the sequence."""
+
+    def check(self, values, fraction=0.3, max_length=None):
+        """Compare the medians after every append."""
+        medians = HeadTailMedians(fraction, max_length)
+        for stop, value in enumerate(values, 1):
+            medians.append(value)
+            sequence = values[max(0, stop - (max_length or stop)):stop]
+            self.assertEqual(list(medians.sequence), sequence)
+            n = len(sequence)
+            k = int(fraction * n)
+            for window, expected in ((medians.head, sequence[:k]), (medians.tail, sequence[n - k:])):
+                self.assertEqual(len(window), k)
+                if k:
+                    np.testing.assert_equal(window.median(), np.median(expected))
+
+    def test_random(self):
+        """Test random values with many ties."""
+        rng = np.random.default_rng(1)
+        self.check(list(rng.integers(0, 20, 500).astype(float)))
+        self.check(list(rng.normal(size=300)), fraction=0.5)
+
+    def test_monotone(self):
+        """Test decreasing values, as the best fitness of a converging run."""
+        self.check(list(np.geomspace(1e3, 1e-8, 400)))
+
+    def test_nan(self):
+        """Test values including NaN, for which np.median is NaN."""
+        values = list(np.arange(100.0))
+        values[10] = values[60] = np.nan
+        self.check(values)
+
+    def test_max_length(self):
+        """Test the medians of a sliding window hold at most max_length values."""
+        rng = np.random.default_rng(2)
+        values = list(rng.integers(0, 20, 400).astype(float))
+        values[150] = values[300] = np.nan
+        for max_length in (1, 7, 50, 400):
+            with self.subTest(max_length=max_length):
+                self.check(values, max_length=max_length)
+        self.check(list(np.geomspace(1e3, 1e-8, 400)), max_length=60)
+
+    def test_sorted_window(self):
+        """Test adding and removing values."""
+        window = SortedWindow()
+        self.assertTrue(np.isnan(window.median()))
+        for value in (3.0, 1.0, np.nan, 2.0, 2.0):
+            window.add(value)
+        self.assertTrue(np.isnan(window.median()))
+        window.remove(np.nan)
+        self.assertEqual(window.median(), 2.0)
+        window.remove(3.0)
+        self.assertEqual((len(window), window.median()), (3, 2.0))
+        window.remove(2.0)
+        self.assertEqual(window.median(), 1.5)
+
+
+class TestHistoryLog(unittest.TestCase):
+    """The buffered records are written to a valid .npy file."""
+
+    def setUp(self):
+        """Create a temporary folder."""
+        self.folder = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.folder.name, "history.npy")
+
+    def tearDown(self):
+        """Remove the temporary folder."""
+        self.folder.cleanup()
+
+    def test_flush(self):
+        """Test the file holds the flushed records after each full buffer."""
+        log = HistoryLog(self.filename, buffer_size=4)
+        self.assertEqual(np.load(self.filename).shape, (0,))
+        records = np.random.default_rng(0).normal(size=(10, 4))
+        for i, record in enumerate(records, 1):
+            log.append(*record)
+            self.assertEqual(len(np.load(self.filename)), i - i % 4)
+        history = log.load()
+        self.assertEqual(history.dtype, HistoryLog.dtype)
+        np.testing.assert_array_equal(history.view((np.float64, 4)), records)
+        self.assertEqual(os.path.getsize(self.filename), HistoryLog.header_size + records.nbytes)
+
+    def test_truncate(self):
+        """Test a new log replaces an existing file."""
+        log = HistoryLog(self.filename)
+        log.append(1.0, 2.0, 3.0, 4.0)
+        log.flush()
+        self.assertEqual(len(HistoryLog(self.filename).load()), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
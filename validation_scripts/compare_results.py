@@ -2,16 +2,20 @@
 # -*- coding: utf-8 -*-
 """
 compare_results.py - 结果比较脚本
-比较dt_fb.csv和f20-f24.xlsx文件，检查算法排名是否一致
+比较dt_fb.csv（或dt_fb.parquet）和f20-f24.xlsx文件，检查算法排名是否一致
 """
 
 import numpy as np
 import pandas as pd
 import os
 
-def load_and_validate_file(filename):
+from result_files import newest_file
+
+def load_and_validate_file(filename, columns=None, filters=None):
     """
-    加载并验证CSV或Excel文件
+    加载并验证CSV、Excel或Parquet文件
+    
+    读取Parquet文件时只读取 columns 中的列，filters 下推到文件读取
     """
     if not os.path.exists(filename):
         print(f"错误：找不到文件 {filename}")
@@ -20,6 +24,11 @@ def load_and_validate_file(filename):
     try:
         if filename.endswith('.xlsx') or filename.endswith('.xls'):
             df = pd.read_excel(filename)
+        elif filename.endswith('.parquet'):
+            df = pd.read_parquet(filename, columns=columns, filters=filters)
+            # 分类列转换为字符串，排序和比较方式与CSV一致
+            for col in df.select_dtypes('category').columns:
+                df[col] = df[col].astype(str)
         else:
             df = pd.read_csv(filename)
         print(f"成功加载 {filename}，包含 {len(df)} 行数据")
@@ -34,27 +43,35 @@ def compare_algorithm_rankings(dt_fb_file="dt_fb.csv", correct_file="f20-f24.xls
     比较算法排名是否一致
     
     参数:
-    - dt_fb_file: dt_fb.csv文件路径
+    - dt_fb_file: dt_fb.csv或dt_fb.parquet文件路径
     - correct_file: f20-f24.xlsx文件路径
     """
     print("=" * 80)
     print("🔍 算法排名一致性比较")
     print("=" * 80)
     
-    # 加载两个文件
-    dt_fb = load_and_validate_file(dt_fb_file)
+    # 必要的列
+    required_cols = ['budget_factor', 'fid', 'dim', 'budget', 'algname', 'fx']
+    
+    # 加载两个文件，dt_fb只读取必要列和标准文件中出现的函数
     correct = load_and_validate_file(correct_file)
+    if correct is None:
+        print("文件加载失败，无法进行比较")
+        return
+    fid_filter = None
+    if 'fid' in correct.columns:
+        fid_filter = [('fid', 'in', sorted(int(fid) for fid in correct['fid'].unique()))]
+    dt_fb = load_and_validate_file(dt_fb_file, columns=required_cols, filters=fid_filter)
     
-    if dt_fb is None or correct is None:
+    if dt_fb is None:
         print("文件加载失败，无法进行比较")
         return
     
     print(f"\n📊 数据概览:")
-    print(f"dt_fb.csv: {len(dt_fb)} 行")
+    print(f"{dt_fb_file}: {len(dt_fb)} 行")
     print(f"f20-f24.xlsx: {len(correct)} 行")
     
     # 检查必要的列
-    required_cols = ['budget_factor', 'fid', 'dim', 'budget', 'algname', 'fx']
     for col in required_cols:
         if col not in dt_fb.columns:
             print(f"错误：dt_fb.csv 缺少列 '{col}'")
@@ -225,12 +242,13 @@ def main():
     """
     print("=== 算法排名一致性比较工具 ===")
     
-    # 检查文件是否存在
-    dt_fb_exists = os.path.exists("dt_fb.csv")
+    # 检查文件是否存在，两者都存在时使用较新的文件
+    dt_fb_file = newest_file("dt_fb.parquet", "dt_fb.csv")
+    dt_fb_exists = os.path.exists(dt_fb_file)
     correct_exists = os.path.exists("f20-f24.xlsx")
     
     print(f"文件检查:")
-    print(f"- dt_fb.csv: {'✅ 存在' if dt_fb_exists else '❌ 不存在'}")
+    print(f"- {dt_fb_file}: {'✅ 存在' if dt_fb_exists else '❌ 不存在'}")
     print(f"- f20-f24.xlsx: {'✅ 存在' if correct_exists else '❌ 不存在'}")
     
     if not dt_fb_exists:
@@ -242,7 +260,7 @@ def main():
         return
     
     # 执行排名比较
-    results = compare_algorithm_rankings()
+    results = compare_algorithm_rankings(dt_fb_file)
     
     if results:
         print(f"\n排名比较完成！")
@@ -1,16 +1,20 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-compare_results_tolerance.py - 比较dt_fb.csv与f20-f24.xlsx的fx容差结果
+compare_results_tolerance.py - 比较dt_fb.csv（或dt_fb.parquet）与f20-f24.xlsx的fx容差结果
 """
 
 import pandas as pd
 import numpy as np
 import os
 
-def load_and_validate_file(file_path):
+from result_files import newest_file
+
+def load_and_validate_file(file_path, columns=None, filters=None):
     """
     加载并验证文件
+    
+    读取Parquet文件时只读取 columns 中的列，filters 下推到文件读取
     """
     if not os.path.exists(file_path):
         print(f"❌ 文件不存在: {file_path}")
@@ -21,6 +25,11 @@ def load_and_validate_file(file_path):
             df = pd.read_csv(file_path)
         elif file_path.endswith('.xlsx'):
             df = pd.read_excel(file_path)
+        elif file_path.endswith('.parquet'):
+            df = pd.read_parquet(file_path, columns=columns, filters=filters)
+            # 分类列转换为字符串，排序和比较方式与CSV一致
+            for col in df.select_dtypes('category').columns:
+                df[col] = df[col].astype(str)
         else:
             print(f"❌ 不支持的文件格式: {file_path}")
             return None
@@ -32,7 +41,7 @@ def load_and_validate_file(file_path):
         print(f"❌ 加载文件失败: {e}")
         return None
 
-def compare_results_with_tolerance(dt_fb_file="dt_fb.csv", correct_file="f20-f24.xlsx", tolerance=0.5):
+def compare_results_with_tolerance(dt_fb_file=None, correct_file="f20-f24.xlsx", tolerance=0.5):
     """
     比较dt_fb.csv与f20-f24.xlsx的fx容差结果
     """
@@ -40,14 +49,24 @@ def compare_results_with_tolerance(dt_fb_file="dt_fb.csv", correct_file="f20-f24
     print("🔍 fx容差比较工具")
     print("=" * 80)
     
+    # 默认使用dt_fb.parquet和dt_fb.csv中较新的文件
+    if dt_fb_file is None:
+        dt_fb_file = newest_file("dt_fb.parquet", "dt_fb.csv")
+    
     # 文件检查
     print("文件检查:")
     print(f"- {dt_fb_file}: {'✅ 存在' if os.path.exists(dt_fb_file) else '❌ 不存在'}")
     print(f"- {correct_file}: {'✅ 存在' if os.path.exists(correct_file) else '❌ 不存在'}")
     
-    # 加载数据
-    dt_fb = load_and_validate_file(dt_fb_file)
+    # 必要列
+    required_cols = ['budget_factor', 'algname', 'fid', 'dim', 'fx']
+    
+    # 加载数据，dt_fb只读取必要列和标准文件中出现的函数
     correct = load_and_validate_file(correct_file)
+    fid_filter = None
+    if correct is not None and 'fid' in correct.columns:
+        fid_filter = [('fid', 'in', sorted(int(fid) for fid in correct['fid'].unique()))]
+    dt_fb = load_and_validate_file(dt_fb_file, columns=required_cols, filters=fid_filter)
     
     if dt_fb is None or correct is None:
         print("❌ 数据加载失败")
@@ -58,7 +77,6 @@ def compare_results_with_tolerance(dt_fb_file="dt_fb.csv", correct_file="f20-f24
     print(f"{correct_file}: {len(correct)} 行")
     
     # 检查必要列
-    required_cols = ['budget_factor', 'algname', 'fid', 'dim', 'fx']
     missing_cols_dt_fb = [col for col in required_cols if col not in dt_fb.columns]
     missing_cols_correct = [col for col in required_cols if col not in correct.columns]
     
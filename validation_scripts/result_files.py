@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+result_files.py - 比较脚本共用的结果文件选择函数
+"""
+
+import os
+
+def newest_file(*filenames):
+    """
+    返回存在的文件中修改时间最新的一个，都不存在时返回最后一个
+    
+    dt_fb.parquet 只在读取 Parquet 数据集时生成，之后只重新生成 dt_fb.csv 时 dt_fb.parquet 已过时
+    """
+    existing = [f for f in filenames if os.path.exists(f)]
+    return max(existing, key=os.path.getmtime) if existing else filenames[-1]